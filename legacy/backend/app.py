@@ -1,351 +1,578 @@
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, Response, request, jsonify, send_file, stream_with_context, g
 from flask_cors import CORS
 import json
-import dashscope
-from dashscope import Generation
+import copy
 import os
+import time
+import uuid
 import logging
+from datetime import datetime, timedelta
+from urllib.parse import quote
 import mistune
 from pygments import highlight
 from pygments.formatters import HtmlFormatter
 from pygments.lexers import get_lexer_by_name
 from dotenv import load_dotenv
+from concurrency import executor
+from jobs import JobManager, JOB_PAGE_MAX
+from journal import JobJournal, JOURNAL_ENABLED
+from reevaluate import reevaluate, build_thresholds
+from columnar_export import (
+    COLUMNAR_FORMATS, MEDIA_TYPES, ROLLUP_KEYS, result_schema, iter_export, store_records, job_records,
+    collect_table, rollup,
+)
+from result_cache import ResultCache, make_cache_key, RESULT_CACHE_ENABLED
+from result_store import ResultStore, QueryError, RESULT_STORE_ENABLED
+from config_store import negative_words_store
+from negative_word_scanner import get_scanner
+from typo_detector import get_typo_detector
+from rules import compute_rule_scores, RULES_VERSION
+from postprocess import postprocess_results, DEFAULT_THRESHOLDS
+from validation import local_checks, validate_result
+from prompt_builder import build_prompt, build_packed_prompt, render_packed_system_prompt, PROMPT_VERSION
+from resilience import upstream_guard, CircuitOpenError, MalformedOutputError
+from packing import PACKING_ENABLED, plan_packs, parse_packed_response, output_tokens_for
+from backends import get_backend, SCORING_BACKEND, MODEL_STREAMING
+from stream_parser import extract_json
+from structured_logging import configure_logging, detail_logger, lazy
+from metrics import (
+    registry, StageTimer, MODEL_TOKENS, MODEL_RESPONSES, SCORING_RESULTS, SCORING_FALLBACKS,
+    STAGE_SECONDS, HTTP_REQUEST_SECONDS,
+)
+from cascade import (
+    CASCADE_ENABLED, CASCADE_FAST_MODEL, CASCADE_STRONG_MODEL, CASCADE_ESCALATE_BELOW,
+    ScoreTrace, CascadeReport, escalation_reasons,
+)
+from dedup import DEDUP_ENABLED, DEDUP_HISTORY_ENABLED, BatchIndex, HistoryIndex, DedupReport, signature, band_keys
+from spreadsheet_io import (
+    TableReader, ColumnError, SUPPORTED_FORMATS, REQUIRED_COLUMNS, OPTIONAL_COLUMNS,
+    iter_chunks, export_header, export_row, iter_csv, write_xlsx,
+)
 
 # 加载环境变量
 load_dotenv()
 
-logging.basicConfig(level=logging.DEBUG)
+# 日志由后台线程写出；逐条明细按 LOG_DETAIL_SAMPLE_RATE 采样，生产环境用 LOG_PRESET=production
+configure_logging()
 logger = logging.getLogger(__name__)
+detail = detail_logger(__name__)
 
 app = Flask(__name__)
 CORS(app)
 
-# 从环境变量获取API key
-dashscope.api_key = os.getenv('DASHSCOPE_API_KEY')
-if not dashscope.api_key:
-    logger.error("未找到 DASHSCOPE_API_KEY 环境变量")
-    raise ValueError("请在 .env 文件中设置 DASHSCOPE_API_KEY")
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def observe_request(response):
+    started = g.get('request_started')
+    if started is not None:
+        HTTP_REQUEST_SECONDS.observe(
+            time.perf_counter() - started,
+            endpoint=request.endpoint or 'unknown',
+            method=request.method,
+            status=response.status_code,
+        )
+    return response
+
+# 模型后端在首次评分时创建，缺少 API key 时评分返回兜底结果，服务本身仍可启动
+if SCORING_BACKEND == 'dashscope' and not os.getenv('DASHSCOPE_API_KEY'):
+    logger.error("未找到 DASHSCOPE_API_KEY 环境变量，请在 .env 文件中设置")
 
 MODEL = "qwen3.5-plus-2026-02-15"
+# 模型输出的 token 上限；由本地计算的字段不再要求模型输出，每少一个字段相应调低
+MAX_TOKENS = 2000
+OMITTED_FIELD_TOKENS = 150
+
+STRONG_MODEL = CASCADE_STRONG_MODEL or MODEL
+# 进程内累计的分级评分统计，每批的统计同时计入
+cascade_totals = CascadeReport(CASCADE_FAST_MODEL, STRONG_MODEL)
+
+result_cache = ResultCache() if RESULT_CACHE_ENABLED else None
+result_store = ResultStore() if RESULT_STORE_ENABLED else None
+dedup_history = HistoryIndex() if DEDUP_HISTORY_ENABLED else None
+
+def build_fallback_result(error, evaluation, suggestions, reasoning):
+    # 评分失败时返回的兜底结果，结构与正常结果保持一致
+    SCORING_FALLBACKS.inc(reason=evaluation)
+    logger.warning("返回兜底结果: %s", error, extra={"event": "scoring_fallback", "reason": evaluation})
+    return {
+        "error": error,
+        "score": 0,
+        "evaluation_details": {
+            "答非所问": {"得分": 0, "评价": evaluation},
+            "回复逻辑性": {"得分": 0, "评价": evaluation},
+            "问题解决情况": {"得分": 0, "评价": evaluation},
+            "办理时长": {"得分": 0, "评价": evaluation},
+            "回复态度": {"得分": 0, "评价": evaluation},
+            "错别字": {"存在": False, "错别字列表": []},
+            "负面词语": {"存在": False, "词语列表": []}
+        },
+        "重点关注": False,
+        "suggestions": suggestions,
+        "confidence": 0,
+        "handling_suggestion": "人工检查",
+        "reasoning": reasoning
+    }
 
 def load_negative_words():
-    config_path = os.path.join(os.path.dirname(__file__), 'config', 'negative_words.json')
-    try:
-        with open(config_path, 'r', encoding='utf-8') as f:
-            config = json.load(f)
-            return config
-    except Exception as e:
-        return {"负面词语": [], "分类": {}}
-
-def generate_prompt(data):
-    # 加载负面词语配置
-    negative_words_config = load_negative_words()
-    negative_words = negative_words_config["负面词语"]
-    
-    return f"""
-你是一个工单办理质量智能检测系统（GovInsight-AI）。请根据以下标准对群众网上诉求数据中的"诉求回复内容"进行评分，并评估置信度，输出结构化 JSON 结果。
-
-请采用"思维链 (Chain of Thought)"模式进行研判：
-1. 首先分析群众诉求的核心痛点和关键信息。
-2. 然后检查回复内容是否完整覆盖了这些信息，是否存在回避、推诿或逻辑漏洞。
-3. 接着根据评分标准逐项打分。
-4. 最后综合评估，给出置信度（Confidence）和处置建议。
-
-【评分维度及标准】
-1️⃣ 答非所问（30分）：
-- 回复是否回应群众诉求重点。
-  - 25-30分：精准回应。
-  - 15-24分：基本回应，细节略缺。
-  - 5-14分：多处未回应或跑题。
-  - 0-4分：严重跑题。
-
-2️⃣ 回复逻辑性（30分）：
-- 结构清晰、语言流畅。
-  - 25-30分：逻辑严谨。
-  - 15-24分：表达尚可。
-  - 5-14分：逻辑不清。
-  - 0-4分：混乱无序。
-
-3️⃣ 问题解决情况（10分）：
-- 综合评判标准：
-  - 8-10分：已解决且群众认可，回复内容清晰体现具体解决措施
-  - 5-7分：基本解决但说明不够详细，或群众不完全认可
-  - 0-4分：未解决/在处理中/未说明具体措施
-
-4️⃣ 办理时长（10分）：
-- 咨询类：
-  - 1-2日：8-10分，办理时间越短得分越高
-  - 3-5日：6-7分
-  - 超5日：每超1天扣2分
-- 非咨询类：
-  - 1-4日：8-10分
-  - 5-9日：6-7分
-  - 10-15日：5分
-  - 超15日：每超1天扣2分
-
-5️⃣ 回复态度（20分）：
-- 16-20分：态度友好，关怀到位
-- 10-15分：语气尚可，有少量冷漠
-- 5-9分：较生硬冷淡
-- 0-4分：怠慢、敷衍
-
-注意事项：
-1. 问题解决情况评分时，必须同时满足以下条件才能得到8-10分：
-   - 办理人员自评显示已解决
-   - 群众认可
-   - 回复内容中明确说明了具体解决措施
-2. 如果回复内容中未体现具体解决措施，即使办理人员自评为已解决且群众认可，最高只能得7分
-3. 重点关注标记规则：满足以下任一情况即标记为重点关注：
-   - 答非所问得分 < 5分
-   - 回复逻辑性得分 < 5分
-   - 回复态度得分 < 5分
-   - 存在错别字
-   - 存在负面词语（包括 XXX、YYY 等）
-
-4. 错别字检查要特别注意以下情况：
-   - 同音字错误：如"按排/安排"、"在/再"、"的/地/得"等
-   - 形近字错误
-   - 常见错误用字
-
-5. 负面词语检查：
-   检查是否包含以下负面词语：
-   {json.dumps(negative_words, ensure_ascii=False, indent=3)}
-
-以下是群众诉求数据：
-{json.dumps(data, ensure_ascii=False)}
-
-请仔细评估每个维度，确保评分准确。特别注意检查文本中是否包含错别字和负面词语，这些都会导致重点关注标记。
-同时，请给出一个置信度（confidence），范围0.0-1.0，表示你对本次评分准确性的信心。
-
-输出格式要求：
-{{
-    "score": 总分,
-    "confidence": 0.xx,
-    "evaluation_details": {{
-        "答非所问": {{"得分": 整数, "评价": "说明"}},
-        "回复逻辑性": {{"得分": 整数, "评价": "说明"}},
-        "问题解决情况": {{"得分": 整数, "评价": "说明"}},
-        "办理时长": {{"得分": 整数, "评价": "说明"}},
-        "回复态度": {{"得分": 整数, "评价": "说明"}},
-        "错别字": {{
-            "存在": true/false,
-            "错别字列表": [{{"错误写法": "XXX", "正确写法": "YYY"}}]
-        }},
-        "负面词语": {{
-            "存在": true/false,
-            "词语列表": ["XXX", "YYY"]
-        }}
-    }},
-    "重点关注": true/false,
-    "suggestions": "改进建议",
-    "reasoning": "简要说明给出该置信度和评分的理由"
-}}
-
-注意：评估重点关注时，除了检查三个主要指标的低分外，还要检查是否存在错别字或负面词语，任一情况都应标记为重点关注。
-
-请特别注意：
-1. 只有得分低于上述阈值才标记为重点关注
-2. 仅检查这三个维度的得分（答非所问、回复逻辑性、回复态度）
-3. 问题解决情况和办理时长的低分不会导致重点关注
-4. 确保评分和重点关注标记的一致性
-"""
-
-def call_model(data):
-    prompt = generate_prompt(data)
-    try:
-        response = Generation.call(
-            model=MODEL,
-            messages=[{
-                "role": "user", 
-                "content": prompt
-            }],
-            result_format='message',
+    # 配置只在文件变化时重新解析
+    return negative_words_store.snapshot().config
+
+def scoring_version():
+    # 错别字词典、规则表和后处理阈值变化同样会改变结果，一并计入提示词版本
+    return f"{PROMPT_VERSION}:{get_typo_detector().digest}:{RULES_VERSION}:{DEFAULT_THRESHOLDS.digest}"
+
+def scoring_model(cascade=False):
+    # 分级评分的结果取决于两个模型和升级阈值
+    return f"{CASCADE_FAST_MODEL}>{STRONG_MODEL}@{CASCADE_ESCALATE_BELOW}" if cascade else MODEL
+
+def result_cache_key(data, cascade=False):
+    return make_cache_key(data, scoring_version(), scoring_model(cascade))
+
+def refresh_negative_words(result, data, negative_words):
+    """
+    按当前词表重新扫描缓存结果的负面词语（词表不计入缓存键，修改词表不会使缓存失效）；
+    是否存在发生变化时重新计算重点关注、处置建议和风险等级
+    """
+    details = result.get('evaluation_details') or {}
+    scanned = get_scanner(negative_words).scan(str(data.get('诉求回复内容') or ''))
+    previous = details.get('负面词语') or {}
+    if scanned != previous:
+        details['负面词语'] = scanned
+        if bool(scanned['存在']) != bool(previous.get('存在')):
+            postprocess_results([result])
+    return result
+
+def cached_result(data, negative_words, cascade=False):
+    """返回 (缓存键, 缓存结果)，未命中时结果为 None"""
+    key = result_cache_key(data, cascade)
+    cached = result_cache.get(key)
+    if cached is not None:
+        cached = refresh_negative_words(cached, data, negative_words)
+    return key, cached
+
+def with_timings(result, timer, timings):
+    # 耗时明细只附在本次返回的结果上，不写入缓存
+    if not timings:
+        return result
+    return dict(result, timings=timer.breakdown())
+
+def call_model(data, negative_words=None, rule_scores=None, timings=False, cascade=None):
+    """cascade 为本批的 CascadeReport 时按分级评分，统计计入其中"""
+    timer = StageTimer()
+    if negative_words is None:
+        negative_words = negative_words_store.snapshot()
+    if result_cache is None:
+        return with_timings(score_once(data, negative_words, rule_scores, timer, cascade), timer, timings)
+    with timer.stage('cache'):
+        key, cached = cached_result(data, negative_words, cascade is not None)
+    if cached is not None:
+        SCORING_RESULTS.inc(source='cache')
+        return with_timings(cached, timer, timings)
+    result = score_once(data, negative_words, rule_scores, timer, cascade)
+    # 升级失败时保留的快速模型结果不缓存，下次仍会尝试升级
+    if not (result.get('cascade') or {}).get('escalation_failed'):
+        result_cache.put(key, result)
+    return with_timings(result, timer, timings)
+
+def score_once(data, negative_words, rule_scores, timer, cascade=None):
+    if cascade is None:
+        return score_with_model(data, negative_words, rule_scores, timer)
+    trace = ScoreTrace()
+    started = time.perf_counter()
+    result = score_with_model(data, negative_words, rule_scores, timer, model=CASCADE_FAST_MODEL, trace=trace)
+    return escalate(result, trace, time.perf_counter() - started, data, negative_words, rule_scores, timer, cascade)
+
+def escalate(result, trace, seconds, data, negative_words, rule_scores, timer, report):
+    """快速模型的结果需要升级时交给主模型重新评分，返回最终结果并计入统计"""
+    reasons = escalation_reasons(result, trace)
+    if not reasons:
+        report.record(seconds, trace.tokens, reasons)
+        return dict(result, cascade={"model": CASCADE_FAST_MODEL, "escalated": False, "reasons": []})
+    detail.debug("快速模型结果升级到主模型评分，原因: %s", reasons)
+    strong_trace = ScoreTrace()
+    started = time.perf_counter()
+    strong = score_with_model(data, negative_words, rule_scores, timer, model=STRONG_MODEL, trace=strong_trace)
+    report.record(seconds, trace.tokens, reasons, time.perf_counter() - started, strong_trace.tokens)
+    if strong.get('error') and not result.get('error'):
+        # 主模型评分失败时退回快速模型的结果
+        return dict(result, cascade={
+            "model": CASCADE_FAST_MODEL, "escalated": False, "reasons": reasons, "escalation_failed": True,
+        })
+    return dict(strong, cascade={"model": STRONG_MODEL, "escalated": True, "reasons": reasons})
+
+def request_model(messages, max_tokens, input_tokens=0, openers='{', model=MODEL, trace=None):
+    # 经过共享的限流、重试和熔断；流式读取时输出格式错误会提前中止并重试
+    backend = get_backend()
+
+    def attempt():
+        response = backend.complete(
+            messages,
+            model=model,
+            max_tokens=max_tokens,
             temperature=0.1,
-            max_tokens=2000,
             top_p=0.8,
-            enable_search=True,
+            stream=MODEL_STREAMING,
+            openers=openers,
         )
-        
-        if response.status_code == 200:
-            result = response.output.choices[0].message.content
+        return record_usage(response, input_tokens, trace)
+
+    return upstream_guard.call(attempt, input_tokens=input_tokens)
+
+def record_usage(response, input_tokens, trace=None):
+    # 每次尝试都计入用量，服务端未返回输入 token 数时按提示词估算
+    MODEL_RESPONSES.inc(status=response.status_code)
+    used_input = response.usage.get('input_tokens') or input_tokens
+    used_output = response.usage.get('output_tokens', 0)
+    MODEL_TOKENS.inc(used_input, kind='input')
+    MODEL_TOKENS.inc(used_output, kind='output')
+    if trace is not None:
+        trace.tokens += used_input + used_output
+    return response
+
+def score_with_model(data, negative_words=None, rule_scores=None, timer=None, model=MODEL, trace=None):
+    if timer is None:
+        timer = StageTimer()
+    if negative_words is None:
+        negative_words = negative_words_store.snapshot()
+    rule_scores, local_typos, prompt, max_tokens = prepare_scoring(data, rule_scores, timer)
+    try:
+        with timer.stage('model'):
+            response = request_model(
+                prompt.messages(), max_tokens, input_tokens=prompt.total_tokens, model=model, trace=trace,
+            )
+        return finish_scoring(response, data, negative_words, rule_scores, local_typos, timer, trace)
+    except Exception as e:
+        return model_error_result(e)
+
+def prepare_scoring(data, rule_scores, timer):
+    """本地检查并构建提示词，返回 (规则分, 本地错别字, 提示词, 输出 token 上限)；同步和异步评分共用"""
+    with timer.stage('local_checks'):
+        rule_scores, local_typos = local_checks(data, rule_scores)
+    with timer.stage('prompt'):
+        prompt = build_prompt(data, check_typos=not local_typos, rule_dimensions=tuple(rule_scores))
+    detail.debug("提示词 token 估算: %s", lazy(prompt.token_estimates))
+    omitted_fields = len(rule_scores) + (1 if local_typos else 0)
+    return rule_scores, local_typos, prompt, MAX_TOKENS - OMITTED_FIELD_TOKENS * omitted_fields
+
+def finish_scoring(response, data, negative_words, rule_scores, local_typos, timer, trace=None):
+    """解析并校验模型响应，返回评分结果"""
+    if response.status_code != 200:
+        return build_fallback_result(f"API调用失败: {response.code}", "API调用失败", "API调用失败，请重试", "API调用失败")
+    SCORING_RESULTS.inc(source='model')
+    result = response.content
+    with timer.stage('parse'):
+        try:
+            json_result = json.loads(result)
+        except json.JSONDecodeError:
+            # 从夹杂说明文字的输出中提取 JSON，提取到的结果同样经过校验
+            extracted = extract_json(result, '{')
             try:
-                json_result = json.loads(result)
-                
-                # 验证并修正分值
-                details = json_result.get('evaluation_details', {})
-                logger.info(f"原始评分详情: {json.dumps(details, ensure_ascii=False)}")
-                
-                # 验证各维度分值不超过最大值
-                max_scores = {
-                    '答非所问': 30,
-                    '回复逻辑性': 30,
-                    '问题解决情况': 10,
-                    '办理时长': 10,
-                    '回复态度': 20
-                }
-                
-                # 记录修正前的分数
-                original_scores = {}
-                for dimension, max_score in max_scores.items():
-                    if dimension in details:
-                        original_scores[dimension] = details[dimension].get('得分', 0)
-                
-                # 验证和修正分值
-                for dimension, max_score in max_scores.items():
-                    if dimension in details:
-                        score = details[dimension].get('得分', 0)
-                        if not isinstance(score, (int, float)):
-                            logger.warning(f"{dimension} 得分格式错误: {score}, 设置为0")
-                            score = 0
-                        if score > max_score:
-                            logger.warning(f"{dimension} 得分超出上限: {score} > {max_score}")
-                            details[dimension]['得分'] = max_score
-                            details[dimension]['评价'] += f"（原始分值 {score} 超出上限，已修正为 {max_score}）"
-                        elif score < 0:
-                            logger.warning(f"{dimension} 得分小于0: {score}")
-                            details[dimension]['得分'] = 0
-                            details[dimension]['评价'] += f"（原始分值 {score} 小于0，已修正为 0）"
-                        else:
-                            details[dimension]['得分'] = int(score)  # 确保分数为整数
-                
-                # 重新计算总分
-                total_score = sum(details[dim].get('得分', 0) for dim in max_scores.keys())
-                json_result['score'] = total_score
-                
-                # 验证重点关注标记的正确性
-                should_be_concerned = False
-                concern_reasons = []
-                
-                # 检查三个主要指标
-                if details.get('答非所问', {}).get('得分', 0) < 5:
-                    should_be_concerned = True
-                    concern_reasons.append(f"答非所问得分过低: {details['答非所问']['得分']}分")
-                
-                if details.get('回复逻辑性', {}).get('得分', 0) < 5:
-                    should_be_concerned = True
-                    concern_reasons.append(f"回复逻辑性得分过低: {details['回复逻辑性']['得分']}分")
-                
-                if details.get('回复态度', {}).get('得分', 0) < 5:
-                    should_be_concerned = True
-                    concern_reasons.append(f"回复态度得分过低: {details['回复态度']['得分']}分")
-                
-                # 检查错别字
-                if details.get('错别字', {}).get('存在', False):
-                    should_be_concerned = True
-                    错别字列表 = details['错别字'].get('错别字列表', [])
-                    if 错别字列表:
-                        concern_reasons.append(f"存在错别字: {', '.join(item['错误写法'] for item in 错别字列表)}")
-                
-                # 检查负面词语
-                if details.get('负面词语', {}).get('存在', False):
-                    should_be_concerned = True
-                    词语列表 = details['负面词语'].get('词语列表', [])
-                    if 词语列表:
-                        concern_reasons.append(f"存在负面词语: {', '.join(词语列表)}")
-                
-                # 记录判断过程
-                logger.info(f"重点关注判断结果: {should_be_concerned}")
-                if concern_reasons:
-                    logger.info(f"重点关注原因: {'; '.join(concern_reasons)}")
-                
-                # 更正重点关注标记
-                json_result['重点关注'] = should_be_concerned
-                
-                # 计算处置建议 (Handling Suggestion)
-                confidence = json_result.get('confidence', 0.8) # Default to 0.8 if missing
-                
-                handling_suggestion = ""
-                risk_level = ""
-                
-                if should_be_concerned:
-                    handling_suggestion = "强制复核 (Mandatory Review)"
-                    risk_level = "High"
-                elif confidence < 0.7:
-                    handling_suggestion = "强制复核 (Mandatory Review)"
-                    risk_level = "Medium" # Low confidence implies some risk/uncertainty
-                elif confidence < 0.85:
-                    handling_suggestion = "抽检复核 (Sampling)"
-                    risk_level = "Low"
-                else:
-                    handling_suggestion = "自动采信 (Auto-Pass)"
-                    risk_level = "None"
-                    
-                json_result['handling_suggestion'] = handling_suggestion
-                json_result['risk_level'] = risk_level
-
-                # 记录分数修正情况
-                if original_scores != {dim: details[dim].get('得分', 0) for dim in max_scores.keys()}:
-                    logger.info(f"分数修正情况 - 原始分数: {original_scores}, 修正后: {json.dumps({dim: details[dim].get('得分', 0) for dim in max_scores.keys()}, ensure_ascii=False)}")
-                
-                return json_result
-                
+                json_result = json.loads(extracted) if extracted else None
             except json.JSONDecodeError:
-                try:
-                    start = result.find('{')
-                    end = result.rfind('}') + 1
-                    if start >= 0 and end > start:
-                        json_str = result[start:end]
-                        return json.loads(json_str)
-                except:
-                    pass
-                
-                return {
-                    "error": "模型返回的不是有效的JSON格式",
-                    "score": 0,
-                    "evaluation_details": {
-                        "答非所问": {"得分": 0, "评价": "评分失败"},
-                        "回复逻辑性": {"得分": 0, "评价": "评分失败"},
-                        "问题解决情况": {"得分": 0, "评价": "评分失败"},
-                        "办理时长": {"得分": 0, "评价": "评分失败"},
-                        "回复态度": {"得分": 0, "评价": "评分失败"},
-                        "错别字": {"存在": False, "错别字列表": []},
-                        "负面词语": {"存在": False, "词语列表": []}
-                    },
-                    "重点关注": False,
-                    "suggestions": "模型返回格式错误，请重试",
-                    "confidence": 0,
-                    "handling_suggestion": "人工检查",
-                    "reasoning": "解析错误"
-                }
+                json_result = None
+    if not isinstance(json_result, dict):
+        return build_fallback_result("模型返回的不是有效的JSON格式", "评分失败", "模型返回格式错误，请重试", "解析错误")
+    with timer.stage('validate'):
+        return validate_result(json_result, data, negative_words, rule_scores, local_typos, trace)
+
+def model_error_result(error):
+    # 模型调用或结果处理抛出异常时的兜底结果
+    if isinstance(error, CircuitOpenError):
+        return build_fallback_result(str(error), "上游服务熔断", "上游模型服务暂不可用，请稍后重试", str(error))
+    if isinstance(error, MalformedOutputError):
+        return build_fallback_result("模型返回的不是有效的JSON格式", "评分失败", "模型返回格式错误，请重试", f"解析错误: {str(error)}")
+    return build_fallback_result(f"调用出错: {str(error)}", "系统错误", "系统错误，请重试", f"系统错误: {str(error)}")
+
+def score_error_result(item, error):
+    return build_fallback_result(f"调用出错: {str(error)}", "系统错误", "系统错误，请重试", f"系统错误: {str(error)}")
+
+def score_pack(pack, negative_words, timings=False, cascade=None):
+    """一次请求评多条工单，pack 为 [(序号, 诉求数据, 规则分, 本地错别字)]，返回 [(序号, 结果)]"""
+    # 整个合并请求共用一个计时器，耗时明细是整组的耗时
+    timer = StageTimer()
+    # 分级评分时合并请求发给快速模型，用量和耗时均摊到每条工单
+    pack_trace = ScoreTrace()
+    pack_seconds = 0.0
+    check_typos = not pack[0][3]
+    rule_dimensions = tuple(pack[0][2])
+    with timer.stage('prompt'):
+        prompt = build_packed_prompt(
+            [(i, data) for i, (_, data, _, _) in enumerate(pack)],
+            check_typos=check_typos,
+            rule_dimensions=rule_dimensions,
+        )
+    detail.debug("合并评分 %s 条，提示词 token 估算: %s", len(pack), lazy(prompt.token_estimates))
+    elements = {}
+    try:
+        started = time.perf_counter()
+        with timer.stage('model'):
+            response = request_model(
+                prompt.messages(), output_tokens_for(len(pack)), input_tokens=prompt.total_tokens, openers='{[',
+                model=CASCADE_FAST_MODEL if cascade is not None else MODEL, trace=pack_trace,
+            )
+        pack_seconds = time.perf_counter() - started
+        if response.status_code == 200:
+            with timer.stage('parse'):
+                elements = parse_packed_response(response.content)
         else:
-            return {
-                "error": f"API调用失败: {response.code}",
-                "score": 0,
-                "evaluation_details": {
-                    "答非所问": {"得分": 0, "评价": "API调用失败"},
-                    "回复逻辑性": {"得分": 0, "评价": "API调用失败"},
-                    "问题解决情况": {"得分": 0, "评价": "API调用失败"},
-                    "办理时长": {"得分": 0, "评价": "API调用失败"},
-                    "回复态度": {"得分": 0, "评价": "API调用失败"},
-                    "错别字": {"存在": False, "错别字列表": []},
-                    "负面词语": {"存在": False, "词语列表": []}
-                },
-                "重点关注": False,
-                "suggestions": "API调用失败，请重试",
-                "confidence": 0,
-                "handling_suggestion": "人工检查",
-                "reasoning": "API调用失败"
-            }
-            
+            logger.warning(
+                "合并评分调用失败: %s，逐条重新评分", response.code,
+                extra={"event": "pack_fallback", "reason": "api_error", "pack_size": len(pack)},
+            )
     except Exception as e:
-        return {
-            "error": f"调用出错: {str(e)}",
-            "score": 0,
-            "evaluation_details": {
-                "答非所问": {"得分": 0, "评价": "系统错误"},
-                "回复逻辑性": {"得分": 0, "评价": "系统错误"},
-                "问题解决情况": {"得分": 0, "评价": "系统错误"},
-                "办理时长": {"得分": 0, "评价": "系统错误"},
-                "回复态度": {"得分": 0, "评价": "系统错误"},
-                "错别字": {"存在": False, "错别字列表": []},
-                "负面词语": {"存在": False, "词语列表": []}
-            },
-            "重点关注": False,
-            "suggestions": "系统错误，请重试",
-            "confidence": 0,
-            "handling_suggestion": "人工检查",
-            "reasoning": f"系统错误: {str(e)}"
-        }
+        logger.warning(
+            "合并评分出错: %s，逐条重新评分", e,
+            extra={"event": "pack_fallback", "reason": "exception", "pack_size": len(pack)},
+        )
+
+    results = []
+    for i, (index, data, rules, typos) in enumerate(pack):
+        element = elements.get(i)
+        result = None
+        if isinstance(element, dict) and isinstance(element.get('evaluation_details'), dict):
+            trace = ScoreTrace(pack_trace.tokens // len(pack))
+            try:
+                with timer.stage('validate'):
+                    result = validate_result(element, data, negative_words, rules, typos, trace)
+            except Exception as e:
+                # 单条元素缺少维度或 confidence 格式错误时只影响这一条，其余元素照常采用
+                logger.warning(
+                    "合并评分第 %s 条结果校验失败: %s，回退为单条评分", i, e,
+                    extra={"event": "pack_fallback", "reason": "invalid_element", "pack_size": len(pack)},
+                )
+        else:
+            logger.warning(
+                "合并评分缺少第 %s 条的有效结果，回退为单条评分", i,
+                extra={"event": "pack_fallback", "reason": "missing_element", "pack_size": len(pack)},
+            )
+        if result is None:
+            # 缺失或格式错误的元素回退为单条评分
+            result = call_model(data, negative_words, rules, timings, cascade)
+        else:
+            SCORING_RESULTS.inc(source='packed')
+            if cascade is not None:
+                result = escalate(result, trace, pack_seconds / len(pack), data, negative_words, rules, timer, cascade)
+            if result_cache is not None and not result.get('cascade', {}).get('escalation_failed'):
+                result_cache.put(result_cache_key(data, cascade is not None), result)
+            result = with_timings(result, timer, timings)
+        results.append((index, result))
+    return results
+
+def iter_packed_results(items, negative_words, rule_scores, max_workers, timings=False, cascade=None, indices=None):
+    # 先取缓存，未命中的按提示词变体分组后按 token 预算合并
+    groups = {}
+    for index in range(len(items)) if indices is None else indices:
+        item = items[index]
+        if not isinstance(item, dict):
+            yield index, score_error_result(item, TypeError("诉求数据必须是 JSON 对象"))
+            continue
+        if result_cache is not None:
+            timer = StageTimer()
+            with timer.stage('cache'):
+                _, cached = cached_result(item, negative_words, cascade is not None)
+            if cached is not None:
+                SCORING_RESULTS.inc(source='cache')
+                yield index, with_timings(cached, timer, timings)
+                continue
+        rules, typos = local_checks(item, rule_scores[index])
+        variant = (not typos, tuple(sorted(rules)))
+        groups.setdefault(variant, []).append((index, item, rules, typos))
+
+    packs = []
+    for (check_typos, rule_dimensions), entries in groups.items():
+        _, system_tokens = render_packed_system_prompt(check_typos, rule_dimensions)
+        packs.extend(plan_packs(entries, system_tokens))
+
+    def pack_error(pack, error):
+        return [(entry[0], score_error_result(entry[1], error)) for entry in pack]
+
+    for _, pack_results in executor.iter_completed(
+        lambda pack: score_pack(pack, negative_words, timings, cascade), packs, max_workers, pack_error
+    ):
+        yield from pack_results
+
+def derive_result(source, data, negative_words, rules, typos):
+    """由近似重复工单的结果推导本条结果：沿用模型评分部分，规则分、错别字、负面词语按本条内容重新计算"""
+    result = copy.deepcopy(source)
+    for key in ('timings', 'cascade', 'dedup'):
+        result.pop(key, None)
+    details = result.get('evaluation_details') or {}
+    # 只保留在本条回复中确实出现的错别字
+    reply = str(data.get('诉求回复内容') or '')
+    found = [
+        item for item in (details.get('错别字') or {}).get('错别字列表', [])
+        if isinstance(item, dict) and item.get('错误写法') and item['错误写法'] in reply
+    ]
+    details['错别字'] = {"存在": bool(found), "错别字列表": found}
+    try:
+        return validate_result(result, data, negative_words, rules, typos)
+    except Exception as e:
+        logger.warning("由近似重复结果推导失败: %s，改为直接评分", e, extra={"event": "dedup_derive_failed"})
+        return None
+
+def iter_deduplicated(items, score, negative_words, rule_scores, cascade, report):
+    """
+    近似重复的工单只对每类的代表评分，其余由代表的结果推导；score(indices) 逐条产出 (序号, 结果)。
+    代表评分失败时，同类的其余工单改为逐条评分。
+    """
+    batch_index = BatchIndex()
+    members = {}
+    fingerprints = {}
+    checks = {}
+    representatives = []
+    prefix = f"{scoring_version()}|{scoring_model(cascade is not None)}"
+    for index, item in enumerate(items):
+        report.count('rows')
+        sig = signature(item) if isinstance(item, dict) else None
+        if sig is None:
+            representatives.append(index)
+            continue
+        rules, typos = local_checks(item, rule_scores[index])
+        checks[index] = (rules, typos)
+        # 提示词变体和诉求类别相同的工单才互相匹配
+        context = f"{prefix}|{not typos}|{','.join(sorted(rules))}|{item.get('诉求类别') or item.get('类别') or ''}"
+        keys = band_keys(sig, context)
+        match = batch_index.best(sig, keys)
+        if match is not None:
+            members[match[0]].append((index, match[1]))
+            continue
+        if dedup_history is not None:
+            hit = dedup_history.best(sig, keys)
+            derived = hit and derive_result(hit[2], item, negative_words, rules, typos)
+            if derived:
+                report.count('derived_history')
+                yield index, dict(derived, dedup={"source": "history", "entry_id": hit[0], "similarity": round(hit[1], 4)})
+                continue
+        batch_index.add(index, sig, keys)
+        fingerprints[index] = (sig, keys)
+        members[index] = []
+        representatives.append(index)
+    report.count('representatives', len(representatives))
+
+    rescore = []
+    for index, result in score(representatives):
+        yield index, result
+        if index not in fingerprints:
+            continue
+        if not isinstance(result, dict) or result.get('error'):
+            rescore.extend(member for member, _ in members[index])
+            continue
+        if dedup_history is not None and 'dedup' not in result:
+            dedup_history.add(*fingerprints[index], result)
+        for member, score_value in members[index]:
+            derived = derive_result(result, items[member], negative_words, *checks[member])
+            if derived is None:
+                rescore.append(member)
+                continue
+            report.count('derived_batch')
+            yield member, dict(derived, dedup={"source": "batch", "representative": index, "similarity": round(score_value, 4)})
+    if rescore:
+        report.count('rescored', len(rescore))
+        yield from score(rescore)
+
+def batch_scorer(data, pack=None, snapshot=None, timings=False, cascade=None, dedup=None, reports=None):
+    """
+    返回 run(items, max_workers)，逐条产出 (序号, 结果)；timings 为真时每条结果附带各阶段耗时。
+    run.reports 为本批启用的统计 {"cascade": CascadeReport, "dedup": DedupReport}，
+    可传入 reports 让多块共用同一份统计；run.digests 为本批所用负面词表和后处理阈值的摘要（写入结果库）。
+    """
+    # 批量开始时固定负面词语快照，整批数据按同一份词表评分
+    if snapshot is None:
+        snapshot = negative_words_store.snapshot()
+    # 规则分整批向量化计算
+    rule_scores = [scores or {} for scores in compute_rule_scores(data)]
+    if pack is None:
+        pack = PACKING_ENABLED
+    if cascade is None:
+        cascade = CASCADE_ENABLED
+    if dedup is None:
+        dedup = DEDUP_ENABLED
+    reports = {} if reports is None else reports
+    if cascade:
+        reports.setdefault('cascade', CascadeReport(CASCADE_FAST_MODEL, STRONG_MODEL, parent=cascade_totals))
+    if dedup:
+        reports.setdefault('dedup', DedupReport())
+    report = reports.get('cascade') if cascade else None
+
+    def run(items, max_workers=None):
+        def score(indices):
+            if pack:
+                return iter_packed_results(items, snapshot, rule_scores, max_workers, timings, report, indices)
+            indices = list(indices)
+            return (
+                (indices[position], result)
+                for position, result in executor.iter_completed(
+                    lambda index: call_model(
+                        items[index], negative_words=snapshot, rule_scores=rule_scores[index], timings=timings,
+                        cascade=report,
+                    ),
+                    indices,
+                    max_workers,
+                    score_error_result,
+                )
+            )
+        if dedup:
+            return iter_deduplicated(items, score, snapshot, rule_scores, report, reports['dedup'])
+        return score(range(len(items)))
+    run.reports = reports
+    run.digests = (snapshot.digest, DEFAULT_THRESHOLDS.digest)
+    return run
+
+def score_rows(rows, pack=None, max_workers=None, cascade=None, dedup=None, snapshot=None):
+    """按块评分逐行读入的数据，按输入顺序产出 (诉求数据, 结果)，内存中最多保留一块"""
+    if snapshot is None:
+        snapshot = negative_words_store.snapshot()
+    reports = None
+    for chunk in iter_chunks(rows, FILE_CHUNK_ROWS):
+        results = [None] * len(chunk)
+        run = batch_scorer(chunk, pack, snapshot, cascade=cascade, dedup=dedup, reports=reports)
+        reports = run.reports
+        for index, result in run(chunk, max_workers):
+            results[index] = result
+        yield from zip(chunk, results)
+
+# 同步接口每批的最大条数，超过时返回 413 并提示改用 /jobs 异步任务接口；0 为不限制
+SYNC_BATCH_MAX_ITEMS = int(os.getenv('SYNC_BATCH_MAX_ITEMS', '0'))
+# 文件评分时每次读入并评分的行数
+FILE_CHUNK_ROWS = int(os.getenv('FILE_CHUNK_ROWS', '500'))
+# 上传文件后在响应中返回的预览行数
+UPLOAD_PREVIEW_ROWS = 20
+# /jobs/upload 的最大行数：异步任务在内存中保存全部输入和结果，超出时返回 413，
+# 大文件改用逐块评分、内存占用与行数无关的 /files/score；0 为不限制
+UPLOAD_JOB_MAX_ROWS = int(os.getenv('UPLOAD_JOB_MAX_ROWS', '20000'))
+
+def job_runner(items, options):
+    # 异步任务的评分选项随评分日志持久化，续评时按同样的选项只对剩余的行重新创建 runner
+    return batch_scorer(
+        items, options.get('pack'), timings=bool(options.get('timings')),
+        cascade=options.get('cascade'), dedup=options.get('dedup'),
+    )
+
+job_manager = JobManager(
+    call_model, score_error_result, store=result_store,
+    journal=JobJournal() if JOURNAL_ENABLED else None, runner_factory=job_runner,
+)
+
+def want_timings(payload):
+    # 请求体 "timings": true 或 ?timings=1 时在每条结果中附带各阶段耗时
+    return bool(payload.get('timings')) or bool(parse_bool(request.args.get('timings')))
+
+def serialize_json(value):
+    started = time.perf_counter()
+    text = json.dumps(value, ensure_ascii=False)
+    STAGE_SECONDS.observe(time.perf_counter() - started, stage='serialize')
+    return text
+
+def open_store_writer(snapshot):
+    # 不经过任务管理器的评分（流式、文件评分）同样按批写入结果库，以生成的 ID 作为任务 ID；
+    # snapshot 为评分所用的负面词语快照，其摘要随结果写入，供重评判断哪些行需要重新扫描
+    run_id = uuid.uuid4().hex
+    if result_store is None:
+        return run_id, None
+    return run_id, result_store.writer(run_id, snapshot.digest, DEFAULT_THRESHOLDS.digest)
 
 @app.route('/batch_score', methods=['POST'])
 def batch_score():
@@ -353,22 +580,489 @@ def batch_score():
         data = request.json.get('data', [])
         if not data:
             return jsonify({"error": "没有接收到数据"}), 400
-            
-        results = []
-        for item in data:
-            results.append(call_model(item))
-        
-        return jsonify(results)
+        if SYNC_BATCH_MAX_ITEMS and len(data) > SYNC_BATCH_MAX_ITEMS:
+            return jsonify({
+                "error": f"同步评分每批最多 {SYNC_BATCH_MAX_ITEMS} 条，请改用 /jobs 接口提交异步任务"
+            }), 413
+
+        # 同步评分直接在评分线程池上执行，不经过任务队列，不会排在异步任务之后
+        snapshot = negative_words_store.snapshot()
+        run = batch_scorer(
+            data, request.json.get('pack'), snapshot, timings=want_timings(request.json),
+            cascade=request.json.get('cascade'), dedup=request.json.get('dedup'),
+        )
+        results = [None] * len(data)
+        _, writer = open_store_writer(snapshot)
+        try:
+            for index, result in run(data, request.json.get('concurrency')):
+                results[index] = result
+                if writer is not None:
+                    writer.add(index, data[index], result)
+        finally:
+            if writer is not None:
+                writer.close()
+
+        response = Response(serialize_json(results), mimetype='application/json')
+        for name, report in run.reports.items():
+            response.headers[f'X-{name.capitalize()}-Summary'] = json.dumps(report.summary())
+        return response
         
     except Exception as e:
         return jsonify({
             "error": f"处理请求时出错: {str(e)}"
         }), 500
 
+@app.route('/batch_score/stream', methods=['POST'])
+def batch_score_stream():
+    try:
+        data = request.json.get('data', [])
+        if not data:
+            return jsonify({"error": "没有接收到数据"}), 400
+        max_workers = request.json.get('concurrency')
+        # 默认输出 NDJSON，format=sse 或 Accept: text/event-stream 时输出 SSE
+        use_sse = (request.args.get('format') == 'sse'
+                   or request.accept_mimetypes.best == 'text/event-stream')
+        snapshot = negative_words_store.snapshot()
+        run = batch_scorer(
+            data, request.json.get('pack'), snapshot, timings=want_timings(request.json),
+            cascade=request.json.get('cascade'), dedup=request.json.get('dedup'),
+        )
+    except Exception as e:
+        return jsonify({"error": f"处理请求时出错: {str(e)}"}), 500
+
+    run_id, writer = open_store_writer(snapshot)
+
+    def generate():
+        # 每完成一条立即输出，服务端不保留已输出的结果
+        completed = 0
+        try:
+            for index, result in run(data, max_workers):
+                completed += 1
+                if writer is not None:
+                    writer.add(index, data[index], result)
+                line = serialize_json({"index": index, "result": result})
+                yield f"event: result\ndata: {line}\n\n" if use_sse else line + "\n"
+        finally:
+            if writer is not None:
+                writer.close()
+        summary = {"done": True, "job_id": run_id, "total": len(data), "completed": completed}
+        for name, report in run.reports.items():
+            summary[name] = report.summary()
+        summary = json.dumps(summary, ensure_ascii=False)
+        yield f"event: done\ndata: {summary}\n\n" if use_sse else summary + "\n"
+
+    mimetype = 'text/event-stream' if use_sse else 'application/x-ndjson'
+    return Response(generate(), mimetype=mimetype, headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+    })
+
+@app.route('/jobs', methods=['POST'])
+def create_job():
+    try:
+        data = request.json.get('data', [])
+        if not data:
+            return jsonify({"error": "没有接收到数据"}), 400
+        job = job_manager.submit(
+            data,
+            max_workers=request.json.get('concurrency'),
+            options={
+                "pack": request.json.get('pack'), "timings": want_timings(request.json),
+                "cascade": request.json.get('cascade'), "dedup": request.json.get('dedup'),
+            },
+        )
+        return jsonify(job.progress()), 202
+    except Exception as e:
+        return jsonify({"error": f"创建任务失败: {str(e)}"}), 500
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({"error": "任务不存在或已过期"}), 404
+    return jsonify(job.progress())
+
+@app.route('/jobs/<job_id>/results', methods=['GET'])
+def get_job_results(job_id):
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({"error": "任务不存在或已过期"}), 404
+    offset = max(0, request.args.get('offset', 0, type=int))
+    limit = min(max(1, request.args.get('limit', 100, type=int)), JOB_PAGE_MAX)
+    return jsonify({
+        "job_id": job.id,
+        "status": job.status,
+        "total": job.total,
+        "offset": offset,
+        "limit": limit,
+        "items": job.page(offset, limit),
+    })
+
+def export_response(header, rows, output_format, basename='评分结果'):
+    # CSV 边生成边返回；xlsx 需写完整个文件后返回，写入过程同样逐行进行
+    filename = f"{basename}.{output_format}"
+    if output_format == 'csv':
+        return Response(stream_with_context(iter_csv(header, rows)), mimetype='text/csv', headers={
+            'Content-Disposition': f"attachment; filename=results.csv; filename*=UTF-8''{quote(filename)}",
+            'X-Accel-Buffering': 'no',
+        })
+    return send_file(
+        write_xlsx(header, rows),
+        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        as_attachment=True,
+        download_name=filename,
+    )
+
+def columnar_response(records, output_format, basename):
+    # 每写完一个行组返回一段，内存中最多保留一个行组
+    try:
+        result_schema()
+    except ImportError:
+        return jsonify({"error": "未安装 pyarrow，无法导出 Parquet / Arrow 文件"}), 501
+    filename = f"{basename}.{output_format}"
+    return Response(stream_with_context(iter_export(records, output_format)), mimetype=MEDIA_TYPES[output_format], headers={
+        'Content-Disposition': f"attachment; filename=results.{output_format}; filename*=UTF-8''{quote(filename)}",
+        'X-Accel-Buffering': 'no',
+    })
+
+def open_upload():
+    upload = request.files.get('file')
+    if upload is None or not upload.filename:
+        raise ColumnError("没有接收到文件")
+    return TableReader(upload.stream, upload.filename)
+
+@app.route('/files/score', methods=['POST'])
+def score_file():
+    # 上传 .xlsx / .csv 文件，逐块读入评分并以文件形式返回结果，内存占用与文件行数无关
+    try:
+        reader = open_upload()
+        output_format = request.args.get('format') or reader.format
+        if output_format not in SUPPORTED_FORMATS:
+            raise ColumnError(f"不支持的导出格式: {output_format}")
+    except ColumnError as e:
+        return jsonify({"error": str(e)}), 400
+
+    max_workers = request.args.get('concurrency', type=int)
+    pack = request.args.get('pack')
+    pack = None if pack is None else pack in ('1', 'true')
+    cascade = request.args.get('cascade')
+    cascade = None if cascade is None else cascade in ('1', 'true')
+    dedup = request.args.get('dedup')
+    dedup = None if dedup is None else dedup in ('1', 'true')
+    input_columns = [name for name in reader.header if name]
+    snapshot = negative_words_store.snapshot()
+    run_id, writer = open_store_writer(snapshot)
+
+    def rows():
+        try:
+            for index, (item, result) in enumerate(score_rows(reader, pack, max_workers, cascade, dedup, snapshot)):
+                if writer is not None:
+                    writer.add(index, item, result)
+                yield export_row(input_columns, item, result)
+        finally:
+            reader.close()
+            if writer is not None:
+                writer.close()
+
+    try:
+        response = export_response(export_header(input_columns), rows(), output_format)
+        response.headers['X-Job-Id'] = run_id
+        return response
+    except Exception as e:
+        return jsonify({"error": f"处理文件时出错: {str(e)}"}), 500
+
+@app.route('/jobs/upload', methods=['POST'])
+def create_job_from_file():
+    # 由服务端解析上传的文件并提交异步任务，响应中附带前几行作为预览
+    try:
+        reader = open_upload()
+        try:
+            # 逐块读入，超过行数上限时立即停止，不把整个大文件读进内存
+            data = []
+            for chunk in iter_chunks(reader, FILE_CHUNK_ROWS):
+                data.extend(chunk)
+                if UPLOAD_JOB_MAX_ROWS and len(data) > UPLOAD_JOB_MAX_ROWS:
+                    return jsonify({
+                        "error": f"文件超过 {UPLOAD_JOB_MAX_ROWS} 行，请改用 /files/score 接口逐块评分并下载结果"
+                    }), 413
+        finally:
+            reader.close()
+    except ColumnError as e:
+        return jsonify({"error": str(e)}), 400
+    if not data:
+        return jsonify({"error": "文件中没有数据行"}), 400
+    try:
+        pack = request.form.get('pack')
+        cascade = request.form.get('cascade')
+        dedup = request.form.get('dedup')
+        job = job_manager.submit(
+            data,
+            max_workers=request.form.get('concurrency', type=int),
+            options={
+                "pack": None if pack is None else pack in ('1', 'true'),
+                "cascade": None if cascade is None else cascade in ('1', 'true'),
+                "dedup": None if dedup is None else dedup in ('1', 'true'),
+            },
+        )
+    except Exception as e:
+        return jsonify({"error": f"创建任务失败: {str(e)}"}), 500
+    progress = job.progress()
+    progress["columns"] = [name for name in reader.header if name]
+    progress["preview"] = data[:UPLOAD_PREVIEW_ROWS]
+    return jsonify(progress), 202
+
+@app.route('/jobs/<job_id>/export', methods=['GET'])
+def export_job(job_id):
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({"error": "任务不存在或已过期"}), 404
+    output_format = request.args.get('format', 'xlsx')
+    if output_format in COLUMNAR_FORMATS:
+        return columnar_response(job_records(job), output_format, f'评分结果_{job.id}')
+    if output_format not in SUPPORTED_FORMATS:
+        return jsonify({"error": f"不支持的导出格式: {output_format}"}), 400
+    # 原始列按必需列、可选列、其他列的顺序导出
+    input_columns = list(REQUIRED_COLUMNS + OPTIONAL_COLUMNS)
+    for item in job.items:
+        if isinstance(item, dict):
+            input_columns.extend(name for name in item if name not in input_columns)
+    rows = (
+        export_row(input_columns, item if isinstance(item, dict) else {}, entry["result"])
+        for item, entry in zip(job.items, job.page(0, job.total))
+    )
+    return export_response(export_header(input_columns), rows, output_format)
+
+def parse_time(value):
+    # 支持 Unix 时间戳和 ISO 格式日期/时间（按服务器本地时区）
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        raise QueryError(f"无法解析的时间: {value}")
+
+def parse_bool(value):
+    if value is None:
+        return None
+    return value.lower() in ('1', 'true', 'yes', '是')
+
+def result_filters(args):
+    filters = {
+        name: args.get(name)
+        for name in ('risk_level', 'handling_suggestion', 'category', 'job_id')
+    }
+    filters['concern'] = parse_bool(args.get('重点关注', args.get('concern')))
+    filters['has_error'] = parse_bool(args.get('has_error'))
+    for name in ('min_score', 'max_score'):
+        value = args.get(name)
+        if value is not None:
+            try:
+                filters[name] = float(value)
+            except ValueError:
+                raise QueryError(f"{name} 必须是数字")
+    for name in ('since', 'until'):
+        value = args.get(name)
+        if value:
+            filters[name] = parse_time(value)
+    # period 为 today / week / month 时从本日、本周一或本月一日零点开始
+    period = args.get('period')
+    if period:
+        today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        starts = {
+            'today': today,
+            'week': today - timedelta(days=today.weekday()),
+            'month': today.replace(day=1),
+        }
+        if period not in starts:
+            raise QueryError(f"不支持的时间范围: {period}")
+        filters['since'] = max(filters.get('since') or 0, starts[period].timestamp())
+    return filters
+
+@app.route('/results', methods=['GET'])
+def query_results():
+    if result_store is None:
+        return jsonify({"error": "结果库未启用"}), 404
+    try:
+        started = time.perf_counter()
+        page = result_store.query(
+            result_filters(request.args),
+            page=request.args.get('page', 1, type=int),
+            page_size=request.args.get('page_size', 50, type=int),
+            order=request.args.get('order', 'created_at_desc'),
+        )
+    except QueryError as e:
+        return jsonify({"error": str(e)}), 400
+    page["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    return jsonify(page)
+
+@app.route('/results/<int:result_id>', methods=['GET'])
+def get_result(result_id):
+    if result_store is None:
+        return jsonify({"error": "结果库未启用"}), 404
+    row = result_store.get(result_id)
+    if row is None:
+        return jsonify({"error": "结果不存在"}), 404
+    return jsonify(row)
+
+@app.route('/results/stats', methods=['GET'])
+def result_stats():
+    if result_store is None:
+        return jsonify({"error": "结果库未启用"}), 404
+    try:
+        started = time.perf_counter()
+        filters = result_filters(request.args)
+        group_by = request.args.getlist('group_by') or ['risk_level', 'handling_suggestion', 'concern']
+        groups = {name: result_store.aggregate(filters, name) for name in group_by}
+    except QueryError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({
+        "total": sum(entry["count"] for entry in groups[group_by[0]]),
+        "groups": groups,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+    })
+
+@app.route('/results/export', methods=['GET'])
+def export_results():
+    # 结果库中符合过滤条件的结果导出为 Parquet / Arrow，过滤条件同 /results
+    if result_store is None:
+        return jsonify({"error": "结果库未启用"}), 404
+    output_format = request.args.get('format', 'parquet')
+    if output_format not in COLUMNAR_FORMATS:
+        return jsonify({"error": f"不支持的导出格式: {output_format}"}), 400
+    try:
+        filters = result_filters(request.args)
+    except QueryError as e:
+        return jsonify({"error": str(e)}), 400
+    return columnar_response(store_records(result_store, filters), output_format, '评分结果')
+
+@app.route('/results/rollup', methods=['GET'])
+def rollup_results():
+    # 按部门、类别等分组统计评分明细（各维度平均分、各项比例、风险等级分布），过滤条件同 /results
+    if result_store is None:
+        return jsonify({"error": "结果库未启用"}), 404
+    try:
+        started = time.perf_counter()
+        by = request.args.getlist('by') or ['department']
+        unknown = [name for name in by if name not in ROLLUP_KEYS]
+        if unknown:
+            raise QueryError(f"不支持的分组字段: {', '.join(unknown)}，可选: {', '.join(ROLLUP_KEYS)}")
+        table = collect_table(store_records(result_store, result_filters(request.args)))
+        groups = rollup(table, by)
+    except ImportError:
+        return jsonify({"error": "未安装 pyarrow，无法进行分组统计"}), 501
+    except (QueryError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({
+        "by": by,
+        "total": table.num_rows,
+        "groups": groups,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+    })
+
+@app.route('/results/reevaluate', methods=['POST'])
+def reevaluate_results():
+    # 按当前负面词表和阈值重新计算已保存的结果，不调用模型；过滤条件同 /results
+    if result_store is None:
+        return jsonify({"error": "结果库未启用"}), 404
+    options = request.get_json(silent=True) or {}
+    try:
+        summary = reevaluate(
+            result_store,
+            negative_words_store.snapshot(),
+            build_thresholds(options.get('thresholds')),
+            filters=result_filters(request.args),
+            full=bool(options.get('full')),
+            dry_run=bool(options.get('dry_run')),
+        )
+    except (QueryError, ValueError, TypeError) as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(summary)
+
 @app.route('/health', methods=['GET'])
 def health_check():
     return jsonify({"status": "ok"})
 
+@app.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    if result_cache is None:
+        return jsonify({"enabled": False})
+    return jsonify({"enabled": True, **result_cache.stats()})
+
+@app.route('/upstream/stats', methods=['GET'])
+def upstream_stats():
+    return jsonify(upstream_guard.stats())
+
+@app.route('/cascade/stats', methods=['GET'])
+def cascade_stats():
+    return jsonify({
+        "enabled": CASCADE_ENABLED,
+        "escalate_below": CASCADE_ESCALATE_BELOW,
+        **cascade_totals.summary(),
+    })
+
+@app.route('/dedup/stats', methods=['GET'])
+def dedup_stats():
+    if dedup_history is None:
+        return jsonify({"enabled": DEDUP_ENABLED, "history": None})
+    return jsonify({"enabled": DEDUP_ENABLED, "history": dedup_history.stats()})
+
+def collect_runtime_metrics():
+    # 缓存和上游调用已有各自的统计，输出指标时直接读取
+    upstream = upstream_guard.stats()
+    metrics = [
+        ('upstream_requests_total', 'counter', '上游模型调用次数（含重试）', [({}, upstream["requests"])]),
+        ('upstream_retries_total', 'counter', '上游模型调用重试次数', [({}, upstream["retries"])]),
+        ('upstream_failures_total', 'counter', '上游模型调用失败次数', [({}, upstream["failures"])]),
+        ('upstream_malformed_outputs_total', 'counter', '模型输出格式错误次数', [({}, upstream["malformed_outputs"])]),
+        ('upstream_fast_failures_total', 'counter', '熔断期间直接拒绝的调用次数', [({}, upstream["fast_failures"])]),
+        ('upstream_throttle_wait_seconds_total', 'counter', '限流等待的总秒数', [({}, upstream["throttle_wait_seconds"])]),
+        ('upstream_breaker_open_total', 'counter', '熔断器打开次数', [({}, upstream["breaker_open_count"])]),
+        ('upstream_breaker_state', 'gauge', '熔断器当前状态', [
+            ({"state": state}, 1 if upstream["breaker_state"] == state else 0)
+            for state in ('closed', 'open', 'half_open')
+        ]),
+    ]
+    if result_cache is not None:
+        cache = result_cache.stats()
+        metrics += [
+            ('result_cache_lookups_total', 'counter', '结果缓存查询次数，result 为 memory_hit / disk_hit / miss', [
+                ({"result": "memory_hit"}, cache["memory_hits"]),
+                ({"result": "disk_hit"}, cache["disk_hits"]),
+                ({"result": "miss"}, cache["misses"]),
+            ]),
+            ('result_cache_entries', 'gauge', '结果缓存条数', [
+                ({"tier": "memory"}, cache["memory_entries"]),
+                ({"tier": "disk"}, cache["disk_entries"]),
+            ]),
+        ]
+    return metrics
+
+registry.register_collector(collect_runtime_metrics)
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    return Response(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+@app.route('/prompt/preview', methods=['POST'])
+def prompt_preview():
+    # 查看单条工单实际发送的提示词及 token 估算，不调用模型
+    try:
+        data = request.json.get('data')
+        if not isinstance(data, dict):
+            return jsonify({"error": "data 必须是单条诉求数据"}), 400
+        rule_scores = compute_rule_scores([data])[0] or {}
+        local_typos = get_typo_detector().detect(str(data.get('诉求回复内容') or ''))
+        prompt = build_prompt(data, check_typos=not local_typos, rule_dimensions=tuple(rule_scores))
+        return jsonify({
+            "prompt_version": PROMPT_VERSION,
+            "messages": prompt.messages(),
+            "token_estimates": prompt.token_estimates(),
+        })
+    except Exception as e:
+        return jsonify({"error": f"生成提示词失败: {str(e)}"}), 500
+
 @app.route('/negative_words', methods=['GET'])
 def get_negative_words():
     config = load_negative_words()
@@ -377,11 +1071,10 @@ def get_negative_words():
 @app.route('/negative_words', methods=['POST'])
 def update_negative_words():
     try:
-        new_config = request.json
-        config_path = os.path.join(os.path.dirname(__file__), 'config', 'negative_words.json')
-        with open(config_path, 'w', encoding='utf-8') as f:
-            json.dump(new_config, f, ensure_ascii=False, indent=4)
-        return jsonify({"message": "更新成功"})
+        snapshot = negative_words_store.update(request.json)
+        return jsonify({"message": "更新成功", "version": snapshot.version})
+    except ValueError as e:
+        return jsonify({"error": f"配置格式错误: {str(e)}"}), 400
     except Exception as e:
         return jsonify({"error": f"更新失败: {str(e)}"}), 500
 
@@ -555,4 +1248,8 @@ def serve_api_guide():
         return f"文档加载失败: {str(e)}", 500
 
 if __name__ == "__main__":
+    # 评分日志中未结束的任务只在服务启动时续评，导入 app 的脚本和测试不会调用模型；
+    # 调试模式下重载监控进程不处理请求，只在实际服务的进程中续评
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        job_manager.recover()
     app.run(host='0.0.0.0', port=5001, debug=True) 
\ No newline at end of file
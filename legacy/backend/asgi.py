@@ -0,0 +1,313 @@
+"""
+异步服务模式（ASGI）
+
+    uvicorn asgi:application --host 0.0.0.0 --port 5001
+    或 python asgi.py
+
+/batch_score、/batch_score/stream、/health 为原生异步路由：逐条评分时模型调用是协程，经进程内共享的
+keep-alive 连接池发出（见 async_backends.py），等待模型输出期间不占用线程，单进程可同时挂起成千上万个评分调用；
+结果缓存读写、提示词构建和结果解析后处理在线程池中执行，不阻塞事件循环。
+与同步模式的 /batch_score 相同，批量评分直接执行，不经过异步任务队列。
+限流、重试、熔断、结果缓存、结果库和运行指标与同步模式共用。
+启用合并评分、分级评分或近似重复检测的批次仍按同步流程在线程池中评分。
+其余路由（/negative_words、/api_guide、/jobs、/files、/results 等）由挂载的 Flask 应用处理，
+请求和响应与 python app.py 启动的服务完全一致。
+"""
+import os
+import json
+import time
+import asyncio
+import logging
+import contextlib
+
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool, iterate_in_threadpool
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Mount, Route
+
+from app import (
+    app as flask_app, MODEL, SYNC_BATCH_MAX_ITEMS, result_cache, job_manager,
+    batch_scorer, prepare_scoring, finish_scoring, model_error_result, record_usage, score_error_result,
+    cached_result, with_timings, open_store_writer, serialize_json, parse_bool,
+)
+from async_backends import get_async_backend, close_async_backend
+from backends import MODEL_STREAMING
+from cascade import CASCADE_ENABLED
+from config_store import negative_words_store
+from dedup import DEDUP_ENABLED
+from metrics import StageTimer, SCORING_RESULTS, HTTP_REQUEST_SECONDS
+from packing import PACKING_ENABLED
+from resilience import upstream_guard
+from rules import compute_rule_scores
+
+logger = logging.getLogger(__name__)
+
+# 进程内同时在途的异步评分数上限（远高于线程池模式，受上游限流约束）
+ASYNC_MAX_CONCURRENCY = int(os.getenv('ASYNC_MAX_CONCURRENCY', '2000'))
+# 单个批量请求的默认并发上限，请求中的 concurrency 只能调低
+ASYNC_BATCH_MAX_CONCURRENCY = int(os.getenv('ASYNC_BATCH_MAX_CONCURRENCY', '100'))
+# 挂载的 Flask 应用处理请求的线程数
+ASYNC_WSGI_WORKERS = int(os.getenv('ASYNC_WSGI_WORKERS', '16'))
+
+_global_limit = asyncio.Semaphore(ASYNC_MAX_CONCURRENCY)
+
+
+def resolve_concurrency(requested=None):
+    if requested is None:
+        return ASYNC_BATCH_MAX_CONCURRENCY
+    try:
+        requested = int(requested)
+    except (TypeError, ValueError):
+        return ASYNC_BATCH_MAX_CONCURRENCY
+    return max(1, min(requested, ASYNC_BATCH_MAX_CONCURRENCY))
+
+
+async def arequest_model(messages, max_tokens, input_tokens=0, model=MODEL, trace=None):
+    # 与 request_model 相同，只是等待模型输出、限流和退避时让出事件循环
+    backend = get_async_backend()
+
+    async def attempt():
+        response = await backend.complete(
+            messages,
+            model=model,
+            max_tokens=max_tokens,
+            temperature=0.1,
+            top_p=0.8,
+            stream=MODEL_STREAMING,
+            openers='{',
+        )
+        return record_usage(response, input_tokens, trace)
+
+    return await upstream_guard.acall(attempt, input_tokens=input_tokens)
+
+
+async def ascore_with_model(data, negative_words, rule_scores, timer):
+    # 错别字检测、提示词构建、结果解析和后处理是 CPU 计算，放到线程池执行，事件循环只等待模型输出
+    rule_scores, local_typos, prompt, max_tokens = await run_in_threadpool(prepare_scoring, data, rule_scores, timer)
+    try:
+        with timer.stage('model'):
+            response = await arequest_model(prompt.messages(), max_tokens, input_tokens=prompt.total_tokens)
+        return await run_in_threadpool(
+            finish_scoring, response, data, negative_words, rule_scores, local_typos, timer
+        )
+    except Exception as e:
+        return model_error_result(e)
+
+
+async def acall_model(data, negative_words, rule_scores=None, timings=False):
+    """call_model 的异步版本（不含分级评分）"""
+    timer = StageTimer()
+    if result_cache is None:
+        return with_timings(await ascore_with_model(data, negative_words, rule_scores, timer), timer, timings)
+    # 结果缓存读写 SQLite 并持有锁，不在事件循环上执行
+    with timer.stage('cache'):
+        key, cached = await run_in_threadpool(cached_result, data, negative_words)
+    if cached is not None:
+        SCORING_RESULTS.inc(source='cache')
+        return with_timings(cached, timer, timings)
+    result = await ascore_with_model(data, negative_words, rule_scores, timer)
+    await run_in_threadpool(result_cache.put, key, result)
+    return with_timings(result, timer, timings)
+
+
+def native_batch(payload):
+    # 合并评分、分级评分和近似重复检测依赖整批的同步流程，只有三者都未启用时走原生异步评分
+    def enabled(name, default):
+        value = payload.get(name)
+        return default if value is None else bool(value)
+    return not (enabled('pack', PACKING_ENABLED) or enabled('cascade', CASCADE_ENABLED)
+                or enabled('dedup', DEDUP_ENABLED))
+
+
+def score_coroutines(data, concurrency, timings, snapshot):
+    """为每条工单创建评分协程，返回 [(序号, 结果) 的 awaitable]"""
+    rule_scores = [scores or {} for scores in compute_rule_scores(data)]
+    batch_limit = asyncio.Semaphore(concurrency)
+
+    async def score(index):
+        item = data[index]
+        async with batch_limit, _global_limit:
+            try:
+                if not isinstance(item, dict):
+                    raise TypeError("诉求数据必须是 JSON 对象")
+                return index, await acall_model(item, snapshot, rule_scores[index], timings)
+            except Exception as e:
+                return index, score_error_result(item, e)
+
+    return [score(index) for index in range(len(data))]
+
+
+def write_results(data, pairs, snapshot):
+    _, writer = open_store_writer(snapshot)
+    if writer is None:
+        return
+    for index, result in pairs:
+        writer.add(index, data[index], result)
+    writer.close()
+
+
+def want_timings(request, payload):
+    return bool(payload.get('timings')) or bool(parse_bool(request.query_params.get('timings')))
+
+
+def timed(endpoint):
+    """记录原生路由的 http_request_seconds（挂载的 Flask 路由由 Flask 自己记录）"""
+    def decorator(handler):
+        async def wrapper(request):
+            started = time.perf_counter()
+            status = 500
+            try:
+                response = await handler(request)
+                status = response.status_code
+                return response
+            finally:
+                HTTP_REQUEST_SECONDS.observe(
+                    time.perf_counter() - started, endpoint=endpoint, method=request.method, status=status
+                )
+        return wrapper
+    return decorator
+
+
+def json_response(value, status_code=200, headers=None):
+    return Response(serialize_json(value), status_code=status_code, headers=headers, media_type='application/json')
+
+
+async def read_batch(request):
+    """返回 (请求体, 诉求数据, 错误响应)"""
+    payload = await request.json()
+    data = payload.get('data', [])
+    if not data:
+        return payload, data, json_response({"error": "没有接收到数据"}, 400)
+    return payload, data, None
+
+
+@timed('batch_score')
+async def batch_score(request):
+    try:
+        payload, data, error = await read_batch(request)
+        if error is not None:
+            return error
+        if SYNC_BATCH_MAX_ITEMS and len(data) > SYNC_BATCH_MAX_ITEMS:
+            return json_response({
+                "error": f"同步评分每批最多 {SYNC_BATCH_MAX_ITEMS} 条，请改用 /jobs 接口提交异步任务"
+            }, 413)
+        timings = want_timings(request, payload)
+        headers = {}
+        snapshot = negative_words_store.snapshot()
+        if native_batch(payload):
+            pairs = await asyncio.gather(
+                *score_coroutines(data, resolve_concurrency(payload.get('concurrency')), timings, snapshot)
+            )
+        else:
+            run = batch_scorer(
+                data, payload.get('pack'), snapshot, timings=timings,
+                cascade=payload.get('cascade'), dedup=payload.get('dedup'),
+            )
+            pairs = await run_in_threadpool(lambda: list(run(data, payload.get('concurrency'))))
+            for name, report in run.reports.items():
+                headers[f'X-{name.capitalize()}-Summary'] = json.dumps(report.summary())
+        results = [None] * len(data)
+        for index, result in pairs:
+            results[index] = result
+        await run_in_threadpool(write_results, data, pairs, snapshot)
+        return json_response(results, headers=headers)
+    except Exception as e:
+        return json_response({"error": f"处理请求时出错: {str(e)}"}, 500)
+
+
+@timed('batch_score_stream')
+async def batch_score_stream(request):
+    try:
+        payload, data, error = await read_batch(request)
+        if error is not None:
+            return error
+        use_sse = (request.query_params.get('format') == 'sse'
+                   or request.headers.get('accept', '').split(',')[0].strip() == 'text/event-stream')
+        timings = want_timings(request, payload)
+        run = None
+        snapshot = negative_words_store.snapshot()
+        if native_batch(payload):
+            pending = score_coroutines(data, resolve_concurrency(payload.get('concurrency')), timings, snapshot)
+        else:
+            run = batch_scorer(
+                data, payload.get('pack'), snapshot, timings=timings,
+                cascade=payload.get('cascade'), dedup=payload.get('dedup'),
+            )
+    except Exception as e:
+        return json_response({"error": f"处理请求时出错: {str(e)}"}, 500)
+
+    run_id, writer = open_store_writer(snapshot)
+
+    async def completed_results():
+        if run is not None:
+            async for pair in iterate_in_threadpool(run(data, payload.get('concurrency'))):
+                yield pair
+            return
+        tasks = [asyncio.ensure_future(awaitable) for awaitable in pending]
+        try:
+            for future in asyncio.as_completed(tasks):
+                yield await future
+        finally:
+            # 客户端断开时取消尚未完成的评分
+            for task in tasks:
+                task.cancel()
+
+    async def generate():
+        completed = 0
+        try:
+            async for index, result in completed_results():
+                completed += 1
+                if writer is not None:
+                    await run_in_threadpool(writer.add, index, data[index], result)
+                line = serialize_json({"index": index, "result": result})
+                yield f"event: result\ndata: {line}\n\n" if use_sse else line + "\n"
+        finally:
+            if writer is not None:
+                await run_in_threadpool(writer.close)
+        summary = {"done": True, "job_id": run_id, "total": len(data), "completed": completed}
+        for name, report in (run.reports.items() if run is not None else ()):
+            summary[name] = report.summary()
+        summary = json.dumps(summary, ensure_ascii=False)
+        yield f"event: done\ndata: {summary}\n\n" if use_sse else summary + "\n"
+
+    media_type = 'text/event-stream' if use_sse else 'application/x-ndjson'
+    return StreamingResponse(generate(), media_type=media_type, headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+    })
+
+
+@timed('health_check')
+async def health_check(request):
+    return JSONResponse({"status": "ok"})
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    # 服务启动时续评评分日志中未结束的任务（只读取日志并重新入队，评分在任务线程中进行）
+    await run_in_threadpool(job_manager.recover)
+    yield
+    # 退出时关闭共享的模型连接池
+    await close_async_backend()
+
+
+# 原生路由单独处理跨域，避免与 Flask 应用的 flask-cors 重复添加响应头
+_cors = [Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*'])]
+
+application = Starlette(
+    routes=[
+        Route('/batch_score', batch_score, methods=['POST', 'OPTIONS'], middleware=_cors),
+        Route('/batch_score/stream', batch_score_stream, methods=['POST', 'OPTIONS'], middleware=_cors),
+        Route('/health', health_check, methods=['GET', 'OPTIONS'], middleware=_cors),
+        Mount('/', app=WSGIMiddleware(flask_app, workers=ASYNC_WSGI_WORKERS)),
+    ],
+    lifespan=lifespan,
+)
+
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(application, host='0.0.0.0', port=int(os.getenv('PORT', '5001')))
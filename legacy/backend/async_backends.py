@@ -0,0 +1,222 @@
+"""
+异步评分模型后端（ASGI 服务模式使用）
+
+与 backends.py 的后端接口一致，complete() 为协程，返回同样的 BackendResponse：
+- openai：OpenAI 兼容接口，进程内共用一个 httpx.AsyncClient 连接池（keep-alive，可用时启用 HTTP/2），
+  同一进程可以同时挂起成千上万个模型调用而不占用线程
+- dashscope：经 DashScope 的 OpenAI 兼容模式接口调用，同样走共享连接池
+- fake：进程内模拟模型，延迟用 asyncio.sleep 模拟
+
+后端选择与同步模式相同（SCORING_BACKEND），在首次调用时创建。
+"""
+import os
+import json
+import logging
+import contextlib
+
+from backends import (
+    SCORING_BACKEND, OPENAI_BASE_URL, OPENAI_API_KEY, OPENAI_TIMEOUT,
+    FAKE_LLM_LATENCY_MS, FAKE_LLM_JITTER_MS, FAKE_LLM_ERROR_RATE, FAKE_LLM_MALFORMED_RATE, FAKE_LLM_SEED,
+    BackendConfigError, BackendResponse,
+)
+from fake_llm import FakeModel
+from prompt_builder import estimate_tokens
+from stream_parser import aread_json_stream
+
+logger = logging.getLogger(__name__)
+
+DASHSCOPE_COMPATIBLE_URL = os.getenv('DASHSCOPE_COMPATIBLE_URL', 'https://dashscope.aliyuncs.com/compatible-mode/v1')
+# 连接池上限：同时打开的连接数和保持空闲的 keep-alive 连接数（HTTP/2 下一个连接可承载多个并发请求）
+ASYNC_MAX_CONNECTIONS = int(os.getenv('ASYNC_MAX_CONNECTIONS', '200'))
+ASYNC_MAX_KEEPALIVE = int(os.getenv('ASYNC_MAX_KEEPALIVE', '50'))
+ASYNC_KEEPALIVE_EXPIRY = float(os.getenv('ASYNC_KEEPALIVE_EXPIRY', '30'))
+ASYNC_HTTP2 = os.getenv('ASYNC_HTTP2', '1') == '1'
+
+
+class AsyncBackend:
+    name = None
+
+    async def complete(self, messages, model, max_tokens, temperature=0.1, top_p=0.8, stream=False, openers='{['):
+        if not stream:
+            return await self._complete(messages, model, max_tokens, temperature, top_p)
+        usage = {}
+        async with self._stream(messages, model, max_tokens, temperature, top_p, usage) as (status_code, code, chunks):
+            if status_code != 200:
+                return BackendResponse(status_code, code=code)
+            content = await aread_json_stream(chunks, openers)
+        return BackendResponse(200, content=content, usage={
+            "input_tokens": usage.get('input_tokens', 0),
+            "output_tokens": estimate_tokens(content),
+        })
+
+    async def _complete(self, messages, model, max_tokens, temperature, top_p):
+        raise NotImplementedError
+
+    def _stream(self, messages, model, max_tokens, temperature, top_p, usage):
+        """异步上下文管理器，产出 (状态码, 错误码, 异步文本增量迭代器)；退出时释放连接"""
+        raise NotImplementedError
+
+    async def aclose(self):
+        pass
+
+
+class AsyncOpenAICompatibleBackend(AsyncBackend):
+    name = 'openai'
+
+    def __init__(self, base_url=OPENAI_BASE_URL, api_key=OPENAI_API_KEY, timeout=OPENAI_TIMEOUT, extra_body=None):
+        import httpx
+        self.url = base_url.rstrip('/') + '/chat/completions'
+        self.extra_body = extra_body or {}
+        headers = {"Content-Type": "application/json"}
+        if api_key:
+            headers["Authorization"] = f"Bearer {api_key}"
+        http2 = ASYNC_HTTP2
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                logger.warning("未安装 h2，异步模型调用使用 HTTP/1.1 连接池")
+                http2 = False
+        self._client = httpx.AsyncClient(
+            headers=headers,
+            timeout=httpx.Timeout(timeout, connect=min(timeout, 10.0)),
+            limits=httpx.Limits(
+                max_connections=ASYNC_MAX_CONNECTIONS,
+                max_keepalive_connections=ASYNC_MAX_KEEPALIVE,
+                keepalive_expiry=ASYNC_KEEPALIVE_EXPIRY,
+            ),
+            http2=http2,
+        )
+
+    def _body(self, messages, model, max_tokens, temperature, top_p, stream):
+        return json.dumps(dict({
+            "model": model,
+            "messages": messages,
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+            "top_p": top_p,
+            "stream": stream,
+        }, **self.extra_body), ensure_ascii=False).encode('utf-8')
+
+    @staticmethod
+    def _error_code(response, body):
+        try:
+            code = json.loads(body).get('error', {}).get('code', '')
+        except Exception:
+            code = ''
+        return code or response.reason_phrase
+
+    async def _complete(self, messages, model, max_tokens, temperature, top_p):
+        response = await self._client.post(
+            self.url, content=self._body(messages, model, max_tokens, temperature, top_p, False)
+        )
+        if response.status_code != 200:
+            return BackendResponse(response.status_code, code=self._error_code(response, response.content))
+        payload = response.json()
+        usage = payload.get('usage') or {}
+        return BackendResponse(
+            200,
+            content=payload['choices'][0]['message']['content'],
+            usage={
+                "input_tokens": usage.get('prompt_tokens', 0),
+                "output_tokens": usage.get('completion_tokens', 0),
+            },
+        )
+
+    @contextlib.asynccontextmanager
+    async def _stream(self, messages, model, max_tokens, temperature, top_p, usage):
+        request = self._client.build_request(
+            'POST', self.url, content=self._body(messages, model, max_tokens, temperature, top_p, True)
+        )
+        response = await self._client.send(request, stream=True)
+        try:
+            if response.status_code != 200:
+                yield response.status_code, self._error_code(response, await response.aread()), None
+                return
+
+            async def chunks():
+                # 服务端推送 SSE：每行 data: {...}，以 data: [DONE] 结束；提前退出时由外层关闭响应
+                async for line in response.aiter_lines():
+                    line = line.strip()
+                    if not line.startswith('data:'):
+                        continue
+                    data = line[5:].strip()
+                    if data == '[DONE]':
+                        return
+                    event = json.loads(data)
+                    if event.get('usage'):
+                        usage["input_tokens"] = event['usage'].get('prompt_tokens', 0)
+                    choices = event.get('choices') or [{}]
+                    yield (choices[0].get('delta') or {}).get('content') or ''
+
+            yield 200, '', chunks()
+        finally:
+            await response.aclose()
+
+    async def aclose(self):
+        await self._client.aclose()
+
+
+class AsyncDashScopeBackend(AsyncOpenAICompatibleBackend):
+    """DashScope SDK 没有异步接口，改用其 OpenAI 兼容模式，参数与同步后端一致（开启联网搜索）"""
+
+    name = 'dashscope'
+
+    def __init__(self, api_key=None):
+        api_key = api_key or os.getenv('DASHSCOPE_API_KEY')
+        if not api_key:
+            raise BackendConfigError("请在 .env 文件中设置 DASHSCOPE_API_KEY")
+        super().__init__(DASHSCOPE_COMPATIBLE_URL, api_key, extra_body={"enable_search": True})
+
+
+class AsyncFakeBackend(AsyncBackend):
+    name = 'fake'
+
+    def __init__(self, model=None):
+        self.model = model or FakeModel(
+            FAKE_LLM_LATENCY_MS, FAKE_LLM_JITTER_MS, FAKE_LLM_ERROR_RATE, FAKE_LLM_MALFORMED_RATE, FAKE_LLM_SEED
+        )
+
+    async def _complete(self, messages, model, max_tokens, temperature, top_p):
+        status, content, usage = await self.model.acomplete(messages)
+        if status != 200:
+            return BackendResponse(status, code='ServiceUnavailable', usage=usage)
+        return BackendResponse(200, content=content, usage=usage)
+
+    @contextlib.asynccontextmanager
+    async def _stream(self, messages, model, max_tokens, temperature, top_p, usage):
+        status, chunks, reported = await self.model.astream(messages)
+        usage["input_tokens"] = reported["input_tokens"]
+        if status != 200:
+            yield status, 'ServiceUnavailable', None
+            return
+        yield 200, '', chunks
+
+
+ASYNC_BACKENDS = {
+    'dashscope': AsyncDashScopeBackend,
+    'openai': AsyncOpenAICompatibleBackend,
+    'fake': AsyncFakeBackend,
+}
+
+_backend = None
+
+
+def get_async_backend():
+    # 只在事件循环线程中调用，无需加锁
+    global _backend
+    if _backend is None:
+        factory = ASYNC_BACKENDS.get(SCORING_BACKEND)
+        if factory is None:
+            raise BackendConfigError(f"未知的 SCORING_BACKEND: {SCORING_BACKEND}")
+        _backend = factory()
+        logger.info(f"异步评分模型后端: {_backend.name}")
+    return _backend
+
+
+async def close_async_backend():
+    """关闭共享连接池（服务退出时调用）"""
+    global _backend
+    if _backend is not None:
+        await _backend.aclose()
+        _backend = None
@@ -0,0 +1,256 @@
+"""
+评分模型后端
+
+所有后端实现同一个 complete() 接口，返回统一的 BackendResponse。
+stream=True 时以流式读取输出，顶层 JSON 闭合后立即停止读取（见 stream_parser.py）：
+- dashscope：阿里云 DashScope SDK（默认）
+- openai：任意 OpenAI 兼容的 HTTP 接口，也可指向本地模拟服务（fake_llm.py）
+- fake：进程内模拟模型，无需网络，用于压测和基准测试
+
+通过环境变量 SCORING_BACKEND 选择。后端在首次调用时才创建，
+缺少 DASHSCOPE_API_KEY 不再导致模块导入失败，只会让对应的评分返回兜底结果。
+"""
+import os
+import json
+import logging
+import threading
+import urllib.request
+import urllib.error
+
+from fake_llm import FakeModel
+from prompt_builder import estimate_tokens
+from stream_parser import read_json_stream
+
+logger = logging.getLogger(__name__)
+
+SCORING_BACKEND = os.getenv('SCORING_BACKEND', 'dashscope')
+OPENAI_BASE_URL = os.getenv('OPENAI_BASE_URL', 'https://dashscope.aliyuncs.com/compatible-mode/v1')
+OPENAI_API_KEY = os.getenv('OPENAI_API_KEY') or os.getenv('DASHSCOPE_API_KEY', '')
+OPENAI_TIMEOUT = float(os.getenv('OPENAI_TIMEOUT', '120'))
+FAKE_LLM_LATENCY_MS = float(os.getenv('FAKE_LLM_LATENCY_MS', '0'))
+FAKE_LLM_JITTER_MS = float(os.getenv('FAKE_LLM_JITTER_MS', '0'))
+FAKE_LLM_ERROR_RATE = float(os.getenv('FAKE_LLM_ERROR_RATE', '0'))
+FAKE_LLM_MALFORMED_RATE = float(os.getenv('FAKE_LLM_MALFORMED_RATE', '0'))
+FAKE_LLM_SEED = int(os.getenv('FAKE_LLM_SEED', '0'))
+# 是否以流式方式读取模型输出
+MODEL_STREAMING = os.getenv('MODEL_STREAMING', '1') == '1'
+
+
+class BackendConfigError(Exception):
+    pass
+
+
+class BackendResponse:
+    __slots__ = ('status_code', 'code', 'content', 'usage')
+
+    def __init__(self, status_code, content='', code='', usage=None):
+        self.status_code = status_code
+        self.content = content
+        self.code = code
+        # {"input_tokens": ..., "output_tokens": ...}
+        self.usage = usage or {}
+
+
+class Backend:
+    name = None
+
+    def complete(self, messages, model, max_tokens, temperature=0.1, top_p=0.8, stream=False, openers='{['):
+        if not stream:
+            return self._complete(messages, model, max_tokens, temperature, top_p)
+        usage = {}
+        status_code, code, chunks = self._open_stream(messages, model, max_tokens, temperature, top_p, usage)
+        if status_code != 200:
+            return BackendResponse(status_code, code=code)
+        content = read_json_stream(chunks, openers)
+        # 提前停止读取时拿不到完整的用量统计：输入以流中已返回的为准，输出按已读内容估算
+        return BackendResponse(200, content=content, usage={
+            "input_tokens": usage.get('input_tokens', 0),
+            "output_tokens": estimate_tokens(content),
+        })
+
+    def _complete(self, messages, model, max_tokens, temperature, top_p):
+        raise NotImplementedError
+
+    def _open_stream(self, messages, model, max_tokens, temperature, top_p, usage):
+        """返回 (状态码, 错误码, 文本增量迭代器)；服务端在流中返回用量时写入 usage"""
+        raise NotImplementedError
+
+
+class DashScopeBackend(Backend):
+    name = 'dashscope'
+
+    def __init__(self, api_key=None):
+        import dashscope
+        from dashscope import Generation
+        api_key = api_key or os.getenv('DASHSCOPE_API_KEY')
+        if not api_key:
+            raise BackendConfigError("请在 .env 文件中设置 DASHSCOPE_API_KEY")
+        dashscope.api_key = api_key
+        self._generation = Generation
+
+    def _call(self, messages, model, max_tokens, temperature, top_p, **options):
+        return self._generation.call(
+            model=model,
+            messages=messages,
+            result_format='message',
+            temperature=temperature,
+            max_tokens=max_tokens,
+            top_p=top_p,
+            enable_search=True,
+            **options
+        )
+
+    def _complete(self, messages, model, max_tokens, temperature, top_p):
+        response = self._call(messages, model, max_tokens, temperature, top_p)
+        if response.status_code != 200:
+            return BackendResponse(response.status_code, code=response.code)
+        usage = response.usage or {}
+        return BackendResponse(
+            200,
+            content=response.output.choices[0].message.content,
+            usage={
+                "input_tokens": usage.get('input_tokens', 0),
+                "output_tokens": usage.get('output_tokens', 0),
+            },
+        )
+
+    def _open_stream(self, messages, model, max_tokens, temperature, top_p, usage):
+        responses = iter(self._call(messages, model, max_tokens, temperature, top_p,
+                                    stream=True, incremental_output=True))
+        first = next(responses)
+        if first.status_code != 200:
+            return first.status_code, first.code, None
+
+        def chunks():
+            response = first
+            while True:
+                if response.status_code != 200:
+                    raise RuntimeError(f"流式响应中断: {response.code}")
+                if response.usage:
+                    usage["input_tokens"] = response.usage.get('input_tokens', 0)
+                yield response.output.choices[0].message.content or ''
+                response = next(responses, None)
+                if response is None:
+                    return
+
+        return 200, '', chunks()
+
+
+class OpenAICompatibleBackend(Backend):
+    name = 'openai'
+
+    def __init__(self, base_url=OPENAI_BASE_URL, api_key=OPENAI_API_KEY, timeout=OPENAI_TIMEOUT):
+        self.url = base_url.rstrip('/') + '/chat/completions'
+        self.api_key = api_key
+        self.timeout = timeout
+
+    def _open(self, messages, model, max_tokens, temperature, top_p, stream):
+        """返回 (状态码, 错误码, HTTP 响应)"""
+        body = json.dumps({
+            "model": model,
+            "messages": messages,
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+            "top_p": top_p,
+            "stream": stream,
+        }, ensure_ascii=False).encode('utf-8')
+        headers = {"Content-Type": "application/json"}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+        request = urllib.request.Request(self.url, data=body, headers=headers, method='POST')
+        try:
+            return 200, '', urllib.request.urlopen(request, timeout=self.timeout)
+        except urllib.error.HTTPError as e:
+            try:
+                code = json.loads(e.read()).get('error', {}).get('code', '')
+            except Exception:
+                code = ''
+            return e.code, code or e.reason, None
+
+    def _complete(self, messages, model, max_tokens, temperature, top_p):
+        status_code, code, response = self._open(messages, model, max_tokens, temperature, top_p, False)
+        if status_code != 200:
+            return BackendResponse(status_code, code=code)
+        with response:
+            payload = json.loads(response.read())
+        usage = payload.get('usage') or {}
+        return BackendResponse(
+            200,
+            content=payload['choices'][0]['message']['content'],
+            usage={
+                "input_tokens": usage.get('prompt_tokens', 0),
+                "output_tokens": usage.get('completion_tokens', 0),
+            },
+        )
+
+    def _open_stream(self, messages, model, max_tokens, temperature, top_p, usage):
+        status_code, code, response = self._open(messages, model, max_tokens, temperature, top_p, True)
+        if status_code != 200:
+            return status_code, code, None
+
+        def chunks():
+            # 服务端推送 SSE：每行 data: {...}，以 data: [DONE] 结束；关闭迭代器即断开连接
+            with response:
+                for raw in response:
+                    line = raw.decode('utf-8').strip()
+                    if not line.startswith('data:'):
+                        continue
+                    data = line[5:].strip()
+                    if data == '[DONE]':
+                        return
+                    choices = json.loads(data).get('choices') or [{}]
+                    yield (choices[0].get('delta') or {}).get('content') or ''
+
+        return 200, '', chunks()
+
+
+class FakeBackend(Backend):
+    name = 'fake'
+
+    def __init__(self, model=None):
+        self.model = model or FakeModel(
+            FAKE_LLM_LATENCY_MS, FAKE_LLM_JITTER_MS, FAKE_LLM_ERROR_RATE, FAKE_LLM_MALFORMED_RATE, FAKE_LLM_SEED
+        )
+
+    def _complete(self, messages, model, max_tokens, temperature, top_p):
+        status, content, usage = self.model.complete(messages)
+        if status != 200:
+            return BackendResponse(status, code='ServiceUnavailable', usage=usage)
+        return BackendResponse(200, content=content, usage=usage)
+
+    def _open_stream(self, messages, model, max_tokens, temperature, top_p, usage):
+        status, chunks, reported = self.model.stream(messages)
+        usage["input_tokens"] = reported["input_tokens"]
+        if status != 200:
+            return status, 'ServiceUnavailable', None
+        return 200, '', chunks
+
+
+BACKENDS = {
+    'dashscope': DashScopeBackend,
+    'openai': OpenAICompatibleBackend,
+    'fake': FakeBackend,
+}
+
+_lock = threading.Lock()
+_backend = None
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _lock:
+            if _backend is None:
+                factory = BACKENDS.get(SCORING_BACKEND)
+                if factory is None:
+                    raise BackendConfigError(f"未知的 SCORING_BACKEND: {SCORING_BACKEND}")
+                _backend = factory()
+                logger.info(f"评分模型后端: {_backend.name}")
+    return _backend
+
+
+def set_backend(backend):
+    """替换当前后端（基准测试中使用）"""
+    global _backend
+    with _lock:
+        _backend = backend
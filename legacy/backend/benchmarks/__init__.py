@@ -0,0 +1,7 @@
+"""
+性能基准测试
+
+在 legacy/backend 目录下以模块方式运行，例如：
+    python -m benchmarks.negative_words
+    python -m benchmarks.pipeline --rows 100000 --output data/bench.json
+"""
@@ -0,0 +1,92 @@
+"""
+负面词语扫描基准：自动机 vs 逐词查找（两者都输出全部命中位置，结果逐条比对）。
+MultiPatternMatcher 在词数不超过 NAIVE_MAX_PATTERNS 时改用逐词查找，该阈值取自本基准。
+
+    python -m benchmarks.negative_words --rows 100000 --extra-words 0 1000
+"""
+import time
+import random
+import argparse
+
+from config_store import negative_words_store, NegativeWordsSnapshot
+from text_matcher import MultiPatternMatcher
+
+REPLY_FRAGMENTS = [
+    "您好，您反映的问题已收悉。",
+    "经核实，该路段路灯已于昨日修复。",
+    "我们已安排工作人员到现场查看，",
+    "感谢您对我们工作的支持与理解。",
+    "根据相关规定，该事项需提交书面材料，",
+    "如有疑问请拨打咨询电话。",
+    "后续我们将加强日常巡查，",
+    "社区将协调物业尽快处理。",
+]
+
+
+def build_replies(rows, words, hit_rate=0.1, seed=42):
+    rng = random.Random(seed)
+    replies = []
+    for _ in range(rows):
+        parts = rng.sample(REPLY_FRAGMENTS, rng.randint(2, 5))
+        if words and rng.random() < hit_rate:
+            parts.insert(rng.randrange(len(parts) + 1), rng.choice(words))
+        replies.append("".join(parts))
+    return replies
+
+
+def run(rows, extra_words):
+    base = negative_words_store.snapshot()
+    # 追加随机生成的词，考察词表规模对两种方法的影响
+    rng = random.Random(extra_words)
+    filler = ["".join(chr(rng.randint(0x4e00, 0x9fa5)) for _ in range(rng.randint(2, 4))) for _ in range(extra_words)]
+    config = {"负面词语": list(base.words) + filler, "分类": {k: list(v) for k, v in base.categories.items()}}
+    snapshot = NegativeWordsSnapshot(base.version, config)
+    words = list(snapshot.words)
+    replies = build_replies(rows, list(base.words))
+
+    started = time.perf_counter()
+    automaton = MultiPatternMatcher(words, naive=False)
+    build_seconds = time.perf_counter() - started
+    naive = MultiPatternMatcher(words, naive=True)
+
+    started = time.perf_counter()
+    automaton_matches = [automaton.find_all(text) for text in replies]
+    automaton_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    naive_matches = [naive.find_all(text) for text in replies]
+    naive_seconds = time.perf_counter() - started
+
+    assert automaton_matches == naive_matches
+    automaton_hits = sum(1 for matches in automaton_matches if matches)
+    return {
+        "rows": rows,
+        "words": len(words),
+        "build_ms": round(build_seconds * 1000, 2),
+        "automaton_s": round(automaton_seconds, 3),
+        "naive_s": round(naive_seconds, 3),
+        "automaton_rows_per_s": round(rows / automaton_seconds),
+        "naive_rows_per_s": round(rows / naive_seconds),
+        "hits": automaton_hits,
+        "selected": "naive" if MultiPatternMatcher(words).naive else "automaton",
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="负面词语扫描基准")
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--extra-words', type=int, nargs='+', default=[0, 1000])
+    args = parser.parse_args()
+
+    for extra in args.extra_words:
+        result = run(args.rows, extra)
+        print(
+            f"行数 {result['rows']} | 词数 {result['words']:>5} | "
+            f"构建 {result['build_ms']}ms | 自动机 {result['automaton_s']}s ({result['automaton_rows_per_s']} 行/秒) | "
+            f"逐词 {result['naive_s']}s ({result['naive_rows_per_s']} 行/秒) | 命中 {result['hits']} | "
+            f"默认 {result['selected']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
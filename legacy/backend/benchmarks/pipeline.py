@@ -0,0 +1,227 @@
+"""
+评分链路分阶段基准
+
+用合成数据逐条走完整条评分链路，分别计时：规则分计算、提示词构建、模型调用（模拟后端）、
+JSON 解析、结果校验与后处理、导出。输出各阶段的吞吐量和 p50/p95/p99，
+结果可保存为 JSON，并与之前某次提交的结果对比以发现性能回退。
+直接调用服务所用的模块（规则引擎、validation 中的本地检查和结果校验、提示词构建、模拟后端），
+不导入 app，不会初始化结果库、任务续评、近似重复历史和日志配置；各阶段用 metrics.StageTimer 计时。
+
+    python -m benchmarks.pipeline --rows 10000 --output data/bench.json
+    python -m benchmarks.pipeline --rows 10000 --compare data/bench.json
+"""
+import os
+import io
+import sys
+import csv
+import json
+import time
+import logging
+import argparse
+import platform
+import subprocess
+from array import array
+from itertools import islice
+
+import numpy as np
+
+from backends import FakeBackend
+from fake_llm import FakeModel
+from metrics import StageTimer
+from rules import compute_rule_scores
+from validation import local_checks, validate_result
+from prompt_builder import build_prompt
+from postprocess import SCORED_DIMENSIONS
+from config_store import negative_words_store
+from benchmarks.synthetic import generate_tickets
+
+STAGES = ('rules', 'prompt', 'model', 'parse', 'validate', 'export')
+# 以 rules 阶段的批量向量化计算为单位分块
+CHUNK_SIZE = 1000
+# 模拟后端不使用模型名，输出上限与服务相同
+MODEL = 'fake'
+MAX_TOKENS = 2000
+
+
+class StageSamples:
+    """汇总每条（rules 阶段为每块）的 StageTimer 耗时，计算各阶段的吞吐量和分位数"""
+
+    def __init__(self):
+        self.samples = {stage: array('d') for stage in STAGES}
+
+    def record(self, timer):
+        for stage, seconds in timer.stages.items():
+            self.samples[stage].append(seconds)
+
+    def summary(self, rows):
+        stages = {}
+        for stage, samples in self.samples.items():
+            if not samples:
+                continue
+            values = np.frombuffer(samples, dtype=float)
+            total = float(values.sum())
+            p50, p95, p99 = np.percentile(values, [50, 95, 99]) * 1000
+            stages[stage] = {
+                "samples": len(values),
+                "total_s": round(total, 4),
+                "rows_per_s": round(rows / total, 1) if total else None,
+                "p50_ms": round(float(p50), 4),
+                "p95_ms": round(float(p95), 4),
+                "p99_ms": round(float(p99), 4),
+            }
+        return stages
+
+
+def export_row(writer, index, result):
+    details = result.get('evaluation_details', {})
+    writer.writerow(
+        [index, result.get('score'), result.get('confidence'), result.get('重点关注'),
+         result.get('handling_suggestion'), result.get('risk_level')]
+        + [details.get(dim, {}).get('得分') for dim in SCORED_DIMENSIONS]
+        + [json.dumps(details, ensure_ascii=False)]
+    )
+
+
+def run(rows, seed=42, latency_ms=0.0, malformed_rate=0.0, export_path=None):
+    backend = FakeBackend(FakeModel(latency_ms=latency_ms, malformed_rate=malformed_rate, seed=seed))
+    snapshot = negative_words_store.snapshot()
+    samples = StageSamples()
+    counters = {"rows": 0, "parse_errors": 0, "model_errors": 0}
+    out = open(export_path, 'w', encoding='utf-8-sig', newline='') if export_path else io.StringIO()
+    writer = csv.writer(out)
+    clock = time.perf_counter
+
+    tickets = generate_tickets(rows, seed)
+    started = clock()
+    try:
+        while True:
+            chunk = list(islice(tickets, CHUNK_SIZE))
+            if not chunk:
+                break
+            timer = StageTimer()
+            with timer.stage('rules'):
+                rule_scores = [scores or {} for scores in compute_rule_scores(chunk)]
+            samples.record(timer)
+
+            for offset, data in enumerate(chunk):
+                index = counters["rows"]
+                counters["rows"] += 1
+                timer = StageTimer()
+                try:
+                    with timer.stage('prompt'):
+                        rules, local_typos = local_checks(data, rule_scores[offset])
+                        prompt = build_prompt(data, check_typos=not local_typos, rule_dimensions=tuple(rules))
+                        messages = prompt.messages()
+                    with timer.stage('model'):
+                        response = backend.complete(messages, model=MODEL, max_tokens=MAX_TOKENS)
+                    if response.status_code != 200:
+                        counters["model_errors"] += 1
+                        continue
+
+                    with timer.stage('parse'):
+                        try:
+                            parsed = json.loads(response.content)
+                        except json.JSONDecodeError:
+                            parsed = None
+                    if not isinstance(parsed, dict):
+                        counters["parse_errors"] += 1
+                        continue
+
+                    with timer.stage('validate'):
+                        result = validate_result(parsed, data, snapshot, rules, local_typos)
+                    with timer.stage('export'):
+                        export_row(writer, index, result)
+                finally:
+                    samples.record(timer)
+                if isinstance(out, io.StringIO) and out.tell() > (1 << 22):
+                    # 不写文件时丢弃已序列化的内容，避免大批量下占满内存
+                    out.seek(0)
+                    out.truncate()
+    finally:
+        out.close()
+    elapsed = clock() - started
+
+    return {
+        "meta": run_metadata(),
+        "params": {"rows": rows, "seed": seed, "latency_ms": latency_ms, "malformed_rate": malformed_rate},
+        "counters": counters,
+        "end_to_end": {
+            "seconds": round(elapsed, 3),
+            "rows_per_s": round(rows / elapsed, 1) if elapsed else None,
+        },
+        "stages": samples.summary(rows),
+    }
+
+
+def run_metadata():
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, timeout=5
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "commit": commit,
+        "timestamp": time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+    }
+
+
+def compare(current, baseline, tolerance):
+    """返回回退项列表：p95 变慢或吞吐量下降超过 tolerance（比例）"""
+    regressions = []
+    for stage, now in current["stages"].items():
+        before = baseline.get("stages", {}).get(stage)
+        if not before:
+            continue
+        if before["p95_ms"] and now["p95_ms"] > before["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{stage} p95 {before['p95_ms']}ms -> {now['p95_ms']}ms")
+        if before.get("rows_per_s") and now["rows_per_s"] < before["rows_per_s"] * (1 - tolerance):
+            regressions.append(f"{stage} 吞吐量 {before['rows_per_s']} -> {now['rows_per_s']} 行/秒")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="评分链路分阶段基准")
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--latency-ms', type=float, default=0.0, help="模拟模型的响应延迟")
+    parser.add_argument('--malformed-rate', type=float, default=0.0, help="模拟模型返回截断 JSON 的比例")
+    parser.add_argument('--export', help="导出结果的 CSV 路径，默认只在内存中序列化")
+    parser.add_argument('--output', help="把基准结果保存为 JSON")
+    parser.add_argument('--compare', help="与之前保存的 JSON 结果对比")
+    parser.add_argument('--tolerance', type=float, default=0.1, help="判定回退的相对变化幅度")
+    args = parser.parse_args()
+
+    # 评分链路的逐条日志会淹没基准输出
+    logging.getLogger().setLevel(logging.WARNING)
+
+    result = run(args.rows, args.seed, args.latency_ms, args.malformed_rate, args.export)
+    print(f"行数 {args.rows} | 总耗时 {result['end_to_end']['seconds']}s | {result['end_to_end']['rows_per_s']} 行/秒 | "
+          f"解析失败 {result['counters']['parse_errors']}")
+    print(f"{'阶段':<10}{'行/秒':>12}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for stage, stats in result["stages"].items():
+        print(f"{stage:<10}{stats['rows_per_s']:>12}{stats['p50_ms']:>10}{stats['p95_ms']:>10}{stats['p99_ms']:>10}")
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"结果已保存：{args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(result, baseline, args.tolerance)
+        base_commit = baseline.get("meta", {}).get("commit")
+        if regressions:
+            print(f"相对 {base_commit} 的性能回退：")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"相对 {base_commit} 无性能回退（容差 {args.tolerance:.0%}）")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+合成诉求数据生成
+
+按真实数据的字段结构生成任意规模（1 千到 100 万行）的诉求数据：类别、办理时长、回复长度各不相同，
+并按比例植入错别字和负面词语。同一参数和种子总是生成相同的数据。
+
+    python -m benchmarks.synthetic --rows 100000 --output data/synthetic.csv
+"""
+import os
+import csv
+import random
+import argparse
+
+from config_store import negative_words_store
+from typo_detector import get_typo_detector
+
+FIELDS = ('群众诉求文本', '诉求类别', '办理时长', '诉求回复内容', '办理人员自评', '与群众沟通情况')
+
+# (类别, 权重)
+CATEGORIES = [('咨询', 35), ('投诉', 30), ('求助', 15), ('建议', 10), ('举报', 10)]
+
+SUBJECTS = [
+    "小区垃圾清运不及时", "路灯损坏夜间无照明", "医保报销政策", "公交站台设置不合理",
+    "噪音扰民", "物业费收取标准", "道路积水", "学校招生政策", "违章停车占用消防通道",
+    "供暖温度不达标", "社保转移办理流程", "餐饮油烟污染", "自来水水质浑浊", "农民工工资拖欠",
+]
+
+REQUEST_TEMPLATES = [
+    "希望了解{subject}的相关规定。",
+    "反映{subject}，已持续一段时间，请尽快处理。",
+    "{subject}问题多次反映未解决，要求相关部门给出答复。",
+    "建议相关部门重视{subject}，加强管理。",
+]
+
+REPLY_FRAGMENTS = [
+    "您好，您反映的问题已收悉。",
+    "经核实，您反映的情况属实。",
+    "我们已安排工作人员到现场查看，",
+    "经现场核查，相关设施已于昨日修复。",
+    "根据相关规定，该事项需提交书面材料，",
+    "具体办理流程可在政务服务网站查询，",
+    "社区将协调物业尽快处理，",
+    "后续我们将加强日常巡查，",
+    "已责令相关单位限期整改，",
+    "如有疑问请拨打咨询电话。",
+    "感谢您对我们工作的支持与理解。",
+    "我们将持续跟进处理进展，",
+]
+
+SELF_ASSESSMENTS = ['已解决', '已解决', '已解决', '部分解决', '未解决']
+COMMUNICATIONS = ['已沟通且群众认可', '已沟通且群众认可', '已沟通但群众不认可', '未沟通']
+
+
+def _duration(rng, category):
+    # 多数工单在规定时限内办结，少量超期
+    if category == '咨询':
+        days = rng.choice([1, 1, 1, 2, 2, 3, 4, 5]) if rng.random() < 0.9 else rng.randint(6, 12)
+    else:
+        days = rng.randint(1, 15) if rng.random() < 0.9 else rng.randint(16, 30)
+    # 原始数据中两种写法都有
+    return days if rng.random() < 0.5 else f"{days}日"
+
+
+def _reply(rng, typos, negative_words, typo_rate, negative_rate):
+    # 回复长度呈长尾分布：大部分 2-6 句，少量长回复
+    sentences = min(len(REPLY_FRAGMENTS), max(1, int(rng.lognormvariate(1.3, 0.5))))
+    parts = rng.sample(REPLY_FRAGMENTS, sentences)
+    if typos and rng.random() < typo_rate:
+        parts.insert(rng.randrange(len(parts) + 1), f"请{rng.choice(typos)}。")
+    if negative_words and rng.random() < negative_rate:
+        parts.insert(rng.randrange(len(parts) + 1), f"{rng.choice(negative_words)}，")
+    return "".join(parts)
+
+
+def generate_tickets(rows, seed=42, typo_rate=0.05, negative_rate=0.05):
+    """逐条产出合成诉求数据，不在内存中保留整批数据"""
+    rng = random.Random(seed)
+    typos = sorted(get_typo_detector().corrections)
+    negative_words = list(negative_words_store.snapshot().words)
+    names = [name for name, _ in CATEGORIES]
+    weights = [weight for _, weight in CATEGORIES]
+    for _ in range(rows):
+        category = rng.choices(names, weights)[0]
+        yield {
+            '群众诉求文本': rng.choice(REQUEST_TEMPLATES).format(subject=rng.choice(SUBJECTS)),
+            '诉求类别': category,
+            '办理时长': _duration(rng, category),
+            '诉求回复内容': _reply(rng, typos, negative_words, typo_rate, negative_rate),
+            '办理人员自评': rng.choice(SELF_ASSESSMENTS),
+            '与群众沟通情况': rng.choice(COMMUNICATIONS),
+        }
+
+
+def write_tickets(path, tickets):
+    """按扩展名写出 CSV 或 xlsx，返回行数"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    if path.endswith('.xlsx'):
+        import pandas as pd
+        frame = pd.DataFrame(list(tickets), columns=list(FIELDS))
+        frame.to_excel(path, index=False)
+        return len(frame)
+    count = 0
+    with open(path, 'w', encoding='utf-8-sig', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDS)
+        writer.writeheader()
+        for ticket in tickets:
+            writer.writerow(ticket)
+            count += 1
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="生成合成诉求数据")
+    parser.add_argument('--rows', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--typo-rate', type=float, default=0.05, help="植入错别字的行占比")
+    parser.add_argument('--negative-rate', type=float, default=0.05, help="植入负面词语的行占比")
+    parser.add_argument('--output', default='data/synthetic.csv', help="输出文件，.csv 或 .xlsx")
+    args = parser.parse_args()
+
+    count = write_tickets(args.output, generate_tickets(args.rows, args.seed, args.typo_rate, args.negative_rate))
+    print(f"已生成 {count} 行：{args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""
+错别字本地检测吞吐量基准
+
+    python -m benchmarks.typos --rows 100000
+"""
+import time
+import argparse
+
+from typo_detector import get_typo_detector
+from benchmarks.negative_words import build_replies
+
+
+def run(rows, typo_rate):
+    detector = get_typo_detector()
+    wrong_forms = list(detector.corrections)
+    replies = build_replies(rows, wrong_forms, hit_rate=typo_rate)
+    total_chars = sum(len(text) for text in replies)
+
+    started = time.perf_counter()
+    flagged = sum(1 for text in replies if detector.detect(text))
+    seconds = time.perf_counter() - started
+    return {
+        "rows": rows,
+        "pairs": len(wrong_forms),
+        "chars": total_chars,
+        "seconds": round(seconds, 3),
+        "rows_per_s": round(rows / seconds),
+        "chars_per_s": round(total_chars / seconds),
+        "flagged": flagged,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="错别字本地检测吞吐量基准")
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--typo-rate', type=float, default=0.05, help="植入错别字的行占比")
+    args = parser.parse_args()
+
+    result = run(args.rows, args.typo_rate)
+    print(
+        f"行数 {result['rows']} | 词对 {result['pairs']} | 字符 {result['chars']} | "
+        f"耗时 {result['seconds']}s | {result['rows_per_s']} 行/秒 | {result['chars_per_s']} 字/秒 | "
+        f"检出 {result['flagged']} 行"
+    )
+
+
+if __name__ == "__main__":
+    main()
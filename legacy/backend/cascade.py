@@ -0,0 +1,137 @@
+"""
+分级评分（模型级联）
+
+先用速度快、价格低的模型评分，结果满足以下任一条件时再交给主模型重新评分：
+- 评分失败（兜底结果）
+- confidence 低于 CASCADE_ESCALATE_BELOW
+- 重点关注
+- 模型分值超出范围被校验修正
+大部分干净、高置信度的工单只需一次快速模型调用。每批统计升级比例，
+并按本批（或进程内累计）主模型的平均耗时和单价估算节省的模型耗时和费用。
+"""
+import os
+import threading
+
+from metrics import registry
+
+CASCADE_ENABLED = os.getenv('CASCADE_ENABLED', '0') == '1'
+CASCADE_FAST_MODEL = os.getenv('CASCADE_FAST_MODEL', 'qwen-flash')
+# 为空时使用主评分模型
+CASCADE_STRONG_MODEL = os.getenv('CASCADE_STRONG_MODEL', '')
+# 快速模型的 confidence 低于该值时升级
+CASCADE_ESCALATE_BELOW = float(os.getenv('CASCADE_ESCALATE_BELOW', '0.85'))
+# 两个模型每千 token 的单价（元，输入输出合计估算），仅用于估算节省的费用
+CASCADE_FAST_PRICE = float(os.getenv('CASCADE_FAST_PRICE', '0.0006'))
+CASCADE_STRONG_PRICE = float(os.getenv('CASCADE_STRONG_PRICE', '0.004'))
+
+REASON_ERROR = 'error'
+REASON_LOW_CONFIDENCE = 'low_confidence'
+REASON_CONCERN = 'concern'
+REASON_CORRECTION = 'correction'
+
+CASCADE_ROWS = registry.counter(
+    'cascade_rows_total', '分级评分的工单数，escalated 表示是否升级到主模型', ('escalated',)
+)
+CASCADE_ESCALATIONS = registry.counter(
+    'cascade_escalations_total', '升级到主模型的原因（一条可能有多个原因）', ('reason',)
+)
+
+
+class ScoreTrace:
+    """单次模型评分的 token 用量和各维度分值修正数，分级评分据此判断是否升级"""
+
+    __slots__ = ('tokens', 'corrections')
+
+    def __init__(self, tokens=0):
+        self.tokens = tokens
+        self.corrections = []
+
+    @property
+    def corrected(self):
+        return any(self.corrections)
+
+
+def escalation_reasons(result, trace, escalate_below=CASCADE_ESCALATE_BELOW):
+    reasons = []
+    if result.get('error'):
+        reasons.append(REASON_ERROR)
+    confidence = result.get('confidence')
+    if isinstance(confidence, (int, float)) and confidence < escalate_below:
+        reasons.append(REASON_LOW_CONFIDENCE)
+    if result.get('重点关注'):
+        reasons.append(REASON_CONCERN)
+    if trace.corrected:
+        reasons.append(REASON_CORRECTION)
+    return reasons
+
+
+class CascadeReport:
+    """一批（或进程内累计）分级评分的统计；parent 为累计统计，记录时一并计入"""
+
+    def __init__(self, fast_model, strong_model, parent=None):
+        self.fast_model = fast_model
+        self.strong_model = strong_model
+        self.parent = parent
+        self._lock = threading.Lock()
+        self.rows = 0
+        self.escalated = 0
+        self.reasons = {}
+        self.fast_seconds = 0.0
+        self.fast_tokens = 0
+        self.strong_seconds = 0.0
+        self.strong_tokens = 0
+        # 未升级工单的快速模型 token 数，假定主模型评同一条工单用量相同
+        self.kept_tokens = 0
+
+    def record(self, fast_seconds, fast_tokens, reasons, strong_seconds=0.0, strong_tokens=0):
+        with self._lock:
+            self.rows += 1
+            self.fast_seconds += fast_seconds
+            self.fast_tokens += fast_tokens
+            if reasons:
+                self.escalated += 1
+                self.strong_seconds += strong_seconds
+                self.strong_tokens += strong_tokens
+                for reason in reasons:
+                    self.reasons[reason] = self.reasons.get(reason, 0) + 1
+            else:
+                self.kept_tokens += fast_tokens
+        if self.parent is not None:
+            self.parent.record(fast_seconds, fast_tokens, reasons, strong_seconds, strong_tokens)
+        else:
+            CASCADE_ROWS.inc(escalated='true' if reasons else 'false')
+            for reason in reasons:
+                CASCADE_ESCALATIONS.inc(reason=reason)
+
+    def strong_seconds_per_row(self):
+        # 本批没有升级的工单时用累计统计中主模型的平均耗时
+        with self._lock:
+            if self.escalated:
+                return self.strong_seconds / self.escalated
+        if self.parent is not None:
+            return self.parent.strong_seconds_per_row()
+        return None
+
+    def summary(self):
+        strong_per_row = self.strong_seconds_per_row()
+        with self._lock:
+            kept = self.rows - self.escalated
+            cost = (self.fast_tokens * CASCADE_FAST_PRICE + self.strong_tokens * CASCADE_STRONG_PRICE) / 1000
+            # 全部交给主模型时的费用：升级的按实际用量，未升级的按快速模型的用量折算
+            baseline_cost = (self.kept_tokens + self.strong_tokens) * CASCADE_STRONG_PRICE / 1000
+            seconds_saved = None
+            if strong_per_row is not None:
+                seconds_saved = round(kept * strong_per_row - self.fast_seconds, 3)
+            return {
+                "fast_model": self.fast_model,
+                "strong_model": self.strong_model,
+                "rows": self.rows,
+                "escalated": self.escalated,
+                "escalation_rate": round(self.escalated / self.rows, 4) if self.rows else 0.0,
+                "reasons": dict(self.reasons),
+                "model_seconds": round(self.fast_seconds + self.strong_seconds, 3),
+                "model_seconds_saved": seconds_saved,
+                "tokens": {"fast": self.fast_tokens, "strong": self.strong_tokens},
+                "cost": round(cost, 6),
+                "cost_saved": round(baseline_cost - cost, 6),
+            }
@@ -0,0 +1,365 @@
+"""
+评分结果的列式导出（Parquet / Arrow）与分组统计
+
+评分结果展开为带类型的列，不再每行重复嵌套的 evaluation_details：
+- 元数据：job_id、row_index、created_at、category（诉求类别）、department（承办单位，见 EXPORT_DEPARTMENT_FIELDS）
+- 结果：score、confidence、risk_level、handling_suggestion、重点关注、has_error、error
+- 各维度得分：答非所问、回复逻辑性、问题解决情况、办理时长、回复态度
+- 错别字 / 负面词语：是否存在及错误写法 / 词语列表
+类别、部门、风险等级、处置建议等低基数的文本列字典编码。
+
+写出按 EXPORT_ROW_GROUP_ROWS 条一个行组（Arrow 为一个 record batch）边读边写，内存中最多保留一个行组；
+iter_export 每写完一个行组产出一次字节，可直接作为 HTTP 流式响应。
+Parquet 默认 zstd 压缩；Arrow 为 IPC 文件格式（即 Feather v2），不压缩，可内存映射读取。
+
+rollup 对导出的表按部门、类别等分组，用 pandas 整列计算各组的条数、平均分、各维度平均分、
+重点关注 / 错别字 / 负面词语比例和风险等级分布；评分失败的行只计入 errors。
+
+    python columnar_export.py export --output 2026-09.parquet --since 2026-09-01 --until 2026-10-01
+    python columnar_export.py rollup 2026-09.parquet --by department --by category
+"""
+import os
+import json
+import logging
+import argparse
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from postprocess import SCORED_DIMENSIONS
+
+logger = logging.getLogger(__name__)
+
+COLUMNAR_FORMATS = ('parquet', 'arrow')
+MEDIA_TYPES = {
+    'parquet': 'application/vnd.apache.parquet',
+    'arrow': 'application/vnd.apache.arrow.file',
+}
+
+# 每个行组的行数，也是导出时内存中最多保留的行数
+EXPORT_ROW_GROUP_ROWS = int(os.getenv('EXPORT_ROW_GROUP_ROWS', '50000'))
+# Parquet 的压缩算法：zstd / snappy / gzip / none
+EXPORT_PARQUET_COMPRESSION = os.getenv('EXPORT_PARQUET_COMPRESSION', 'zstd')
+# 依次取诉求数据中第一个非空的字段作为 department
+EXPORT_DEPARTMENT_FIELDS = tuple(
+    name.strip() for name in os.getenv('EXPORT_DEPARTMENT_FIELDS', '承办单位,承办部门,办理单位,部门').split(',')
+    if name.strip()
+)
+
+ROLLUP_KEYS = ('department', 'category', 'job_id', 'risk_level', 'handling_suggestion')
+
+_schema = None
+
+
+def result_schema():
+    global _schema
+    if _schema is None:
+        import pyarrow as pa
+        labels = pa.dictionary(pa.int32(), pa.string())
+        _schema = pa.schema(
+            [
+                ('job_id', pa.string()),
+                ('row_index', pa.int32()),
+                ('created_at', pa.timestamp('ms', tz='UTC')),
+                ('category', labels),
+                ('department', labels),
+                ('score', pa.int16()),
+                ('confidence', pa.float32()),
+                ('risk_level', labels),
+                ('handling_suggestion', labels),
+                ('重点关注', pa.bool_()),
+            ]
+            + [(dim, pa.int8()) for dim in SCORED_DIMENSIONS]
+            + [
+                ('错别字', pa.bool_()),
+                ('错别字列表', pa.list_(pa.string())),
+                ('负面词语', pa.bool_()),
+                ('负面词语列表', pa.list_(pa.string())),
+                ('has_error', pa.bool_()),
+                ('error', pa.string()),
+            ]
+        )
+    return _schema
+
+
+def _number(value):
+    # bool 不是分数；非数字（模型返回的字符串等）记为空
+    return value if isinstance(value, (int, float)) and not isinstance(value, bool) else None
+
+
+def _detail(details, name):
+    value = details.get(name)
+    return value if isinstance(value, dict) else {}
+
+
+def _text(value):
+    return None if value is None or value == '' else str(value)
+
+
+def flatten(job_id, index, created_at, item, result):
+    """把一条评分结果展开为 {列名: 值}，列与 result_schema() 一致"""
+    item = item if isinstance(item, dict) else {}
+    result = result if isinstance(result, dict) else {}
+    details = result.get('evaluation_details')
+    details = details if isinstance(details, dict) else {}
+    typos = _detail(details, '错别字')
+    negatives = _detail(details, '负面词语')
+    score = _number(result.get('score'))
+    row = {
+        'job_id': job_id,
+        'row_index': index,
+        'created_at': None if created_at is None else int(created_at * 1000),
+        'category': _text(item.get('诉求类别') or item.get('类别')),
+        'department': next(
+            (_text(item[name]) for name in EXPORT_DEPARTMENT_FIELDS if _text(item.get(name)) is not None), None
+        ),
+        'score': None if score is None else int(score),
+        'confidence': _number(result.get('confidence')),
+        'risk_level': _text(result.get('risk_level')),
+        'handling_suggestion': _text(result.get('handling_suggestion')),
+        '重点关注': bool(result.get('重点关注')),
+    }
+    for dim in SCORED_DIMENSIONS:
+        value = _number(_detail(details, dim).get('得分'))
+        row[dim] = None if value is None else int(value)
+    row['错别字'] = bool(typos.get('存在'))
+    row['错别字列表'] = [
+        str(entry.get('错误写法', '')) for entry in typos.get('错别字列表') or [] if isinstance(entry, dict)
+    ]
+    row['负面词语'] = bool(negatives.get('存在'))
+    row['负面词语列表'] = [str(word) for word in negatives.get('词语列表') or []]
+    row['has_error'] = bool(result.get('error'))
+    row['error'] = _text(result.get('error'))
+    return row
+
+
+class _SharedDictionaries:
+    """
+    字典编码列在整个文件中共用一份只增不减的字典：每批只把新出现的值追加到末尾，
+    前一批的字典始终是后一批的前缀。Arrow IPC 文件不允许替换字典，只能写增量（emit_dictionary_deltas）
+    """
+
+    def __init__(self, schema):
+        import pyarrow as pa
+        self.names = [field.name for field in schema if pa.types.is_dictionary(field.type)]
+        self.plain = pa.schema([
+            pa.field(field.name, field.type.value_type) if field.name in self.names else field for field in schema
+        ])
+        self.values = {name: [] for name in self.names}
+        self.known = {name: set() for name in self.names}
+
+    def encode(self, table):
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        for name in self.names:
+            column = table.column(name)
+            known = self.known[name]
+            for value in pc.unique(column).to_pylist():
+                if value is not None and value not in known:
+                    known.add(value)
+                    self.values[name].append(value)
+            dictionary = pa.array(self.values[name], pa.string())
+            indices = pc.index_in(column, value_set=dictionary).cast(pa.int32())
+            table = table.set_column(
+                table.schema.get_field_index(name), name,
+                pa.DictionaryArray.from_arrays(indices, dictionary),
+            )
+        return table
+
+
+def iter_tables(records, row_group_rows=EXPORT_ROW_GROUP_ROWS):
+    """records 逐条产出 (job_id, 序号, 写入时间, 诉求数据, 结果)，每攒够 row_group_rows 条产出一个 Arrow 表"""
+    import pyarrow as pa
+    dictionaries = _SharedDictionaries(result_schema())
+    rows = []
+    for record in records:
+        rows.append(flatten(*record))
+        if len(rows) >= row_group_rows:
+            yield dictionaries.encode(pa.Table.from_pylist(rows, schema=dictionaries.plain))
+            rows = []
+    if rows:
+        yield dictionaries.encode(pa.Table.from_pylist(rows, schema=dictionaries.plain))
+
+
+def _open_writer(sink, output_format):
+    if output_format not in COLUMNAR_FORMATS:
+        raise ValueError(f"不支持的导出格式: {output_format}")
+    import pyarrow as pa
+    if output_format == 'parquet':
+        import pyarrow.parquet as pq
+        return pq.ParquetWriter(sink, result_schema(), compression=EXPORT_PARQUET_COMPRESSION)
+    return pa.ipc.new_file(sink, result_schema(), options=pa.ipc.IpcWriteOptions(emit_dictionary_deltas=True))
+
+
+def write_export(path, records, output_format='parquet', row_group_rows=EXPORT_ROW_GROUP_ROWS):
+    """把评分结果写入 path，返回写出的行数"""
+    rows = 0
+    writer = _open_writer(path, output_format)
+    try:
+        for table in iter_tables(records, row_group_rows):
+            writer.write_table(table)
+            rows += table.num_rows
+    finally:
+        writer.close()
+    return rows
+
+
+class _ChunkSink:
+    """只追加的文件对象，写入的字节由 iter_export 逐段取走"""
+
+    closed = False
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def iter_export(records, output_format='parquet', row_group_rows=EXPORT_ROW_GROUP_ROWS):
+    """边写边产出导出文件的字节，每写完一个行组产出一次；两种格式都只顺序写入，不需要回写文件头"""
+    import pyarrow as pa
+    sink = _ChunkSink()
+    writer = _open_writer(pa.PythonFile(sink, mode='w'), output_format)
+    try:
+        for table in iter_tables(records, row_group_rows):
+            writer.write_table(table)
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def store_records(store, filters, batch_size=2000):
+    """
+    按 id 顺序逐条产出结果库中符合过滤条件的 (job_id, 序号, 写入时间, 诉求数据, 结果)；
+    诉求数据只含类别和部门字段，由 SQLite 从原始数据中取出，不解析整条诉求数据
+    """
+    for rows in store.iter_results(filters, EXPORT_DEPARTMENT_FIELDS, batch_size):
+        for row in rows:
+            item = {name: row[f'item_{i}'] for i, name in enumerate(EXPORT_DEPARTMENT_FIELDS)}
+            item['诉求类别'] = row["category"]
+            yield row["job_id"], row["row_index"], row["created_at"], item, json.loads(row["result"])
+
+
+def job_records(job):
+    """逐条产出内存中任务的 (job_id, 序号, 任务创建时间, 诉求数据, 结果)，未完成的行跳过"""
+    for entry in job.page(0, job.total):
+        if entry["result"] is not None:
+            yield job.id, entry["index"], job.created_at, job.items[entry["index"]], entry["result"]
+
+
+def read_table(source):
+    """读取导出的 Parquet / Arrow 文件为 Arrow 表，按扩展名判断格式"""
+    if str(source).endswith('.arrow') or str(source).endswith('.feather'):
+        import pyarrow.feather as feather
+        return feather.read_table(source)
+    import pyarrow.parquet as pq
+    return pq.read_table(source)
+
+
+def collect_table(records):
+    import pyarrow as pa
+    tables = list(iter_tables(records))
+    return pa.concat_tables(tables) if tables else result_schema().empty_table()
+
+
+def rollup(table, by=('department',)):
+    """
+    按 by 中的列分组统计，返回按条数降序排列的 [{分组列: 值, ..., 统计项}]。
+    平均分、各维度平均分、confidence 和各项比例只统计评分成功的行；评分失败的行计入 errors。
+    """
+    by = list(by)
+    unknown = [name for name in by if name not in ROLLUP_KEYS]
+    if not by or unknown:
+        raise ValueError(f"不支持的分组字段: {', '.join(unknown) or '（空）'}，可选: {', '.join(ROLLUP_KEYS)}")
+    measures = ['score', 'confidence', '重点关注', '错别字', '负面词语', *SCORED_DIMENSIONS]
+    frame = table.select(by + measures + ['risk_level', 'has_error']).to_pandas()
+    # 字典编码列读出为 Categorical，转回普通值以便空值也作为一组
+    for name in by:
+        frame[name] = frame[name].astype(object).where(frame[name].notna(), None)
+
+    failed = frame['has_error'].to_numpy(dtype=bool)
+    values = frame[measures].astype('float64')
+    values.loc[failed] = np.nan
+    risk = pd.get_dummies(frame['risk_level'].astype(object).where(~failed), dtype='int64')
+    data = pd.concat([frame[by], values, risk, frame['has_error'].astype('int64').rename('errors')], axis=1)
+
+    grouped = data.groupby(by, dropna=False, sort=False)
+    stats = pd.concat([
+        grouped.size().rename('count'),
+        grouped[list(risk.columns) + ['errors']].sum(),
+        grouped[measures].mean(),
+    ], axis=1).reset_index().sort_values('count', ascending=False, kind='stable')
+
+    result = []
+    for row in stats.to_dict('records'):
+        entry = {name: None if pd.isna(row[name]) else row[name] for name in by}
+        entry.update({
+            "count": int(row['count']),
+            "errors": int(row['errors']),
+            "avg_score": _round(row['score'], 2),
+            "avg_confidence": _round(row['confidence'], 4),
+            "concern_rate": _round(row['重点关注'], 4),
+            "typo_rate": _round(row['错别字'], 4),
+            "negative_word_rate": _round(row['负面词语'], 4),
+            "dimensions": {dim: _round(row[dim], 2) for dim in SCORED_DIMENSIONS},
+            "risk_levels": {str(level): int(row[level]) for level in risk.columns if row[level]},
+        })
+        result.append(entry)
+    return result
+
+
+def _round(value, digits):
+    return None if pd.isna(value) else round(float(value), digits)
+
+
+def _timestamp(value):
+    # Unix 时间戳或 ISO 格式日期/时间（按本地时区）
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+
+def main():
+    from result_store import ResultStore, RESULT_STORE_PATH
+    from structured_logging import configure_logging
+
+    parser = argparse.ArgumentParser(description="评分结果的列式导出与分组统计")
+    commands = parser.add_subparsers(dest='command', required=True)
+    export = commands.add_parser('export', help="从结果库导出 Parquet / Arrow 文件")
+    export.add_argument('--store', default=RESULT_STORE_PATH, help="结果库 SQLite 文件路径")
+    export.add_argument('--output', required=True, help="输出文件路径，扩展名 .arrow / .feather 时默认导出 Arrow")
+    export.add_argument('--format', choices=COLUMNAR_FORMATS, help="导出格式，默认按扩展名判断")
+    export.add_argument('--job-id', help="只导出指定任务")
+    export.add_argument('--category', help="只导出指定诉求类别")
+    export.add_argument('--since', type=_timestamp, help="只导出该时间之后写入的结果（时间戳或 ISO 日期）")
+    export.add_argument('--until', type=_timestamp, help="只导出该时间之前写入的结果（时间戳或 ISO 日期）")
+    grouping = commands.add_parser('rollup', help="按部门、类别等分组统计导出的文件")
+    grouping.add_argument('input', help="导出的 Parquet / Arrow 文件")
+    grouping.add_argument('--by', action='append', choices=ROLLUP_KEYS, help="分组字段，可重复，默认 department")
+    args = parser.parse_args()
+    configure_logging(logging.INFO)
+
+    if args.command == 'export':
+        output_format = args.format or ('arrow' if args.output.endswith(('.arrow', '.feather')) else 'parquet')
+        filters = {'job_id': args.job_id, 'category': args.category, 'since': args.since, 'until': args.until}
+        rows = write_export(args.output, store_records(ResultStore(args.store), filters), output_format)
+        logger.info(f"已导出 {rows} 条到 {args.output}")
+    else:
+        print(json.dumps(rollup(read_table(args.input), args.by or ['department']), ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
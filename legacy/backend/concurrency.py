@@ -0,0 +1,83 @@
+"""
+批量评分并发执行器
+
+所有批量评分共享同一个线程池，线程池大小即全局并发上限；
+单个请求内部再通过滑动窗口限制同时在途的任务数，避免一次大批量上传占满全部调用额度。
+"""
+import os
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+logger = logging.getLogger(__name__)
+
+# 全进程共享的模型调用并发上限
+GLOBAL_MAX_CONCURRENCY = int(os.getenv('GLOBAL_MAX_CONCURRENCY', '32'))
+# 单个批量请求的默认并发上限
+BATCH_MAX_WORKERS = int(os.getenv('BATCH_MAX_WORKERS', '8'))
+
+
+class ScoringExecutor:
+    def __init__(self, global_limit=GLOBAL_MAX_CONCURRENCY, default_workers=BATCH_MAX_WORKERS):
+        self.global_limit = max(1, global_limit)
+        self.default_workers = max(1, min(default_workers, self.global_limit))
+        self._pool = ThreadPoolExecutor(max_workers=self.global_limit, thread_name_prefix='scoring')
+
+    def resolve_workers(self, requested=None):
+        # 请求方指定的并发数只能调低，不能超过单请求上限
+        if requested is None:
+            return self.default_workers
+        try:
+            requested = int(requested)
+        except (TypeError, ValueError):
+            return self.default_workers
+        return max(1, min(requested, self.default_workers))
+
+    def _run(self, fn, item, on_error):
+        try:
+            return fn(item)
+        except Exception as e:
+            if on_error is None:
+                raise
+            logger.warning(f"单条评分失败，使用兜底结果: {str(e)}")
+            return on_error(item, e)
+
+    def iter_completed(self, fn, items, max_workers=None, on_error=None):
+        """按完成顺序逐条产出 (输入序号, 结果)，在途任务数不超过 max_workers"""
+        limit = self.resolve_workers(max_workers)
+        source = enumerate(items)
+        pending = {}
+
+        def submit_next():
+            try:
+                index, item = next(source)
+            except StopIteration:
+                return False
+            pending[self._pool.submit(self._run, fn, item, on_error)] = index
+            return True
+
+        for _ in range(limit):
+            if not submit_next():
+                break
+
+        try:
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index = pending.pop(future)
+                    submit_next()
+                    yield index, future.result()
+        finally:
+            # 调用方提前结束迭代时取消尚未开始的任务
+            for future in pending:
+                future.cancel()
+
+    def map(self, fn, items, max_workers=None, on_error=None):
+        """并发评分，结果按输入顺序返回"""
+        items = list(items)
+        results = [None] * len(items)
+        for index, result in self.iter_completed(fn, items, max_workers, on_error):
+            results[index] = result
+        return results
+
+
+executor = ScoringExecutor()
@@ -0,0 +1,106 @@
+"""
+负面词语配置的内存缓存
+
+配置文件只在修改时间或大小变化时重新解析；更新时先写临时文件再原子替换，
+读取方不会读到写了一半的文件。每次加载得到一个不可变快照并带递增版本号，
+批量评分开始时取一次快照，整批数据都按同一份词表评分。
+"""
+import os
+import json
+import hashlib
+import logging
+import tempfile
+import threading
+
+logger = logging.getLogger(__name__)
+
+NEGATIVE_WORDS_PATH = os.path.join(os.path.dirname(__file__), 'config', 'negative_words.json')
+
+
+class NegativeWordsSnapshot:
+    __slots__ = ('version', 'config', 'words', 'categories', 'digest')
+
+    def __init__(self, version, config):
+        self.version = version
+        self.config = config
+        self.words = tuple(config.get("负面词语", []))
+        self.categories = {name: tuple(words) for name, words in config.get("分类", {}).items()}
+        # 词表内容的摘要，版本号只在进程内递增，跨进程比较词表时用摘要
+        canonical = json.dumps([self.words, self.categories], ensure_ascii=False, sort_keys=True)
+        self.digest = hashlib.sha256(canonical.encode('utf-8')).hexdigest()[:12]
+
+
+def validate_negative_words(config):
+    if not isinstance(config, dict):
+        raise ValueError("配置必须是 JSON 对象")
+    words = config.get("负面词语")
+    if not isinstance(words, list) or not all(isinstance(w, str) and w for w in words):
+        raise ValueError("负面词语 必须是非空字符串列表")
+    categories = config.get("分类", {})
+    if not isinstance(categories, dict):
+        raise ValueError("分类 必须是 JSON 对象")
+    for name, members in categories.items():
+        if not isinstance(members, list) or not all(isinstance(w, str) and w for w in members):
+            raise ValueError(f"分类 {name} 必须是非空字符串列表")
+
+
+class NegativeWordsStore:
+    def __init__(self, path=NEGATIVE_WORDS_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._version = 0
+        self._stamp = None
+        self._snapshot = NegativeWordsSnapshot(0, {"负面词语": [], "分类": {}})
+
+    def _file_stamp(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def snapshot(self):
+        stamp = self._file_stamp()
+        if stamp == self._stamp:
+            return self._snapshot
+        with self._lock:
+            if stamp == self._stamp:
+                return self._snapshot
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    config = json.load(f)
+                validate_negative_words(config)
+            except Exception as e:
+                # 解析失败时保留上一次成功加载的词表，而不是退化为空列表
+                logger.error(f"负面词语配置加载失败，继续使用版本 {self._snapshot.version}: {str(e)}")
+                self._stamp = stamp
+                return self._snapshot
+            self._version += 1
+            self._snapshot = NegativeWordsSnapshot(self._version, config)
+            self._stamp = stamp
+            logger.info(f"负面词语配置已加载，版本 {self._version}，共 {len(self._snapshot.words)} 个词")
+            return self._snapshot
+
+    def update(self, config):
+        validate_negative_words(config)
+        directory = os.path.dirname(self.path)
+        with self._lock:
+            fd, tmp_path = tempfile.mkstemp(prefix='.negative_words.', suffix='.tmp', dir=directory)
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump(config, f, ensure_ascii=False, indent=4)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.path)
+            except Exception:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+            self._version += 1
+            self._snapshot = NegativeWordsSnapshot(self._version, config)
+            self._stamp = self._file_stamp()
+            logger.info(f"负面词语配置已更新，版本 {self._version}")
+            return self._snapshot
+
+
+negative_words_store = NegativeWordsStore()
@@ -0,0 +1,265 @@
+"""
+近似重复工单检测
+
+各部门常把同一段模板回复（如“感谢您的建议，我们将认真研究。”）粘贴到大量工单中。
+对 诉求回复内容 和规范化后的 群众诉求文本 分别按字符 n-gram 计算 MinHash 签名，
+用 LSH 分桶找出候选，两者估算的 Jaccard 相似度都不低于 DEDUP_THRESHOLD 才判定为近似重复：
+- 同一批内按输入顺序聚类，每类只有代表工单调用模型，其余工单由代表的结果推导
+- 代表工单的结果写入历史索引（SQLite），之后批次中的近似重复工单直接由历史结果推导
+只有提示词变体、诉求类别和评分配置都相同的工单才会互相匹配；推导时规则分、错别字、
+负面词语仍按每条工单自身内容重新计算。
+"""
+import os
+import re
+import json
+import time
+import zlib
+import sqlite3
+import hashlib
+import logging
+import threading
+import unicodedata
+
+import numpy as np
+
+from metrics import registry
+
+logger = logging.getLogger(__name__)
+
+DEDUP_ENABLED = os.getenv('DEDUP_ENABLED', '0') == '1'
+# 估算的 Jaccard 相似度不低于该值视为近似重复
+DEDUP_THRESHOLD = float(os.getenv('DEDUP_THRESHOLD', '0.9'))
+# 字符 n-gram 长度
+DEDUP_SHINGLE_SIZE = int(os.getenv('DEDUP_SHINGLE_SIZE', '3'))
+# MinHash 签名长度（回复和诉求各占一半）和 LSH 分段数，每段 DEDUP_NUM_PERM / DEDUP_BANDS 个值
+DEDUP_NUM_PERM = int(os.getenv('DEDUP_NUM_PERM', '128'))
+DEDUP_BANDS = int(os.getenv('DEDUP_BANDS', '16'))
+DEDUP_HISTORY_ENABLED = os.getenv('DEDUP_HISTORY_ENABLED', '1') == '1'
+DEDUP_HISTORY_PATH = os.getenv(
+    'DEDUP_HISTORY_PATH',
+    os.path.join(os.path.dirname(__file__), 'data', 'similarity.sqlite3')
+)
+# 历史索引最大条数，超出时淘汰最早写入的记录
+DEDUP_HISTORY_MAX_ROWS = int(os.getenv('DEDUP_HISTORY_MAX_ROWS', '100000'))
+# 每个签名最多比较的历史候选数
+MAX_CANDIDATES = 50
+EVICT_EVERY = 256
+
+DEDUP_DERIVED = registry.counter(
+    'dedup_derived_total', '由近似重复工单推导、未调用模型的结果数，source 为 batch / history', ('source',)
+)
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_rng = np.random.default_rng(20240601)
+_PERM_A = _rng.integers(1, 1 << 31, size=DEDUP_NUM_PERM, dtype=np.uint64)
+_PERM_B = _rng.integers(0, 1 << 31, size=DEDUP_NUM_PERM, dtype=np.uint64)
+_ROWS_PER_BAND = max(1, DEDUP_NUM_PERM // max(1, DEDUP_BANDS))
+_HALF = DEDUP_NUM_PERM // 2
+# 文本为空时的签名取值，两条都为空视为相同
+_EMPTY = np.iinfo(np.uint64).max
+
+_SEPARATORS = re.compile(r'[\s\W_]+', re.UNICODE)
+_DIGITS = re.compile(r'\d+')
+
+
+def normalize(text):
+    """全角转半角、转小写，去掉空白和标点，连续数字归一为 0（日期、编号、电话等不影响相似度）"""
+    text = unicodedata.normalize('NFKC', str(text or '')).lower()
+    return _DIGITS.sub('0', _SEPARATORS.sub('', text))
+
+
+def shingles(text, size=DEDUP_SHINGLE_SIZE):
+    if not text:
+        return set()
+    if len(text) <= size:
+        return {text}
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+def minhash(grams, a, b):
+    if not grams:
+        return np.full(len(a), _EMPTY, dtype=np.uint64)
+    hashes = np.fromiter((zlib.crc32(gram.encode('utf-8')) for gram in grams), dtype=np.uint64, count=len(grams))
+    return ((np.outer(a, hashes) + b[:, None]) % _MERSENNE_PRIME).min(axis=1)
+
+
+def signature(data):
+    """前一半为回复内容的 MinHash，后一半为诉求文本的 MinHash；两者都为空时返回 None"""
+    reply = shingles(normalize(data.get('诉求回复内容')))
+    request = shingles(normalize(data.get('群众诉求文本')))
+    if not reply and not request:
+        return None
+    return np.concatenate([
+        minhash(reply, _PERM_A[:_HALF], _PERM_B[:_HALF]),
+        minhash(request, _PERM_A[_HALF:], _PERM_B[_HALF:]),
+    ])
+
+
+def similarities(sig, candidates):
+    """
+    sig 与 candidates（二维，每行一个签名）逐行的相似度。签名中相同位置取值相等的比例即
+    Jaccard 相似度的估计；取回复和诉求两者中较低的一个，避免较长的诉求文本相同而掩盖回复内容的差异
+    """
+    equal = candidates == sig
+    return np.minimum(equal[:, :_HALF].mean(axis=1), equal[:, _HALF:].mean(axis=1))
+
+
+def best_match(sig, ids, candidates, threshold):
+    if not ids:
+        return None
+    scores = similarities(sig, np.stack(candidates))
+    position = int(np.argmax(scores))
+    if scores[position] < threshold:
+        return None
+    return ids[position], float(scores[position])
+
+
+def band_keys(sig, context):
+    """每段签名连同匹配上下文哈希为一个 56 位整数桶号（可直接存入 SQLite INTEGER）"""
+    keys = []
+    prefix = context.encode('utf-8')
+    for band in range(DEDUP_NUM_PERM // _ROWS_PER_BAND):
+        chunk = sig[band * _ROWS_PER_BAND:(band + 1) * _ROWS_PER_BAND].tobytes()
+        digest = hashlib.blake2b(prefix + bytes([band]) + chunk, digest_size=7).digest()
+        keys.append(int.from_bytes(digest, 'big'))
+    return keys
+
+
+class BatchIndex:
+    """单批内的 LSH 索引"""
+
+    def __init__(self, threshold=DEDUP_THRESHOLD):
+        self.threshold = threshold
+        self._buckets = {}
+        self._signatures = {}
+
+    def best(self, sig, keys):
+        """keys 为 band_keys 的结果；返回 (代表序号, 相似度)，没有达到阈值的代表时返回 None"""
+        ids = set()
+        for key in keys:
+            ids.update(self._buckets.get(key, ()))
+        ids = list(ids)
+        return best_match(sig, ids, [self._signatures[index] for index in ids], self.threshold)
+
+    def add(self, index, sig, keys):
+        self._signatures[index] = sig
+        for key in keys:
+            self._buckets.setdefault(key, []).append(index)
+
+
+class HistoryIndex:
+    """已评分代表工单的持久化索引：签名、LSH 桶号和评分结果"""
+
+    def __init__(self, path=DEDUP_HISTORY_PATH, threshold=DEDUP_THRESHOLD, max_rows=DEDUP_HISTORY_MAX_ROWS):
+        self.threshold = threshold
+        self.max_rows = max_rows
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._puts_since_evict = 0
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS similarity_entries ('
+            ' id INTEGER PRIMARY KEY,'
+            ' signature BLOB NOT NULL,'
+            ' result TEXT NOT NULL,'
+            ' created_at REAL NOT NULL)'
+        )
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS similarity_buckets ('
+            ' bucket INTEGER NOT NULL,'
+            ' entry_id INTEGER NOT NULL,'
+            ' PRIMARY KEY (bucket, entry_id)) WITHOUT ROWID'
+        )
+        self._db.commit()
+
+    def best(self, sig, keys):
+        """返回 (记录 ID, 相似度, 结果)，没有达到阈值的记录时返回 None"""
+        with self._lock:
+            rows = self._db.execute(
+                f'SELECT e.id, e.signature, e.result FROM similarity_entries AS e WHERE e.id IN ('
+                f' SELECT DISTINCT entry_id FROM similarity_buckets WHERE bucket IN ({",".join("?" * len(keys))})'
+                f' LIMIT {MAX_CANDIDATES})',
+                keys
+            ).fetchall()
+        match = best_match(
+            sig, list(range(len(rows))), [np.frombuffer(blob, dtype=np.uint64) for _, blob, _ in rows], self.threshold
+        )
+        if match is None:
+            return None
+        entry_id, _, result = rows[match[0]]
+        return entry_id, match[1], json.loads(result)
+
+    def add(self, sig, keys, result):
+        value = json.dumps({key: v for key, v in result.items() if key != 'timings'}, ensure_ascii=False)
+        try:
+            with self._lock:
+                with self._db:
+                    entry_id = self._db.execute(
+                        'INSERT INTO similarity_entries (signature, result, created_at) VALUES (?, ?, ?)',
+                        (sig.tobytes(), value, time.time())
+                    ).lastrowid
+                    self._db.executemany(
+                        'INSERT OR IGNORE INTO similarity_buckets (bucket, entry_id) VALUES (?, ?)',
+                        [(key, entry_id) for key in keys]
+                    )
+                    self._puts_since_evict += 1
+                    if self._puts_since_evict >= EVICT_EVERY:
+                        self._puts_since_evict = 0
+                        self._evict()
+        except sqlite3.Error as e:
+            # 写入失败只影响之后的复用，不影响本次评分
+            logger.error(f"写入近似重复历史索引失败: {str(e)}")
+
+    def _evict(self):
+        overflow = self._db.execute('SELECT COUNT(*) FROM similarity_entries').fetchone()[0] - self.max_rows
+        if overflow <= 0:
+            return
+        cutoff = self._db.execute(
+            'SELECT id FROM similarity_entries ORDER BY id LIMIT 1 OFFSET ?', (overflow,)
+        ).fetchone()[0]
+        self._db.execute('DELETE FROM similarity_buckets WHERE entry_id < ?', (cutoff,))
+        self._db.execute('DELETE FROM similarity_entries WHERE id < ?', (cutoff,))
+        logger.info(f"近似重复历史索引淘汰 {overflow} 条")
+
+    def stats(self):
+        with self._lock:
+            return {"entries": self._db.execute('SELECT COUNT(*) FROM similarity_entries').fetchone()[0]}
+
+
+class DedupReport:
+    """一批的近似重复统计"""
+
+    def __init__(self, threshold=DEDUP_THRESHOLD):
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self.rows = 0
+        self.representatives = 0
+        self.derived_batch = 0
+        self.derived_history = 0
+        self.rescored = 0
+
+    def count(self, name, amount=1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + amount)
+        if name == 'derived_batch':
+            DEDUP_DERIVED.inc(amount, source='batch')
+        elif name == 'derived_history':
+            DEDUP_DERIVED.inc(amount, source='history')
+
+    def summary(self):
+        with self._lock:
+            saved = self.derived_batch + self.derived_history
+            return {
+                "threshold": self.threshold,
+                "rows": self.rows,
+                "representatives": self.representatives,
+                "derived_from_batch": self.derived_batch,
+                "derived_from_history": self.derived_history,
+                "rescored": self.rescored,
+                "calls_saved": saved,
+                "saved_rate": round(saved / self.rows, 4) if self.rows else 0.0,
+            }
@@ -0,0 +1,240 @@
+"""
+本地模拟大模型
+
+按评分格式返回确定性的 JSON 结果（同一条诉求数据总是得到同样的分数），
+可配置响应延迟、错误率和格式错误率，用于离线压测和基准测试。支持流式输出。
+
+既可在进程内使用（SCORING_BACKEND=fake），也可作为 OpenAI 兼容的本地服务运行：
+    python fake_llm.py --port 8001 --latency-ms 800 --error-rate 0.02 --malformed-rate 0.01
+然后设置 SCORING_BACKEND=openai、OPENAI_BASE_URL=http://127.0.0.1:8001/v1 启动评分服务。
+"""
+import json
+import time
+import random
+import asyncio
+import hashlib
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+DIMENSIONS = (
+    ('答非所问', 30),
+    ('回复逻辑性', 30),
+    ('问题解决情况', 10),
+    ('办理时长', 10),
+    ('回复态度', 20),
+)
+
+
+class FakeModel:
+    def __init__(self, latency_ms=0.0, jitter_ms=0.0, error_rate=0.0, malformed_rate=0.0, seed=0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.malformed_rate = malformed_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _draw(self):
+        with self._lock:
+            return self._rng.random(), self._rng.random(), self._rng.gauss(0, 1)
+
+    def score_ticket(self, data):
+        # 分数由诉求数据的哈希决定，保证同一数据多次评分结果一致
+        digest = hashlib.sha256(json.dumps(data, ensure_ascii=False, sort_keys=True).encode('utf-8')).digest()
+        details = {}
+        for i, (dimension, max_score) in enumerate(DIMENSIONS):
+            # 多数回复处于中高分段，少量低分
+            score = max_score - digest[i] % (max_score // 2 + 1)
+            if digest[i + 8] < 13:
+                score = digest[i + 16] % 5
+            details[dimension] = {"得分": score, "评价": f"模拟评分：{dimension}"}
+        details["错别字"] = {"存在": False, "错别字列表": []}
+        confidence = round(0.6 + (digest[30] % 39) / 100, 2)
+        return {
+            "score": sum(d["得分"] for d in details.values() if "得分" in d),
+            "confidence": confidence,
+            "evaluation_details": details,
+            "重点关注": False,
+            "suggestions": "模拟建议",
+            "reasoning": "本结果由本地模拟模型生成",
+        }
+
+    def _respond(self, messages):
+        """返回 (状态码, 文本, 用量, 延迟秒数)，不等待"""
+        error_draw, malformed_draw, latency_draw = self._draw()
+        delay = max(0.0, self.latency_ms + self.jitter_ms * latency_draw) / 1000
+
+        user = next((m.get("content", "") for m in reversed(messages) if m.get("role") == "user"), "")
+        input_tokens = sum(len(m.get("content", "")) for m in messages)
+        if error_draw < self.error_rate:
+            return 503, "模拟服务暂不可用", {"input_tokens": input_tokens, "output_tokens": 0}, delay
+
+        payload_text = user.split("\n", 1)[1] if "\n" in user else user
+        try:
+            payload = json.loads(payload_text)
+        except json.JSONDecodeError:
+            payload = user
+        if isinstance(payload, list):
+            # 多条合并评分
+            body = [
+                dict(self.score_ticket(entry.get("data")), ticket_index=entry.get("ticket_index"))
+                for entry in payload if isinstance(entry, dict)
+            ]
+        else:
+            body = self.score_ticket(payload)
+        content = json.dumps(body, ensure_ascii=False)
+
+        if malformed_draw < self.malformed_rate / 2:
+            # 模拟输出被截断
+            content = content[:len(content) // 2]
+        elif malformed_draw < self.malformed_rate:
+            # 模拟模型没有按要求输出 JSON
+            content = "抱歉，我需要更多信息才能完成评分。" * (len(content) // 17 + 1)
+        return 200, content, {"input_tokens": input_tokens, "output_tokens": len(content)}, delay
+
+    def complete(self, messages):
+        """返回 (状态码, 文本, 用量)"""
+        status, content, usage, delay = self._respond(messages)
+        if delay:
+            time.sleep(delay)
+        return status, content, usage
+
+    def stream(self, messages, chunk_chars=16):
+        """返回 (状态码, 文本增量迭代器, 用量)，延迟的 20% 用于首个分片，其余均摊到各分片"""
+        status, content, usage, delay = self._respond(messages)
+        if status != 200:
+            if delay:
+                time.sleep(delay)
+            return status, None, usage
+        pieces = [content[i:i + chunk_chars] for i in range(0, len(content), chunk_chars)]
+        per_piece = delay * 0.8 / max(1, len(pieces))
+
+        def chunks():
+            if delay:
+                time.sleep(delay * 0.2)
+            for piece in pieces:
+                if per_piece:
+                    time.sleep(per_piece)
+                yield piece
+
+        return 200, chunks(), usage
+
+    async def acomplete(self, messages):
+        """complete 的异步版本，延迟期间不占用线程"""
+        status, content, usage, delay = self._respond(messages)
+        if delay:
+            await asyncio.sleep(delay)
+        return status, content, usage
+
+    async def astream(self, messages, chunk_chars=16):
+        """stream 的异步版本，返回 (状态码, 异步文本增量迭代器, 用量)"""
+        status, content, usage, delay = self._respond(messages)
+        if status != 200:
+            if delay:
+                await asyncio.sleep(delay)
+            return status, None, usage
+        pieces = [content[i:i + chunk_chars] for i in range(0, len(content), chunk_chars)]
+        per_piece = delay * 0.8 / max(1, len(pieces))
+
+        async def chunks():
+            if delay:
+                await asyncio.sleep(delay * 0.2)
+            for piece in pieces:
+                if per_piece:
+                    await asyncio.sleep(per_piece)
+                yield piece
+
+        return 200, chunks(), usage
+
+
+def make_handler(model):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def _send(self, status, body):
+            data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            if not self.path.rstrip('/').endswith('/chat/completions'):
+                self._send(404, {"error": {"message": "not found"}})
+                return
+            length = int(self.headers.get('Content-Length') or 0)
+            try:
+                request = json.loads(self.rfile.read(length) or b'{}')
+            except json.JSONDecodeError:
+                self._send(400, {"error": {"message": "invalid json"}})
+                return
+            if request.get('stream'):
+                self._stream(model, request)
+                return
+            status, content, usage = model.complete(request.get('messages', []))
+            if status != 200:
+                self._send(status, {"error": {"code": "ServiceUnavailable", "message": content}})
+                return
+            self._send(200, {
+                "id": "fake-" + hashlib.md5(content.encode('utf-8')).hexdigest()[:12],
+                "object": "chat.completion",
+                "model": request.get('model', 'fake'),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": usage["input_tokens"], "completion_tokens": usage["output_tokens"]},
+            })
+
+        def _stream(self, model, request):
+            status, chunks, _ = model.stream(request.get('messages', []))
+            if status != 200:
+                self._send(status, {"error": {"code": "ServiceUnavailable", "message": "模拟服务暂不可用"}})
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream; charset=utf-8')
+            self.send_header('Connection', 'close')
+            self.end_headers()
+            self.close_connection = True
+            try:
+                for piece in chunks:
+                    event = {"choices": [{"index": 0, "delta": {"content": piece}}]}
+                    self.wfile.write(f"data: {json.dumps(event, ensure_ascii=False)}\n\n".encode('utf-8'))
+                    self.wfile.flush()
+                self.wfile.write(b"data: [DONE]\n\n")
+            except (BrokenPipeError, ConnectionResetError):
+                # 客户端读到完整 JSON 后提前断开
+                pass
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地模拟大模型服务（OpenAI 兼容接口）")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8001)
+    parser.add_argument('--latency-ms', type=float, default=800)
+    parser.add_argument('--jitter-ms', type=float, default=200)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--malformed-rate', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    model = FakeModel(args.latency_ms, args.jitter_ms, args.error_rate, args.malformed_rate, args.seed)
+    # 压测时并发连接数很高，调大监听队列（默认 5），避免连接被拒绝
+    ThreadingHTTPServer.request_queue_size = 1024
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(model))
+    server.daemon_threads = True
+    print(f"模拟大模型服务已启动: http://{args.host}:{args.port}/v1/chat/completions")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
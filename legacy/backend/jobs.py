@@ -0,0 +1,244 @@
+"""
+异步批量评分任务
+
+POST /jobs 提交后立即返回任务ID，任务进入队列，由后台任务线程依次取出，
+再交给共享的评分执行器并发评分；前端通过任务ID轮询进度并分页获取结果。
+配置了结果库时，每个任务的结果按批写入结果库，任务过期后仍可查询。
+配置了评分日志时，带评分选项提交的任务逐条记录结果，进程重启后自动续评（见 journal.py）。
+"""
+import os
+import time
+import uuid
+import queue
+import logging
+import threading
+
+from concurrency import executor
+from journal import input_hash
+
+logger = logging.getLogger(__name__)
+
+# 同时执行的任务数，每个任务内部仍受单请求并发上限约束
+JOB_RUNNERS = int(os.getenv('JOB_RUNNERS', '2'))
+# 已结束任务在内存中的保留时间（秒）
+JOB_TTL_SECONDS = int(os.getenv('JOB_TTL_SECONDS', '3600'))
+# 分页获取结果时每页的最大条数
+JOB_PAGE_MAX = int(os.getenv('JOB_PAGE_MAX', '500'))
+
+STATUS_QUEUED = 'queued'
+STATUS_RUNNING = 'running'
+STATUS_COMPLETED = 'completed'
+STATUS_FAILED = 'failed'
+
+
+def is_fallback(result):
+    return isinstance(result, dict) and bool(result.get('error'))
+
+
+class Job:
+    def __init__(self, items, max_workers=None, runner=None, options=None, job_id=None, created_at=None):
+        self.id = job_id or uuid.uuid4().hex
+        self.items = items
+        self.max_workers = max_workers
+        self.runner = runner
+        # 评分选项，由管理器的 runner_factory 在开始执行时创建 runner，也随评分日志持久化
+        self.options = options
+        self.journal = None
+        self.results = [None] * len(items)
+        self.status = STATUS_QUEUED
+        self.error = None
+        self.completed = 0
+        self.failed = 0
+        # 续评时沿用评分日志中结果的条数
+        self.resumed = 0
+        self.created_at = created_at or time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.done = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def total(self):
+        return len(self.items)
+
+    def record(self, index, result):
+        with self._lock:
+            self.results[index] = result
+            self.completed += 1
+            if is_fallback(result):
+                self.failed += 1
+
+    def progress(self):
+        with self._lock:
+            completed = self.completed
+            failed = self.failed
+        eta = None
+        if self.status == STATUS_RUNNING and completed:
+            elapsed = time.time() - self.started_at
+            eta = round(elapsed / completed * (self.total - completed), 1)
+        elif self.status == STATUS_COMPLETED:
+            eta = 0
+        progress = {
+            "job_id": self.id,
+            "status": self.status,
+            "total": self.total,
+            "completed": completed,
+            "failed": failed,
+            "resumed": self.resumed,
+            "pending": self.total - completed,
+            "eta_seconds": eta,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+        }
+        # 批次附带的统计（如分级评分的升级比例、近似重复节省的调用数）
+        for name, report in getattr(self.runner, 'reports', {}).items():
+            progress[name] = report.summary()
+        return progress
+
+    def page(self, offset, limit):
+        # 未完成的行以 null 占位，保证 index 与输入行一一对应
+        with self._lock:
+            rows = self.results[offset:offset + limit]
+        return [
+            {"index": offset + i, "result": result}
+            for i, result in enumerate(rows)
+        ]
+
+
+class JobManager:
+    def __init__(self, score_fn, on_error, runners=JOB_RUNNERS, ttl=JOB_TTL_SECONDS, store=None,
+                 journal=None, runner_factory=None):
+        self.score_fn = score_fn
+        self.on_error = on_error
+        self.ttl = ttl
+        self.store = store
+        self.journal = journal
+        self.runner_factory = runner_factory
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        for i in range(max(1, runners)):
+            threading.Thread(target=self._drain, name=f'job-runner-{i}', daemon=True).start()
+
+    def submit(self, items, max_workers=None, runner=None, options=None):
+        """
+        runner(items, max_workers) 逐条产出 (序号, 结果)，用于绑定本批次的上下文（如负面词语快照）；
+        传入 options 时改由 runner_factory(items, options) 在开始执行时创建 runner，任务记入评分日志；
+        两者都缺省时用管理器的评分函数逐条并发评分
+        """
+        self._expire()
+        job = Job(list(items), max_workers, runner, options)
+        if options is not None and self.journal is not None:
+            job.journal = self.journal.create(job.id, job.items, max_workers, options, job.created_at)
+        self._enqueue(job)
+        logger.info(f"任务 {job.id} 已提交，共 {job.total} 条")
+        return job
+
+    def recover(self):
+        """进程启动时重新执行评分日志中未结束的任务，已被其他进程续评的任务跳过"""
+        if self.journal is None:
+            return []
+        self.journal.purge(self.ttl)
+        recovered = []
+        for meta in self.journal.unfinished():
+            writer = self.journal.open(meta['job_id'])
+            if writer is None:
+                continue
+            job = Job(meta['items'], meta.get('max_workers'), options=meta.get('options') or {},
+                      job_id=meta['job_id'], created_at=meta.get('created_at'))
+            job.journal = writer
+            self._enqueue(job)
+            recovered.append(job)
+            logger.info(f"任务 {job.id} 从评分日志恢复，共 {job.total} 条，已记录 {len(writer.entries)} 条结果")
+        return recovered
+
+    def _enqueue(self, job):
+        with self._lock:
+            self._jobs[job.id] = job
+        self._queue.put(job)
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _expire(self):
+        now = time.time()
+        with self._lock:
+            expired = [
+                job_id for job_id, job in self._jobs.items()
+                if job.finished_at and now - job.finished_at > self.ttl
+            ]
+            for job_id in expired:
+                del self._jobs[job_id]
+        if self.journal is not None:
+            for job_id in expired:
+                self.journal.remove(job_id)
+
+    def _drain(self):
+        while True:
+            job = self._queue.get()
+            try:
+                self._run(job)
+            finally:
+                self._queue.task_done()
+
+    def _run(self, job):
+        job.status = STATUS_RUNNING
+        job.started_at = time.time()
+        writer = self.store.writer(job.id) if self.store is not None else None
+        digests = None
+        try:
+            indices = list(range(job.total))
+            if job.journal is not None:
+                digests = [input_hash(item) for item in job.items]
+                indices = self._replay(job, digests, writer)
+            items = job.items if len(indices) == job.total else [job.items[index] for index in indices]
+            if job.options is not None and self.runner_factory is not None:
+                job.runner = self.runner_factory(items, job.options)
+            if writer is not None and job.runner is not None:
+                # 本次评分的结果记录 runner 所用词表和阈值的摘要；逐条评分时每条各取快照，不记摘要
+                writer.words_digest, writer.thresholds_digest = getattr(job.runner, 'digests', (None, None))
+            if job.runner is not None:
+                results = job.runner(items, job.max_workers)
+            else:
+                results = executor.iter_completed(self.score_fn, items, job.max_workers, self.on_error)
+            for position, result in results:
+                index = indices[position]
+                job.record(index, result)
+                # 兜底结果不记入评分日志，续评时重新评分（与结果缓存不缓存兜底结果一致）
+                if job.journal is not None and not is_fallback(result):
+                    job.journal.append(index, digests[index], result)
+                if writer is not None:
+                    writer.add(index, job.items[index], result)
+            job.status = STATUS_COMPLETED
+        except Exception as e:
+            logger.error(f"任务 {job.id} 执行失败: {str(e)}")
+            job.status = STATUS_FAILED
+            job.error = str(e)
+        finally:
+            if writer is not None:
+                writer.close()
+            if job.journal is not None:
+                job.journal.finish(job.status, digests or [input_hash(item) for item in job.items])
+            job.finished_at = time.time()
+            job.done.set()
+            logger.info(f"任务 {job.id} 结束，状态: {job.status}，耗时 {job.finished_at - job.started_at:.1f}s")
+
+    def _replay(self, job, digests, writer):
+        """沿用评分日志中已有的结果，返回仍需评分的序号"""
+        entries = job.journal.entries
+        pending = []
+        for index, digest in enumerate(digests):
+            if digest not in entries or is_fallback(entries[digest]):
+                pending.append(index)
+                continue
+            job.record(index, entries[digest])
+            job.resumed += 1
+            # 崩溃前可能还没写入结果库，重新写入（同一行以最后一次为准）；评分时所用词表未知，不记摘要
+            if writer is not None:
+                writer.add(index, job.items[index], entries[digest], stamped=False)
+        if job.resumed:
+            logger.info(f"任务 {job.id} 续评：沿用评分日志中 {job.resumed} 条结果，剩余 {len(pending)} 条")
+        return pending
@@ -0,0 +1,217 @@
+"""
+异步任务的评分日志（断点续评）
+
+每个任务在 JOURNAL_DIR 下有三个文件：
+- <任务ID>.json：提交时写入的输入数据和评分选项，进程重启后据此重建任务
+- <任务ID>.jsonl：只追加的结果日志，每评完一条立即追加一行 {"i": 序号, "h": 输入哈希, "r": 结果}
+- <任务ID>.done：任务结束后写入的状态标记
+日志按条数或时间间隔批量 fsync，崩溃时最多丢失最后一批，末尾写了一半的行在读取时忽略。
+重启后未结束的任务重新入队，输入哈希已在日志中的行直接沿用日志中的结果，不再调用模型；
+评分失败的兜底结果（上游熔断、接口报错等）不记入日志，续评时重新评分。
+任务结束后压缩日志：每个输入哈希只保留最后一条，去掉不完整的行。
+运行中的任务对日志文件加排他锁，多个进程共用同一目录时同一任务只会由一个进程续评。
+"""
+import os
+import json
+import time
+import hashlib
+import logging
+import tempfile
+
+try:
+    import fcntl
+except ImportError:
+    # Windows 下不加锁，只支持单进程部署
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_ENABLED = os.getenv('JOURNAL_ENABLED', '1') == '1'
+JOURNAL_DIR = os.getenv('JOURNAL_DIR', os.path.join(os.path.dirname(__file__), 'data', 'journal'))
+# 攒够多少条或距上次 fsync 超过多少秒时落盘一次
+JOURNAL_FSYNC_ROWS = int(os.getenv('JOURNAL_FSYNC_ROWS', '200'))
+JOURNAL_FSYNC_INTERVAL = float(os.getenv('JOURNAL_FSYNC_INTERVAL', '1.0'))
+
+
+def input_hash(item):
+    canonical = json.dumps(item, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+    return hashlib.blake2b(canonical.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def write_atomic(path, text):
+    fd, tmp_path = tempfile.mkstemp(prefix='.journal.', suffix='.tmp', dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def read_entries(path):
+    """按写入顺序读取日志，返回 {输入哈希: 结果}；不完整或损坏的行跳过"""
+    entries = {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if not line.endswith('\n'):
+                    # 崩溃时写了一半的最后一行
+                    break
+                try:
+                    entry = json.loads(line)
+                    entries[entry['h']] = entry['r']
+                except (ValueError, KeyError, TypeError):
+                    continue
+    except FileNotFoundError:
+        pass
+    return entries
+
+
+def _truncate_torn_line(handle):
+    # 去掉崩溃时写了一半的最后一行，否则之后追加的第一行会接在它后面而无法解析
+    with open(handle.name, 'rb') as f:
+        data = f.read()
+    if data and not data.endswith(b'\n'):
+        handle.truncate(data.rfind(b'\n') + 1)
+
+
+class JournalWriter:
+    """单个任务的日志写入器，持有日志文件的排他锁，由任务线程独占使用"""
+
+    def __init__(self, journal, job_id, handle, entries, fsync_rows=JOURNAL_FSYNC_ROWS,
+                 fsync_interval=JOURNAL_FSYNC_INTERVAL):
+        self.journal = journal
+        self.job_id = job_id
+        self.entries = entries
+        self.fsync_rows = fsync_rows
+        self.fsync_interval = fsync_interval
+        self._handle = handle
+        self._unsynced = 0
+        self._synced_at = time.monotonic()
+
+    def append(self, index, digest, result):
+        line = json.dumps({"i": index, "h": digest, "r": result}, ensure_ascii=False, separators=(',', ':'))
+        self._handle.write(line + '\n')
+        self._unsynced += 1
+        if self._unsynced >= self.fsync_rows or time.monotonic() - self._synced_at >= self.fsync_interval:
+            self.sync()
+
+    def sync(self):
+        if not self._unsynced:
+            return
+        try:
+            self._handle.flush()
+            os.fsync(self._handle.fileno())
+        except OSError as e:
+            # 日志写入失败只影响续评，不影响本次评分
+            logger.error(f"任务 {self.job_id} 写入评分日志失败: {str(e)}")
+        self._unsynced = 0
+        self._synced_at = time.monotonic()
+
+    def finish(self, status, digests):
+        """任务结束：落盘、压缩日志并写入状态标记，之后释放锁"""
+        try:
+            self.sync()
+            self._compact(digests)
+            write_atomic(self.journal.path(self.job_id, 'done'), json.dumps({
+                "status": status, "finished_at": time.time(),
+            }))
+        except OSError as e:
+            logger.error(f"任务 {self.job_id} 压缩评分日志失败: {str(e)}")
+        finally:
+            self.close()
+
+    def _compact(self, digests):
+        # 每个输入哈希只保留最后一条结果，按首次出现的输入序号排列
+        entries = read_entries(self.journal.path(self.job_id, 'jsonl'))
+        lines = []
+        seen = set()
+        for index, digest in enumerate(digests):
+            if digest in entries and digest not in seen:
+                seen.add(digest)
+                lines.append(json.dumps(
+                    {"i": index, "h": digest, "r": entries[digest]}, ensure_ascii=False, separators=(',', ':')
+                ) + '\n')
+        write_atomic(self.journal.path(self.job_id, 'jsonl'), ''.join(lines))
+
+    def close(self):
+        if self._handle.closed:
+            return
+        try:
+            self.sync()
+        finally:
+            # 关闭文件即释放锁
+            self._handle.close()
+
+
+class JobJournal:
+    def __init__(self, directory=JOURNAL_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, job_id, suffix):
+        return os.path.join(self.directory, f'{job_id}.{suffix}')
+
+    def create(self, job_id, items, max_workers, options, created_at):
+        """记录新任务的输入并打开日志，返回 JournalWriter"""
+        write_atomic(self.path(job_id, 'json'), json.dumps({
+            "job_id": job_id,
+            "items": items,
+            "max_workers": max_workers,
+            "options": options,
+            "created_at": created_at,
+        }, ensure_ascii=False))
+        return self.open(job_id)
+
+    def open(self, job_id):
+        """打开日志并加锁，读取已记录的结果；日志已被其他进程锁定时返回 None"""
+        handle = open(self.path(job_id, 'jsonl'), 'a', encoding='utf-8')
+        if fcntl is not None:
+            try:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                handle.close()
+                return None
+        _truncate_torn_line(handle)
+        return JournalWriter(self, job_id, handle, read_entries(self.path(job_id, 'jsonl')))
+
+    def unfinished(self):
+        """返回未结束任务的元数据列表，按提交时间排序"""
+        jobs = []
+        for name in os.listdir(self.directory):
+            if not name.endswith('.json'):
+                continue
+            job_id = name[:-len('.json')]
+            if os.path.exists(self.path(job_id, 'done')):
+                continue
+            try:
+                with open(self.path(job_id, 'json'), 'r', encoding='utf-8') as f:
+                    jobs.append(json.load(f))
+            except (OSError, ValueError) as e:
+                logger.error(f"任务 {job_id} 的评分日志元数据无法读取: {str(e)}")
+        return sorted(jobs, key=lambda meta: meta.get('created_at') or 0)
+
+    def remove(self, job_id):
+        for suffix in ('json', 'jsonl', 'done'):
+            try:
+                os.remove(self.path(job_id, suffix))
+            except FileNotFoundError:
+                pass
+
+    def purge(self, ttl):
+        """删除结束超过 ttl 秒的任务日志"""
+        now = time.time()
+        for name in os.listdir(self.directory):
+            if not name.endswith('.done'):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                expired = now - os.path.getmtime(path) > ttl
+            except FileNotFoundError:
+                continue
+            if expired:
+                self.remove(name[:-len('.done')])
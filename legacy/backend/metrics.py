@@ -0,0 +1,180 @@
+"""
+运行指标
+
+进程内的计数器和直方图，以 Prometheus 文本格式在 /metrics 输出：
+- 评分各阶段耗时（提示词构建、模型调用、JSON 解析、校验、响应序列化）
+- 模型 token 用量、兜底结果次数、分值修正次数、因日志队列已满丢弃的日志条数
+- 结果缓存、上游调用（重试、熔断等）已有的统计通过 collector 在输出时读取，不重复计数
+StageTimer 记录单次评分的各阶段耗时，同时计入直方图，请求时可附在结果中返回。
+"""
+import time
+import threading
+from contextlib import contextmanager
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    type = 'counter'
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        return [(self.name, _labels(self.labelnames, key), value) for key, value in items]
+
+
+class Histogram:
+    type = 'histogram'
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * len(self.buckets), 0, 0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+                    break
+            entry[1] += 1
+            entry[2] += value
+
+    def samples(self):
+        with self._lock:
+            items = [(key, list(counts), count, total) for key, (counts, count, total) in self._values.items()]
+        samples = []
+        for key, counts, count, total in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                samples.append((f'{self.name}_bucket', _labels(self.labelnames, key, [('le', _number(bound))]), cumulative))
+            samples.append((f'{self.name}_bucket', _labels(self.labelnames, key, [('le', '+Inf')]), count))
+            samples.append((f'{self.name}_count', _labels(self.labelnames, key), count))
+            samples.append((f'{self.name}_sum', _labels(self.labelnames, key), total))
+        return samples
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, name, help, labelnames=()):
+        metric = Counter(name, help, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        metric = Histogram(name, help, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collect):
+        """collect() 返回 [(指标名, 类型, 说明, [(标签字典, 值)])]，在输出时调用"""
+        self._collectors.append(collect)
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            lines.extend(f'{name}{labels} {_number(value)}' for name, labels, value in metric.samples())
+        for collect in self._collectors:
+            for name, kind, help, samples in collect():
+                lines.append(f'# HELP {name} {help}')
+                lines.append(f'# TYPE {name} {kind}')
+                for labels, value in samples:
+                    lines.append(f'{name}{_labels(labels, labels.values())} {_number(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+STAGE_SECONDS = registry.histogram(
+    'scoring_stage_seconds', '评分各阶段耗时（秒）', ('stage',)
+)
+MODEL_TOKENS = registry.counter(
+    'model_tokens_total', '模型调用的 token 用量，kind 为 input / output', ('kind',)
+)
+MODEL_RESPONSES = registry.counter(
+    'model_responses_total', '模型每次调用尝试的响应状态码（流式读取中因格式错误中止的不计入）', ('status',)
+)
+SCORING_RESULTS = registry.counter(
+    'scoring_results_total', '得到评分结果的次数，source 为 model（单条调用成功）/ packed（合并评分）/ cache', ('source',)
+)
+SCORING_FALLBACKS = registry.counter(
+    'scoring_fallbacks_total', '返回兜底结果的次数', ('reason',)
+)
+SCORE_CORRECTIONS = registry.counter(
+    'score_corrections_total', '模型分值被修正的次数，kind 为 over / under', ('dimension', 'kind')
+)
+LOG_RECORDS_DROPPED = registry.counter(
+    'log_records_dropped_total', '日志队列已满时丢弃的 WARNING 以下的日志条数', ('level',)
+)
+HTTP_REQUEST_SECONDS = registry.histogram(
+    'http_request_seconds', 'HTTP 请求处理耗时（秒，流式响应只计到开始输出）', ('endpoint', 'method', 'status')
+)
+
+
+class StageTimer:
+    """记录一次评分各阶段的耗时，同时计入 scoring_stage_seconds"""
+
+    __slots__ = ('stages', 'started')
+
+    def __init__(self):
+        self.stages = {}
+        self.started = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started)
+
+    def add(self, name, seconds):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+        STAGE_SECONDS.observe(seconds, stage=name)
+
+    def breakdown(self):
+        timings = {f'{name}_ms': round(seconds * 1000, 3) for name, seconds in self.stages.items()}
+        timings['total_ms'] = round((time.perf_counter() - self.started) * 1000, 3)
+        return timings
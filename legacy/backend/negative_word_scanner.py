@@ -0,0 +1,54 @@
+"""
+负面词语本地扫描
+
+根据负面词语配置（含 分类）构建多模式匹配自动机，一次扫描回复内容即可得到
+命中的词语、所属分类和位置。扫描器按词表摘要缓存，只在词表内容变化时重建
+（版本号只在配置文件存储内递增，测试和基准自行构造的快照版本号可能重复）。
+"""
+import threading
+
+from text_matcher import MultiPatternMatcher
+
+
+class NegativeWordScanner:
+    def __init__(self, snapshot):
+        self.version = snapshot.version
+        self.word_categories = {word: [] for word in snapshot.words}
+        for category, words in snapshot.categories.items():
+            for word in words:
+                self.word_categories.setdefault(word, []).append(category)
+        self.matcher = MultiPatternMatcher(self.word_categories.keys())
+
+    def scan(self, text):
+        matches = self.matcher.find_all(text)
+        words = list(dict.fromkeys(word for _, _, word in matches))
+        return {
+            "存在": bool(words),
+            "词语列表": words,
+            "匹配详情": [
+                {"词语": word, "分类": self.word_categories.get(word, []), "位置": [start, end]}
+                for start, end, word in matches
+            ],
+        }
+
+
+# 正在评分的旧批次可能仍持有旧版本快照，因此保留最近几个词表的扫描器
+MAX_CACHED_VERSIONS = 4
+
+_lock = threading.Lock()
+_scanners = {}
+
+
+def get_scanner(snapshot):
+    scanner = _scanners.get(snapshot.digest)
+    if scanner is not None:
+        return scanner
+    with _lock:
+        scanner = _scanners.get(snapshot.digest)
+        if scanner is None:
+            scanner = NegativeWordScanner(snapshot)
+            _scanners[snapshot.digest] = scanner
+            # 按创建顺序淘汰最早的扫描器
+            for digest in list(_scanners)[:-MAX_CACHED_VERSIONS]:
+                del _scanners[digest]
+        return scanner
@@ -0,0 +1,96 @@
+"""
+多条工单合并评分
+
+短工单的评分请求中固定的评分标准占了大部分 token。合并模式下把若干条工单放进同一次请求，
+模型返回按 ticket_index 对应的 JSON 数组。每次合并的条数按输入 token 预算和输出 token 上限动态确定：
+工单越短，一次合并的条数越多。
+"""
+import os
+import json
+import logging
+
+from prompt_builder import estimate_tokens
+from stream_parser import extract_json
+
+logger = logging.getLogger(__name__)
+
+PACKING_ENABLED = os.getenv('PACKING_ENABLED', '0') == '1'
+# 单次请求最多合并的工单数
+PACK_MAX_SIZE = int(os.getenv('PACK_MAX_SIZE', '8'))
+# 单次请求的输入 token 预算（含 system 消息）
+PACK_INPUT_TOKEN_BUDGET = int(os.getenv('PACK_INPUT_TOKEN_BUDGET', '6000'))
+# 每条工单预留的输出 token 数
+PACK_OUTPUT_TOKENS_PER_TICKET = int(os.getenv('PACK_OUTPUT_TOKENS_PER_TICKET', '400'))
+# 单次请求的输出 token 上限
+PACK_MAX_OUTPUT_TOKENS = int(os.getenv('PACK_MAX_OUTPUT_TOKENS', '8000'))
+
+# 每条工单在 user 消息中除诉求数据外的额外开销（ticket_index 等）
+TICKET_OVERHEAD_TOKENS = 12
+
+
+def ticket_tokens(data):
+    return estimate_tokens(json.dumps(data, ensure_ascii=False)) + TICKET_OVERHEAD_TOKENS
+
+
+def pack_capacity():
+    return max(1, min(PACK_MAX_SIZE, PACK_MAX_OUTPUT_TOKENS // max(1, PACK_OUTPUT_TOKENS_PER_TICKET)))
+
+
+def output_tokens_for(size):
+    return min(PACK_MAX_OUTPUT_TOKENS, PACK_OUTPUT_TOKENS_PER_TICKET * size)
+
+
+def plan_packs(entries, system_tokens):
+    """
+    按输入 token 预算贪心切分。entries 需使用同一 system 消息，每项的第二个元素为诉求数据；
+    单条超出预算的工单独占一组。
+    """
+    capacity = pack_capacity()
+    packs = []
+    current = []
+    used = system_tokens
+    for entry in entries:
+        tokens = ticket_tokens(entry[1])
+        if current and (len(current) >= capacity or used + tokens > PACK_INPUT_TOKEN_BUDGET):
+            packs.append(current)
+            current = []
+            used = system_tokens
+        current.append(entry)
+        used += tokens
+    if current:
+        packs.append(current)
+    return packs
+
+
+def parse_packed_response(text):
+    """解析合并评分的返回内容，返回 {ticket_index: 评分对象}；无法解析的元素直接丢弃"""
+    try:
+        parsed = json.loads(text)
+    except json.JSONDecodeError:
+        extracted = extract_json(text, '[')
+        if extracted is None:
+            return {}
+        try:
+            parsed = json.loads(extracted)
+        except json.JSONDecodeError:
+            return {}
+
+    # 兼容模型把数组包在对象里返回的情况
+    if isinstance(parsed, dict):
+        parsed = next((value for value in parsed.values() if isinstance(value, list)), [])
+    if not isinstance(parsed, list):
+        return {}
+
+    elements = {}
+    for element in parsed:
+        if not isinstance(element, dict):
+            continue
+        try:
+            index = int(element.pop('ticket_index'))
+        except (KeyError, TypeError, ValueError):
+            continue
+        if index in elements:
+            logger.warning(f"合并评分返回了重复的 ticket_index: {index}")
+            continue
+        elements[index] = element
+    return elements
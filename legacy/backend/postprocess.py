@@ -0,0 +1,188 @@
+"""
+评分结果的批量后处理
+
+对整批结果按列（NumPy 数组）一次性完成：各维度分值校验（超上限、小于 0、非数字、取整）、
+总分重算、重点关注判断，以及 confidence → handling_suggestion / risk_level 的映射。
+结果与原来逐条处理完全一致；阈值集中在 Thresholds 中，可按需替换。
+
+- postprocess_arrays：核心计算，输入输出都是等长数组
+- postprocess_frame：输入 pandas 表（如从结果库读出的分数表），返回结果表
+- postprocess_results：原地更新模型返回的结果字典，validate_result 使用；每次分值修正记一条 WARNING 日志
+"""
+import json
+import hashlib
+import logging
+
+import numpy as np
+import pandas as pd
+
+from metrics import SCORE_CORRECTIONS
+
+logger = logging.getLogger(__name__)
+
+# 各维度满分
+MAX_SCORES = {
+    '答非所问': 30,
+    '回复逻辑性': 30,
+    '问题解决情况': 10,
+    '办理时长': 10,
+    '回复态度': 20,
+}
+SCORED_DIMENSIONS = tuple(MAX_SCORES)
+
+MANDATORY_REVIEW = "强制复核 (Mandatory Review)"
+SAMPLING = "抽检复核 (Sampling)"
+AUTO_PASS = "自动采信 (Auto-Pass)"
+
+# 按判定顺序：重点关注、低置信度、中置信度、高置信度
+_HANDLING = np.array([MANDATORY_REVIEW, MANDATORY_REVIEW, SAMPLING, AUTO_PASS], dtype=object)
+_RISK = np.array(["High", "Medium", "Low", "None"], dtype=object)
+
+
+class Thresholds:
+    def __init__(self, concern_dimensions=('答非所问', '回复逻辑性', '回复态度'), concern_below=5,
+                 mandatory_review_below=0.7, sampling_below=0.85, default_confidence=0.8):
+        # 任一 concern_dimensions 得分低于 concern_below 即重点关注
+        self.concern_dimensions = tuple(concern_dimensions)
+        self.concern_below = concern_below
+        # confidence 低于 mandatory_review_below 强制复核，低于 sampling_below 抽检复核
+        self.mandatory_review_below = mandatory_review_below
+        self.sampling_below = sampling_below
+        # 模型未返回 confidence 时的取值
+        self.default_confidence = default_confidence
+        canonical = json.dumps(vars(self), ensure_ascii=False, sort_keys=True)
+        self.digest = hashlib.sha256(canonical.encode('utf-8')).hexdigest()[:12]
+
+
+DEFAULT_THRESHOLDS = Thresholds()
+
+
+def postprocess_arrays(scores, typos, negatives, confidence, thresholds=DEFAULT_THRESHOLDS):
+    """
+    scores 为 {维度: 原始分值数组}，非数字的分值按 0 传入；typos / negatives 为是否存在错别字 / 负面词语；
+    confidence 中的 NaN 表示模型未返回。返回 {
+        "scores": {维度: 校验后的整数分值}, "over": {维度: 是否超上限}, "under": {维度: 是否小于 0},
+        "score": 总分, "concern": 重点关注, "handling_suggestion": ..., "risk_level": ...
+    }
+    """
+    fixed, over, under = {}, {}, {}
+    for dimension, raw in scores.items():
+        raw = np.asarray(raw, dtype=float)
+        max_score = MAX_SCORES[dimension]
+        over[dimension] = raw > max_score
+        under[dimension] = raw < 0
+        # 范围内的分值向零取整，与 int() 一致
+        fixed[dimension] = np.where(over[dimension], max_score, np.where(under[dimension], 0, np.trunc(raw))).astype(np.int64)
+
+    total = sum(fixed[dimension] for dimension in SCORED_DIMENSIONS)
+
+    concern = np.asarray(typos, dtype=bool) | np.asarray(negatives, dtype=bool)
+    for dimension in thresholds.concern_dimensions:
+        concern = concern | (fixed[dimension] < thresholds.concern_below)
+
+    confidence = np.asarray(confidence, dtype=float)
+    confidence = np.where(np.isnan(confidence), thresholds.default_confidence, confidence)
+    level = np.select(
+        [concern, confidence < thresholds.mandatory_review_below, confidence < thresholds.sampling_below],
+        [0, 1, 2],
+        default=3,
+    )
+    handling = _HANDLING[level]
+    risk = _RISK[level]
+    return {
+        "scores": fixed,
+        "over": over,
+        "under": under,
+        "score": total,
+        "concern": concern,
+        "handling_suggestion": handling,
+        "risk_level": risk,
+    }
+
+
+def postprocess_frame(frame, thresholds=DEFAULT_THRESHOLDS):
+    """
+    frame 需包含各维度分值列、错别字、负面词语（布尔）和 confidence 列，
+    返回同索引的结果表：校验后的各维度分值、score、重点关注、handling_suggestion、risk_level
+    """
+    confidence = frame['confidence'] if 'confidence' in frame else pd.Series(np.nan, index=frame.index)
+    out = postprocess_arrays(
+        {dim: pd.to_numeric(frame[dim], errors='coerce').fillna(0).to_numpy() for dim in SCORED_DIMENSIONS},
+        frame['错别字'].fillna(False).to_numpy(dtype=bool),
+        frame['负面词语'].fillna(False).to_numpy(dtype=bool),
+        pd.to_numeric(confidence, errors='coerce').to_numpy(dtype=float),
+        thresholds,
+    )
+    result = pd.DataFrame(out["scores"], index=frame.index)
+    result['score'] = out["score"]
+    result['重点关注'] = out["concern"]
+    result['handling_suggestion'] = out["handling_suggestion"]
+    result['risk_level'] = out["risk_level"]
+    return result
+
+
+def _raw_score(details, dimension):
+    score = details[dimension].get('得分', 0)
+    # bool 与原逻辑一样视为数字
+    return score if isinstance(score, (int, float)) else 0
+
+
+def _record_correction(dimension, kind, original, value):
+    SCORE_CORRECTIONS.inc(dimension=dimension, kind=kind)
+    logger.warning(
+        "分值修正: %s 原始分值 %s 已修正为 %s", dimension, original, value,
+        extra={"event": "score_correction", "dimension": dimension, "kind": kind, "original": original, "corrected": value},
+    )
+
+
+def postprocess_results(results, thresholds=DEFAULT_THRESHOLDS, corrections=None):
+    """
+    原地更新模型返回的结果字典（evaluation_details 中已合并规则分、错别字和负面词语），返回 results。
+    缺少评分维度或 confidence 不是数字时抛出异常，由调用方按评分失败处理。
+    传入 corrections 列表时，逐条追加被修正的维度数。
+    """
+    if not results:
+        return results
+    details_list = [result.setdefault('evaluation_details', {}) for result in results]
+    for details in details_list:
+        for dimension in SCORED_DIMENSIONS:
+            if dimension not in details:
+                raise KeyError(dimension)
+
+    raw = {dim: [_raw_score(details, dim) for details in details_list] for dim in SCORED_DIMENSIONS}
+    confidence = []
+    for result in results:
+        value = result.get('confidence', thresholds.default_confidence)
+        if not isinstance(value, (int, float)):
+            raise TypeError(f"confidence 格式错误: {value!r}")
+        confidence.append(value)
+
+    out = postprocess_arrays(
+        raw,
+        [bool(details.get('错别字', {}).get('存在', False)) for details in details_list],
+        [bool(details.get('负面词语', {}).get('存在', False)) for details in details_list],
+        confidence,
+        thresholds,
+    )
+
+    for row, (result, details) in enumerate(zip(results, details_list)):
+        corrected = 0
+        for dimension in SCORED_DIMENSIONS:
+            value = int(out["scores"][dimension][row])
+            original = raw[dimension][row]
+            if out["over"][dimension][row]:
+                details[dimension]['评价'] += f"（原始分值 {original} 超出上限，已修正为 {value}）"
+                _record_correction(dimension, 'over', original, value)
+                corrected += 1
+            elif out["under"][dimension][row]:
+                details[dimension]['评价'] += f"（原始分值 {original} 小于0，已修正为 0）"
+                _record_correction(dimension, 'under', original, value)
+                corrected += 1
+            details[dimension]['得分'] = value
+        result['score'] = int(out["score"][row])
+        result['重点关注'] = bool(out["concern"][row])
+        result['handling_suggestion'] = str(out["handling_suggestion"][row])
+        result['risk_level'] = str(out["risk_level"][row])
+        if corrections is not None:
+            corrections.append(corrected)
+    return results
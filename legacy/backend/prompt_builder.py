@@ -0,0 +1,205 @@
+"""
+评分提示词构建
+
+评分标准、注意事项和输出格式是固定内容，作为 system 消息按配置组合渲染一次后缓存；
+每条工单只把诉求数据放进 user 消息。各工单请求的前缀完全一致，便于模型服务端的前缀缓存命中，
+同时给出每部分的 token 估算，便于控制单次请求的输入规模。
+"""
+import re
+import json
+import functools
+
+# 修改评分提示词时需同步更新版本号，使旧的缓存结果失效
+PROMPT_VERSION = "4"
+
+_CJK = re.compile(r'[\u3000-\u303f\u3400-\u4dbf\u4e00-\u9fff\uff00-\uffef]')
+
+
+def estimate_tokens(text):
+    """粗略估算 token 数：中文字符及全角标点按 1 个计，其余字符按 4 个折合 1 个"""
+    cjk = len(_CJK.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+class PromptParts:
+    __slots__ = ('system', 'user', 'system_tokens', 'user_tokens')
+
+    def __init__(self, system, user, system_tokens, user_tokens):
+        self.system = system
+        self.user = user
+        self.system_tokens = system_tokens
+        self.user_tokens = user_tokens
+
+    @property
+    def total_tokens(self):
+        return self.system_tokens + self.user_tokens
+
+    def messages(self):
+        return [
+            {"role": "system", "content": self.system},
+            {"role": "user", "content": self.user},
+        ]
+
+    def token_estimates(self):
+        return {"system": self.system_tokens, "user": self.user_tokens, "total": self.total_tokens}
+
+
+@functools.lru_cache(maxsize=32)
+def render_system_prompt(check_typos=True, rule_dimensions=()):
+    """按配置组合渲染 system 消息，返回 (文本, token 估算)；相同组合只渲染一次"""
+    # 负面词语由本地扫描检测，词表不再放入提示词
+    # 本地已检出错别字时不再要求模型检查错别字，节省提示词和输出
+    if check_typos:
+        typo_instruction = """4. 错别字检查要特别注意以下情况：
+   - 同音字错误：如"按排/安排"、"在/再"、"的/地/得"等
+   - 形近字错误
+   - 常见错误用字"""
+        typo_reminder = "特别注意检查文本中是否包含错别字，这会导致重点关注标记。"
+        concern_note = "注意：评估重点关注时，除了检查三个主要指标的低分外，还要检查是否存在错别字，任一情况都应标记为重点关注。"
+        typo_schema = """,
+        "错别字": {
+            "存在": true/false,
+            "错别字列表": [{"错误写法": "XXX", "正确写法": "YYY"}]
+        }"""
+    else:
+        typo_instruction = "4. 错别字已由系统检测，无需检查，也无需在结果中输出错别字字段。"
+        typo_reminder = ""
+        concern_note = "注意：评估重点关注时只需检查三个主要指标的低分，错别字由系统另行处理。"
+        typo_schema = ""
+
+    # 由规则引擎计算的维度不再列出评分标准，也不要求模型输出
+    if '办理时长' in rule_dimensions:
+        duration_rubric = "4️⃣ 办理时长（10分）：由系统按办理时长规则计算，无需评分，也无需在结果中输出。"
+        duration_schema = ""
+    else:
+        duration_rubric = """4️⃣ 办理时长（10分）：
+- 咨询类：
+  - 1-2日：8-10分，办理时间越短得分越高
+  - 3-5日：6-7分
+  - 超5日：每超1天扣2分
+- 非咨询类：
+  - 1-4日：8-10分
+  - 5-9日：6-7分
+  - 10-15日：5分
+  - 超15日：每超1天扣2分"""
+        duration_schema = """
+        "办理时长": {"得分": 整数, "评价": "说明"},"""
+
+
+    text = f"""你是一个工单办理质量智能检测系统（GovInsight-AI）。请根据以下标准对用户消息中群众网上诉求数据的"诉求回复内容"进行评分，并评估置信度，输出结构化 JSON 结果。
+
+请采用"思维链 (Chain of Thought)"模式进行研判：
+1. 首先分析群众诉求的核心痛点和关键信息。
+2. 然后检查回复内容是否完整覆盖了这些信息，是否存在回避、推诿或逻辑漏洞。
+3. 接着根据评分标准逐项打分。
+4. 最后综合评估，给出置信度（Confidence）和处置建议。
+
+【评分维度及标准】
+1️⃣ 答非所问（30分）：
+- 回复是否回应群众诉求重点。
+  - 25-30分：精准回应。
+  - 15-24分：基本回应，细节略缺。
+  - 5-14分：多处未回应或跑题。
+  - 0-4分：严重跑题。
+
+2️⃣ 回复逻辑性（30分）：
+- 结构清晰、语言流畅。
+  - 25-30分：逻辑严谨。
+  - 15-24分：表达尚可。
+  - 5-14分：逻辑不清。
+  - 0-4分：混乱无序。
+
+3️⃣ 问题解决情况（10分）：
+- 综合评判标准：
+  - 8-10分：已解决且群众认可，回复内容清晰体现具体解决措施
+  - 5-7分：基本解决但说明不够详细，或群众不完全认可
+  - 0-4分：未解决/在处理中/未说明具体措施
+
+{duration_rubric}
+
+5️⃣ 回复态度（20分）：
+- 16-20分：态度友好，关怀到位
+- 10-15分：语气尚可，有少量冷漠
+- 5-9分：较生硬冷淡
+- 0-4分：怠慢、敷衍
+
+注意事项：
+1. 问题解决情况评分时，必须同时满足以下条件才能得到8-10分：
+   - 办理人员自评显示已解决
+   - 群众认可
+   - 回复内容中明确说明了具体解决措施
+2. 如果回复内容中未体现具体解决措施，即使办理人员自评为已解决且群众认可，最高只能得7分
+3. 重点关注标记规则：满足以下任一情况即标记为重点关注：
+   - 答非所问得分 < 5分
+   - 回复逻辑性得分 < 5分
+   - 回复态度得分 < 5分
+   - 存在错别字
+   - 存在负面词语（由系统另行检测，无需输出）
+
+{typo_instruction}
+
+请仔细评估每个维度，确保评分准确。{typo_reminder}
+同时，请给出一个置信度（confidence），范围0.0-1.0，表示你对本次评分准确性的信心。
+
+输出格式要求：
+{{
+    "score": 总分,
+    "confidence": 0.xx,
+    "evaluation_details": {{
+        "答非所问": {{"得分": 整数, "评价": "说明"}},
+        "回复逻辑性": {{"得分": 整数, "评价": "说明"}},
+        "问题解决情况": {{"得分": 整数, "评价": "说明"}},{duration_schema}
+        "回复态度": {{"得分": 整数, "评价": "说明"}}{typo_schema}
+    }},
+    "重点关注": true/false,
+    "suggestions": "改进建议",
+    "reasoning": "简要说明给出该置信度和评分的理由"
+}}
+
+{concern_note}
+
+请特别注意：
+1. 只有得分低于上述阈值才标记为重点关注
+2. 仅检查这三个维度的得分（答非所问、回复逻辑性、回复态度）
+3. 问题解决情况和办理时长的低分不会导致重点关注
+4. 确保评分和重点关注标记的一致性
+"""
+    return text, estimate_tokens(text)
+
+
+def render_user_prompt(data):
+    return "以下是群众诉求数据：\n" + json.dumps(data, ensure_ascii=False)
+
+
+def build_prompt(data, check_typos=True, rule_dimensions=()):
+    system, system_tokens = render_system_prompt(check_typos, tuple(sorted(rule_dimensions)))
+    user = render_user_prompt(data)
+    return PromptParts(system, user, system_tokens, estimate_tokens(user))
+
+
+PACKED_INSTRUCTION = """
+
+【多条评分】
+用户消息中包含多条群众诉求数据，每条带有序号 ticket_index。请对每条数据分别按上述标准独立评分，
+输出一个 JSON 数组，数组中每个元素都是上述输出格式的对象，并额外包含对应的 "ticket_index" 字段。
+不要遗漏任何一条，也不要输出数组以外的内容。
+"""
+
+
+@functools.lru_cache(maxsize=32)
+def render_packed_system_prompt(check_typos=True, rule_dimensions=()):
+    text, _ = render_system_prompt(check_typos, rule_dimensions)
+    text = text + PACKED_INSTRUCTION
+    return text, estimate_tokens(text)
+
+
+def render_packed_user_prompt(tickets):
+    payload = [{"ticket_index": index, "data": data} for index, data in tickets]
+    return "以下是群众诉求数据：\n" + json.dumps(payload, ensure_ascii=False)
+
+
+def build_packed_prompt(tickets, check_typos=True, rule_dimensions=()):
+    """tickets 为 [(ticket_index, 诉求数据)]，返回一次请求评多条工单的提示词"""
+    system, system_tokens = render_packed_system_prompt(check_typos, tuple(sorted(rule_dimensions)))
+    user = render_packed_user_prompt(tickets)
+    return PromptParts(system, user, system_tokens, estimate_tokens(user))
@@ -0,0 +1,235 @@
+"""
+结果库的增量重评（不调用模型）
+
+负面词表或后处理阈值（重点关注的分值阈值、confidence 的 0.7 / 0.85 分界）调整后，
+按结果库中保存的模型评分和回复原文重新计算，不再重新调用模型：
+- 负面词语        ← 回复原文、负面词表
+- 重点关注        ← 各维度分值、错别字、负面词语是否存在、重点关注阈值
+- handling_suggestion / risk_level ← 重点关注、confidence、confidence 分界
+每行记录上次重评所用词表和阈值的摘要，只处理依赖发生变化的部分：词表摘要不同的行重新扫描负面词语，
+阈值摘要不同或负面词语是否存在发生变化的行重新计算后三项，结果确有变化的行才写回。
+评分失败（兜底结果）的行不参与重评。
+
+    python reevaluate.py --dry-run
+    python reevaluate.py --job-id 3f2c9a... --concern-below 6
+"""
+import os
+import json
+import time
+import logging
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from negative_word_scanner import get_scanner
+from postprocess import postprocess_frame, Thresholds, DEFAULT_THRESHOLDS, SCORED_DIMENSIONS
+
+logger = logging.getLogger(__name__)
+
+# 每批从结果库读出并重评的行数
+REEVAL_BATCH_ROWS = int(os.getenv('REEVAL_BATCH_ROWS', '2000'))
+# 报告中最多列出的风险等级变化明细条数
+REEVAL_MAX_LISTED = int(os.getenv('REEVAL_MAX_LISTED', '1000'))
+
+REEVALUATED_FIELDS = ('负面词语', '重点关注', 'handling_suggestion', 'risk_level')
+
+
+def build_thresholds(overrides=None):
+    """在默认阈值上覆盖部分参数，未知参数抛出 ValueError"""
+    if not overrides:
+        return DEFAULT_THRESHOLDS
+    params = dict(vars(DEFAULT_THRESHOLDS))
+    params.pop('digest')
+    unknown = set(overrides) - set(params)
+    if unknown:
+        raise ValueError(f"不支持的阈值参数: {', '.join(sorted(unknown))}")
+    params.update(overrides)
+    return Thresholds(**params)
+
+
+class ReevaluationReport:
+    def __init__(self, negative_words, thresholds, dry_run, full, max_listed=REEVAL_MAX_LISTED):
+        self.negative_words = negative_words
+        self.thresholds = thresholds
+        self.dry_run = dry_run
+        self.full = full
+        self.max_listed = max_listed
+        self.started = time.perf_counter()
+        self.examined = 0
+        self.skipped = 0
+        self.rescanned = 0
+        self.recomputed = 0
+        self.changed = 0
+        self.fields = dict.fromkeys(REEVALUATED_FIELDS, 0)
+        self.transitions = {}
+        self.risk_changes = []
+        self.risk_changed = 0
+
+    def risk_change(self, row, before, after):
+        key = f"{before}->{after}"
+        self.transitions[key] = self.transitions.get(key, 0) + 1
+        self.risk_changed += 1
+        if len(self.risk_changes) < self.max_listed:
+            self.risk_changes.append({
+                "id": row["id"], "job_id": row["job_id"], "index": row["row_index"], "from": before, "to": after,
+            })
+
+    def summary(self):
+        return {
+            "dry_run": self.dry_run,
+            "full": self.full,
+            "negative_words_digest": self.negative_words.digest,
+            "thresholds_digest": self.thresholds.digest,
+            "examined": self.examined,
+            "skipped": self.skipped,
+            "rescanned": self.rescanned,
+            "recomputed": self.recomputed,
+            "changed": self.changed,
+            "fields": dict(self.fields),
+            "risk_transitions": dict(self.transitions),
+            "risk_changed": self.risk_changed,
+            "risk_changes": list(self.risk_changes),
+            "risk_changes_truncated": self.risk_changed > len(self.risk_changes),
+            "elapsed_ms": round((time.perf_counter() - self.started) * 1000, 2),
+        }
+
+
+def _scored(details):
+    return all(isinstance((details.get(dim) or {}).get('得分'), (int, float)) for dim in SCORED_DIMENSIONS)
+
+
+def reevaluate_rows(rows, negative_words, thresholds, report, full=False):
+    """重评一批结果库行，返回有变化的行 [(id, job_id, row_index, 结果, risk_level, 重点关注, handling_suggestion)]"""
+    scanner = get_scanner(negative_words)
+    results, positions = [], []
+    for position, row in enumerate(rows):
+        result = json.loads(row["result"])
+        if not isinstance(result, dict) or not _scored(result.get('evaluation_details') or {}):
+            report.skipped += 1
+            continue
+        results.append(result)
+        positions.append(position)
+    report.examined += len(rows)
+    if not results:
+        return []
+
+    # 负面词语：词表摘要不同的行按回复原文重新扫描
+    changed = [set() for _ in results]
+    recompute = np.zeros(len(results), dtype=bool)
+    for i, (result, position) in enumerate(zip(results, positions)):
+        row = rows[position]
+        details = result['evaluation_details']
+        if not full and row["thresholds_digest"] != thresholds.digest:
+            recompute[i] = True
+        if not full and row["words_digest"] == negative_words.digest:
+            continue
+        report.rescanned += 1
+        item = json.loads(row["item"])
+        scanned = scanner.scan(str((item if isinstance(item, dict) else {}).get('诉求回复内容') or ''))
+        previous = details.get('负面词语') or {}
+        if scanned != previous:
+            details['负面词语'] = scanned
+            changed[i].add('负面词语')
+            # 只有是否存在发生变化才影响重点关注
+            if bool(scanned['存在']) != bool(previous.get('存在')):
+                recompute[i] = True
+    if full:
+        recompute[:] = True
+
+    # 重点关注、处置建议、风险等级：依赖有变化的行整批向量化重新计算
+    targets = np.flatnonzero(recompute)
+    report.recomputed += len(targets)
+    if len(targets):
+        frame = pd.DataFrame({
+            **{dim: [results[i]['evaluation_details'][dim]['得分'] for i in targets] for dim in SCORED_DIMENSIONS},
+            '错别字': [bool((results[i]['evaluation_details'].get('错别字') or {}).get('存在')) for i in targets],
+            '负面词语': [bool((results[i]['evaluation_details'].get('负面词语') or {}).get('存在')) for i in targets],
+            'confidence': [
+                results[i].get('confidence') if isinstance(results[i].get('confidence'), (int, float)) else np.nan
+                for i in targets
+            ],
+        })
+        out = postprocess_frame(frame, thresholds)
+        columns = {field: out[field].tolist() for field in REEVALUATED_FIELDS[1:]}
+        for position, i in enumerate(targets):
+            result = results[i]
+            values = {
+                '重点关注': bool(columns['重点关注'][position]),
+                'handling_suggestion': str(columns['handling_suggestion'][position]),
+                'risk_level': str(columns['risk_level'][position]),
+            }
+            for field, value in values.items():
+                if result.get(field) != value:
+                    if field == 'risk_level':
+                        report.risk_change(rows[positions[i]], result.get(field), value)
+                    result[field] = value
+                    changed[i].add(field)
+
+    updates = []
+    for i, fields in enumerate(changed):
+        if not fields:
+            continue
+        report.changed += 1
+        for field in fields:
+            report.fields[field] += 1
+        row = rows[positions[i]]
+        result = results[i]
+        updates.append((
+            row["id"], row["job_id"], row["row_index"], result,
+            result.get('risk_level'), result.get('重点关注'), result.get('handling_suggestion'),
+        ))
+    return updates
+
+
+def reevaluate(store, negative_words, thresholds=DEFAULT_THRESHOLDS, filters=None, full=False, dry_run=False):
+    """
+    重评结果库中符合 filters（与 /results 的过滤条件相同）的行，返回报告。
+    full 为真时忽略已记录的摘要、全部重新计算；dry_run 为真时只生成报告，不写回。
+    """
+    report = ReevaluationReport(negative_words, thresholds, dry_run, full)
+    for rows in store.iter_stale(filters or {}, negative_words.digest, thresholds.digest, full, REEVAL_BATCH_ROWS):
+        updates = reevaluate_rows(rows, negative_words, thresholds, report, full)
+        if not dry_run:
+            store.apply_reevaluation(updates, [row["id"] for row in rows], negative_words.digest, thresholds.digest)
+    summary = report.summary()
+    logger.info(
+        f"重评完成: 检查 {summary['examined']} 条，变化 {summary['changed']} 条，"
+        f"风险等级变化 {summary['risk_changed']} 条，耗时 {summary['elapsed_ms']}ms"
+    )
+    return summary
+
+
+def main():
+    from config_store import negative_words_store
+    from result_store import ResultStore, RESULT_STORE_PATH
+    from structured_logging import configure_logging
+
+    parser = argparse.ArgumentParser(description="按当前负面词表和阈值重评结果库（不调用模型）")
+    parser.add_argument('--store', default=RESULT_STORE_PATH, help="结果库 SQLite 文件路径")
+    parser.add_argument('--job-id', help="只重评指定任务")
+    parser.add_argument('--category', help="只重评指定诉求类别")
+    parser.add_argument('--since', type=float, help="只重评该时间戳之后写入的结果")
+    parser.add_argument('--full', action='store_true', help="忽略已记录的摘要，全部重新计算")
+    parser.add_argument('--dry-run', action='store_true', help="只输出报告，不写回结果库")
+    parser.add_argument('--concern-below', type=float, help="重点关注的分值阈值")
+    parser.add_argument('--mandatory-review-below', type=float, help="强制复核的 confidence 分界")
+    parser.add_argument('--sampling-below', type=float, help="抽检复核的 confidence 分界")
+    args = parser.parse_args()
+    configure_logging(logging.INFO)
+
+    overrides = {
+        name: getattr(args, name)
+        for name in ('concern_below', 'mandatory_review_below', 'sampling_below')
+        if getattr(args, name) is not None
+    }
+    filters = {'job_id': args.job_id, 'category': args.category, 'since': args.since}
+    summary = reevaluate(
+        ResultStore(args.store), negative_words_store.snapshot(), build_thresholds(overrides),
+        filters=filters, full=args.full, dry_run=args.dry_run,
+    )
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+"""
+模型调用的限流、重试与熔断
+
+- 令牌桶限流：同时限制每秒请求数和每分钟 token 数，所有调用共享
+- 重试：对可重试的状态码和网络异常做带抖动的指数退避重试
+- 熔断：连续失败达到阈值后在冷却期内直接失败，冷却结束后放行一次试探请求
+- 模型输出格式错误同样重试，但上游服务本身可用，不计入熔断
+同步调用（call）与异步调用（acall）共用同一套限流、熔断状态和统计。
+"""
+import os
+import time
+import asyncio
+import random
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# 每秒请求数上限，0 表示不限（默认不限，按模型服务的配额设置）
+UPSTREAM_RPS = float(os.getenv('UPSTREAM_RPS', '0'))
+# 每分钟 token 数上限（输入 + 输出），0 表示不限
+UPSTREAM_TPM = float(os.getenv('UPSTREAM_TPM', '0'))
+# 最多尝试次数（含首次）
+RETRY_MAX_ATTEMPTS = int(os.getenv('RETRY_MAX_ATTEMPTS', '3'))
+RETRY_BASE_DELAY = float(os.getenv('RETRY_BASE_DELAY', '0.5'))
+RETRY_MAX_DELAY = float(os.getenv('RETRY_MAX_DELAY', '8'))
+# 连续失败多少次后熔断
+BREAKER_FAILURE_THRESHOLD = int(os.getenv('BREAKER_FAILURE_THRESHOLD', '5'))
+# 熔断后多久放行试探请求（秒）
+BREAKER_RESET_SECONDS = float(os.getenv('BREAKER_RESET_SECONDS', '30'))
+
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class MalformedOutputError(Exception):
+    pass
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity):
+        # rate 为每秒补充的令牌数，rate <= 0 表示不限流
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, amount=1):
+        """阻塞直到取得令牌，返回等待的秒数"""
+        if self.rate <= 0:
+            return 0.0
+        amount = min(amount, self.capacity)
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= amount:
+                    self._tokens -= amount
+                    return waited
+                delay = (amount - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    def reserve(self, amount=1):
+        """不阻塞地预先扣减令牌，返回调用方需要等待的秒数（供异步调用使用）"""
+        if self.rate <= 0:
+            return 0.0
+        amount = min(amount, self.capacity)
+        with self._lock:
+            self._refill()
+            self._tokens -= amount
+            return max(0.0, -self._tokens / self.rate)
+
+    def debit(self, amount):
+        # 事后扣减实际用量，余额可以为负，后续请求会相应等待更久
+        if self.rate <= 0:
+            return
+        with self._lock:
+            self._refill()
+            self._tokens -= amount
+
+
+class CircuitBreaker:
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=BREAKER_FAILURE_THRESHOLD, reset_seconds=BREAKER_RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.open_count = 0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_seconds:
+                self.state = self.HALF_OPEN
+                self._trial_in_flight = False
+            if self.state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info("上游服务恢复，熔断关闭")
+            self.state = self.CLOSED
+            self.failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    self.open_count += 1
+                    logger.error(f"上游服务连续失败 {self.failures} 次，熔断 {self.reset_seconds:g} 秒")
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                self._trial_in_flight = False
+
+
+class UpstreamGuard:
+    def __init__(self, rps=UPSTREAM_RPS, tpm=UPSTREAM_TPM, max_attempts=RETRY_MAX_ATTEMPTS,
+                 base_delay=RETRY_BASE_DELAY, max_delay=RETRY_MAX_DELAY, breaker=None):
+        self.request_bucket = TokenBucket(rps, max(1.0, rps))
+        self.token_bucket = TokenBucket(tpm / 60.0, tpm)
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.breaker = breaker or CircuitBreaker()
+        self._lock = threading.Lock()
+        self._stats = {
+            "requests": 0,
+            "retries": 0,
+            "failures": 0,
+            "fast_failures": 0,
+            "malformed_outputs": 0,
+            "throttle_wait_seconds": 0.0,
+        }
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._stats[name] += amount
+
+    def _backoff(self, attempt):
+        # 全抖动指数退避
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def _admit(self):
+        if not self.breaker.allow():
+            self._count("fast_failures")
+            raise CircuitOpenError("上游模型服务暂不可用（熔断中）")
+        self._count("requests")
+
+    def _settle(self, response, error):
+        """记录一次尝试的结果，返回 True 表示不再重试、直接返回该响应"""
+        status = getattr(response, 'status_code', None)
+        if isinstance(error, MalformedOutputError):
+            self.breaker.record_success()
+            self._count("malformed_outputs")
+            return False
+        if response is not None and status not in RETRYABLE_STATUS:
+            # 非 200 但不可重试（如参数错误）说明上游可用，不计入熔断
+            self.breaker.record_success()
+            self.token_bucket.debit(output_tokens_of(response))
+            return True
+        self.breaker.record_failure()
+        self._count("failures")
+        return False
+
+    def _retry_delay(self, attempt, response, error):
+        """返回下次重试前的等待秒数，没有剩余尝试次数时返回 None"""
+        if attempt + 1 >= self.max_attempts:
+            return None
+        self._count("retries")
+        # 格式错误与上游负载无关，立即重试
+        delay = 0.0 if isinstance(error, MalformedOutputError) else self._backoff(attempt)
+        reason = f"状态码 {response.status_code}" if response is not None else (str(error) or type(error).__name__)
+        logger.warning(f"模型调用失败（{reason}），{delay:.2f} 秒后第 {attempt + 1} 次重试")
+        return delay
+
+    def call(self, fn, input_tokens=0):
+        """
+        fn() 返回带 status_code 的响应对象。成功或不可重试的响应直接返回；
+        重试用尽时返回最后一次响应或抛出最后一次异常；熔断期间抛出 CircuitOpenError。
+        """
+        last_error = None
+        response = None
+        for attempt in range(self.max_attempts):
+            self._admit()
+            waited = self.request_bucket.acquire(1) + self.token_bucket.acquire(input_tokens)
+            if waited:
+                self._count("throttle_wait_seconds", waited)
+            try:
+                response = fn()
+                last_error = None
+            except Exception as e:
+                response = None
+                last_error = e
+            if self._settle(response, last_error):
+                return response
+            delay = self._retry_delay(attempt, response, last_error)
+            if delay is None:
+                break
+            if delay:
+                time.sleep(delay)
+
+        if last_error is not None:
+            raise last_error
+        return response
+
+    async def acall(self, fn, input_tokens=0):
+        """call 的异步版本：fn() 返回协程，限流和退避等待不占用线程"""
+        last_error = None
+        response = None
+        for attempt in range(self.max_attempts):
+            self._admit()
+            waited = self.request_bucket.reserve(1) + self.token_bucket.reserve(input_tokens)
+            if waited:
+                self._count("throttle_wait_seconds", waited)
+                await asyncio.sleep(waited)
+            try:
+                response = await fn()
+                last_error = None
+            except Exception as e:
+                response = None
+                last_error = e
+            if self._settle(response, last_error):
+                return response
+            delay = self._retry_delay(attempt, response, last_error)
+            if delay is None:
+                break
+            if delay:
+                await asyncio.sleep(delay)
+
+        if last_error is not None:
+            raise last_error
+        return response
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats["throttle_wait_seconds"] = round(stats["throttle_wait_seconds"], 3)
+        stats["breaker_state"] = self.breaker.state
+        stats["breaker_open_count"] = self.breaker.open_count
+        stats["config"] = {
+            "rps": self.request_bucket.rate,
+            "tpm": self.token_bucket.rate * 60,
+            "max_attempts": self.max_attempts,
+            "breaker_failure_threshold": self.breaker.failure_threshold,
+            "breaker_reset_seconds": self.breaker.reset_seconds,
+        }
+        return stats
+
+
+def output_tokens_of(response):
+    usage = getattr(response, 'usage', None)
+    if usage is None:
+        return 0
+    if isinstance(usage, dict):
+        return usage.get('output_tokens', 0) or 0
+    return getattr(usage, 'output_tokens', 0) or 0
+
+
+upstream_guard = UpstreamGuard()
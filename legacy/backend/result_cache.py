@@ -0,0 +1,155 @@
+"""
+评分结果缓存
+
+缓存键为工单内容、提示词版本和模型名规范化后的哈希，任一因素变化都会得到新的键。
+负面词语由本地扫描得出、不影响模型输出，不计入缓存键，命中后由调用方按当前词表重新扫描。内存 LRU 在前，SQLite 持久化在后，
+两级均按 TTL 过期；SQLite 超过条数上限时淘汰最久未访问的记录。
+"""
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+RESULT_CACHE_ENABLED = os.getenv('RESULT_CACHE_ENABLED', '1') == '1'
+RESULT_CACHE_PATH = os.getenv(
+    'RESULT_CACHE_PATH',
+    os.path.join(os.path.dirname(__file__), 'data', 'result_cache.sqlite3')
+)
+# 内存层最大条数
+RESULT_CACHE_MEMORY_SIZE = int(os.getenv('RESULT_CACHE_MEMORY_SIZE', '2048'))
+# SQLite 层最大条数
+RESULT_CACHE_MAX_ROWS = int(os.getenv('RESULT_CACHE_MAX_ROWS', '200000'))
+# 缓存有效期（秒），默认 30 天
+RESULT_CACHE_TTL_SECONDS = int(os.getenv('RESULT_CACHE_TTL_SECONDS', str(30 * 24 * 3600)))
+# 每写入多少条检查一次 SQLite 层的过期和超量
+EVICT_EVERY = 256
+
+
+def make_cache_key(data, prompt_version, model):
+    canonical = json.dumps(
+        {
+            "data": data,
+            "prompt_version": prompt_version,
+            "model": model,
+        },
+        ensure_ascii=False,
+        sort_keys=True,
+        separators=(',', ':'),
+    )
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+class ResultCache:
+    def __init__(self, path=RESULT_CACHE_PATH, memory_size=RESULT_CACHE_MEMORY_SIZE,
+                 max_rows=RESULT_CACHE_MAX_ROWS, ttl=RESULT_CACHE_TTL_SECONDS):
+        self.memory_size = memory_size
+        self.max_rows = max_rows
+        self.ttl = ttl
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._puts_since_evict = 0
+        self._stats = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "puts": 0,
+            "skipped_errors": 0,
+            "evictions": 0,
+        }
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS result_cache ('
+            ' key TEXT PRIMARY KEY,'
+            ' value TEXT NOT NULL,'
+            ' created_at REAL NOT NULL,'
+            ' accessed_at REAL NOT NULL)'
+        )
+        self._db.execute('CREATE INDEX IF NOT EXISTS idx_result_cache_accessed ON result_cache(accessed_at)')
+        self._db.commit()
+
+    def _remember(self, key, value, created_at):
+        self._memory[key] = (value, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                value, created_at = entry
+                if now - created_at <= self.ttl:
+                    self._memory.move_to_end(key)
+                    self._stats["memory_hits"] += 1
+                    return json.loads(value)
+                del self._memory[key]
+
+            row = self._db.execute(
+                'SELECT value, created_at FROM result_cache WHERE key = ?', (key,)
+            ).fetchone()
+            if row is not None and now - row[1] <= self.ttl:
+                self._db.execute('UPDATE result_cache SET accessed_at = ? WHERE key = ?', (now, key))
+                self._db.commit()
+                self._remember(key, row[0], row[1])
+                self._stats["disk_hits"] += 1
+                return json.loads(row[0])
+
+            self._stats["misses"] += 1
+            return None
+
+    def put(self, key, result):
+        # 兜底结果（含 error 字段）不缓存，下次仍会重新调用模型
+        if not isinstance(result, dict) or result.get('error'):
+            with self._lock:
+                self._stats["skipped_errors"] += 1
+            return
+        value = json.dumps(result, ensure_ascii=False)
+        now = time.time()
+        with self._lock:
+            self._remember(key, value, now)
+            self._db.execute(
+                'INSERT OR REPLACE INTO result_cache (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)',
+                (key, value, now, now)
+            )
+            self._stats["puts"] += 1
+            self._puts_since_evict += 1
+            if self._puts_since_evict >= EVICT_EVERY:
+                self._puts_since_evict = 0
+                self._evict(now)
+            self._db.commit()
+
+    def _evict(self, now):
+        removed = self._db.execute(
+            'DELETE FROM result_cache WHERE created_at < ?', (now - self.ttl,)
+        ).rowcount
+        overflow = self._db.execute('SELECT COUNT(*) FROM result_cache').fetchone()[0] - self.max_rows
+        if overflow > 0:
+            removed += self._db.execute(
+                'DELETE FROM result_cache WHERE key IN ('
+                ' SELECT key FROM result_cache ORDER BY accessed_at LIMIT ?)',
+                (overflow,)
+            ).rowcount
+        if removed:
+            self._stats["evictions"] += removed
+            logger.info(f"结果缓存淘汰 {removed} 条")
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_entries"] = len(self._memory)
+            stats["disk_entries"] = self._db.execute('SELECT COUNT(*) FROM result_cache').fetchone()[0]
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = round((stats["memory_hits"] + stats["disk_hits"]) / lookups, 4) if lookups else 0.0
+        return stats
@@ -0,0 +1,388 @@
+"""
+评分结果持久化存储
+
+所有评分结果按任务写入 SQLite（WAL 模式），便于事后查询和统计而无需重新评分。
+- 写入：每个任务一个 StoreWriter，攒够一批后在一个事务内批量插入，任务结束时写入剩余部分
+- 查询：按风险等级、重点关注、处置建议、类别、任务、分数范围和时间范围过滤并分页，
+  各过滤字段均有索引；统计接口按字段分组计数
+读写使用不同连接：写入共用一个连接并加锁，查询使用每个线程各自的只读连接，WAL 下互不阻塞。
+每行记录评分（或上次重评）所用负面词表和后处理阈值的摘要，重评（见 reevaluate.py）跳过摘要未变的行；
+来源不明的结果（如续评沿用的评分日志结果）摘要为空，首次重评时重新计算。
+重评和列式导出（见 columnar_export.py）按 id 分批读取，不一次性载入全部结果。
+"""
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+RESULT_STORE_ENABLED = os.getenv('RESULT_STORE_ENABLED', '1') == '1'
+RESULT_STORE_PATH = os.getenv(
+    'RESULT_STORE_PATH',
+    os.path.join(os.path.dirname(__file__), 'data', 'results.sqlite3')
+)
+# 每个任务攒够多少条写入一次
+RESULT_STORE_BATCH_SIZE = int(os.getenv('RESULT_STORE_BATCH_SIZE', '500'))
+# 分页查询时每页的最大条数
+RESULT_PAGE_MAX = int(os.getenv('RESULT_PAGE_MAX', '500'))
+
+# 处置建议的简写
+HANDLING_ALIASES = {
+    'mandatory_review': "强制复核 (Mandatory Review)",
+    'sampling': "抽检复核 (Sampling)",
+    'auto_pass': "自动采信 (Auto-Pass)",
+}
+
+# 可用于过滤和分组的列：{参数名: 列名}
+GROUP_COLUMNS = {
+    'risk_level': 'risk_level',
+    'handling_suggestion': 'handling_suggestion',
+    '重点关注': 'concern',
+    'concern': 'concern',
+    'category': 'category',
+    'job_id': 'job_id',
+    'has_error': 'has_error',
+}
+
+ORDERINGS = {
+    'created_at_desc': 'created_at DESC, id DESC',
+    'created_at_asc': 'created_at ASC, id ASC',
+    'score_desc': 'score DESC, id DESC',
+    'score_asc': 'score ASC, id ASC',
+}
+
+# 过滤和统计只用到窄表 results；原始数据和完整结果放在 result_payloads，只在取分页明细时关联
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS results ('
+    ' id INTEGER PRIMARY KEY,'
+    ' job_id TEXT NOT NULL,'
+    ' row_index INTEGER NOT NULL,'
+    ' created_at REAL NOT NULL,'
+    ' score INTEGER,'
+    ' confidence REAL,'
+    ' risk_level TEXT,'
+    ' concern INTEGER NOT NULL DEFAULT 0,'
+    ' handling_suggestion TEXT,'
+    ' has_error INTEGER NOT NULL DEFAULT 0,'
+    ' category TEXT,'
+    ' words_digest TEXT,'
+    ' thresholds_digest TEXT,'
+    ' UNIQUE (job_id, row_index))',
+    'CREATE TABLE IF NOT EXISTS result_payloads ('
+    ' job_id TEXT NOT NULL,'
+    ' row_index INTEGER NOT NULL,'
+    ' item TEXT NOT NULL,'
+    ' result TEXT NOT NULL,'
+    ' PRIMARY KEY (job_id, row_index)) WITHOUT ROWID',
+    # 每个过滤字段一个索引，并带上其余过滤和统计用到的列，使计数和分组统计只扫描索引
+    'CREATE INDEX IF NOT EXISTS idx_results_created ON results('
+    'created_at, risk_level, handling_suggestion, concern, category, score, has_error)',
+    'CREATE INDEX IF NOT EXISTS idx_results_risk ON results('
+    'risk_level, created_at, handling_suggestion, concern, category, score, has_error)',
+    'CREATE INDEX IF NOT EXISTS idx_results_handling ON results('
+    'handling_suggestion, created_at, risk_level, concern, category, score, has_error)',
+    'CREATE INDEX IF NOT EXISTS idx_results_concern ON results('
+    'concern, created_at, risk_level, handling_suggestion, category, score, has_error)',
+    'CREATE INDEX IF NOT EXISTS idx_results_category ON results('
+    'category, created_at, risk_level, handling_suggestion, concern, score, has_error)',
+    'CREATE INDEX IF NOT EXISTS idx_results_score ON results('
+    'score, created_at, risk_level, handling_suggestion, concern, category, has_error)',
+)
+
+
+class QueryError(ValueError):
+    pass
+
+
+def result_row(job_id, index, item, result, created_at, words_digest=None, thresholds_digest=None):
+    """返回 (results 行, result_payloads 行)"""
+    item = item if isinstance(item, dict) else {}
+    result = result if isinstance(result, dict) else {}
+    category = item.get('诉求类别') or item.get('类别')
+    return (
+        job_id,
+        index,
+        created_at,
+        result.get('score') if isinstance(result.get('score'), (int, float)) else None,
+        result.get('confidence') if isinstance(result.get('confidence'), (int, float)) else None,
+        result.get('risk_level'),
+        1 if result.get('重点关注') else 0,
+        result.get('handling_suggestion'),
+        1 if result.get('error') else 0,
+        None if category is None else str(category),
+        words_digest,
+        thresholds_digest,
+    ), (
+        job_id,
+        index,
+        json.dumps(item, ensure_ascii=False),
+        json.dumps(result, ensure_ascii=False),
+    )
+
+
+class StoreWriter:
+    """
+    单个任务的批量写入器，非线程安全，由任务线程独占使用。
+    words_digest / thresholds_digest 为评分所用负面词表和后处理阈值的摘要，随每行写入；
+    add 时 stamped 为假表示该结果的来源不明，不记摘要。
+    """
+
+    def __init__(self, store, job_id, words_digest=None, thresholds_digest=None, batch_size=RESULT_STORE_BATCH_SIZE):
+        self.store = store
+        self.job_id = job_id
+        self.words_digest = words_digest
+        self.thresholds_digest = thresholds_digest
+        self.batch_size = batch_size
+        self.written = 0
+        self._pending = []
+
+    def add(self, index, item, result, stamped=True):
+        digests = (self.words_digest, self.thresholds_digest) if stamped else (None, None)
+        self._pending.append(result_row(self.job_id, index, item, result, time.time(), *digests))
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self._pending:
+            return
+        rows, self._pending = self._pending, []
+        try:
+            self.store.insert_many(rows)
+            self.written += len(rows)
+        except sqlite3.Error as e:
+            # 结果库写入失败不影响评分结果的返回
+            logger.error(f"任务 {self.job_id} 写入结果库失败（{len(rows)} 条）: {str(e)}")
+
+    def close(self):
+        self.flush()
+        self.store.optimize()
+
+
+class ResultStore:
+    def __init__(self, path=RESULT_STORE_PATH):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        for statement in SCHEMA:
+            self._db.execute(statement)
+        self._migrate()
+        self._db.commit()
+
+    def _migrate(self):
+        # 旧版本创建的库没有重评摘要列
+        columns = {row[1] for row in self._db.execute('PRAGMA table_info(results)')}
+        for column in ('words_digest', 'thresholds_digest'):
+            if column not in columns:
+                self._db.execute(f'ALTER TABLE results ADD COLUMN {column} TEXT')
+
+    def _reader(self):
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(f'file:{self.path}?mode=ro', uri=True)
+            db.row_factory = sqlite3.Row
+            self._local.db = db
+        return db
+
+    def writer(self, job_id, words_digest=None, thresholds_digest=None):
+        return StoreWriter(self, job_id, words_digest, thresholds_digest)
+
+    def insert_many(self, rows):
+        # 同一任务同一行重复写入时以最后一次为准；原地更新而不是 REPLACE（不改变 id），
+        # 摘要随结果一起更新，与写入的结果保持一致
+        with self._lock:
+            with self._db:
+                self._db.executemany(
+                    'INSERT INTO results (job_id, row_index, created_at, score, confidence, risk_level,'
+                    ' concern, handling_suggestion, has_error, category, words_digest, thresholds_digest)'
+                    ' VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)'
+                    ' ON CONFLICT (job_id, row_index) DO UPDATE SET created_at = excluded.created_at,'
+                    ' score = excluded.score, confidence = excluded.confidence, risk_level = excluded.risk_level,'
+                    ' concern = excluded.concern, handling_suggestion = excluded.handling_suggestion,'
+                    ' has_error = excluded.has_error, category = excluded.category,'
+                    ' words_digest = excluded.words_digest, thresholds_digest = excluded.thresholds_digest',
+                    [row for row, _ in rows]
+                )
+                self._db.executemany(
+                    'INSERT OR REPLACE INTO result_payloads (job_id, row_index, item, result) VALUES (?, ?, ?, ?)',
+                    [payload for _, payload in rows]
+                )
+
+    def iter_stale(self, filters, words_digest, thresholds_digest, full=False, batch_size=2000):
+        """
+        按 id 顺序分批产出需要重评的行：不含评分失败的行，且负面词表或阈值摘要与当前不同
+        （full 为真时不比较摘要）。每行含 id、job_id、row_index、两个摘要、item 和 result。
+        """
+        where, params = self._where(dict(filters, has_error=False))
+        if not full:
+            where += ' AND (words_digest IS NOT ? OR thresholds_digest IS NOT ?)'
+            params = params + [words_digest, thresholds_digest]
+        return self._iter_batches(
+            'id, job_id, row_index, words_digest, thresholds_digest', where, params, batch_size
+        )
+
+    def iter_results(self, filters, item_fields=(), batch_size=2000):
+        """
+        按 id 顺序分批产出符合过滤条件的行（导出使用），每行含 results 的全部列和 result；
+        诉求数据只在 SQLite 中取出 item_fields 中的字段，依次为 item_0、item_1 …，不读出整条诉求数据
+        """
+        where, params = self._where(filters)
+        payload = ''.join(f', json_extract(p.item, ?) AS item_{i}' for i in range(len(item_fields)))
+        paths = [f'$."{name}"' for name in item_fields]
+        return self._iter_batches('*', where, params, batch_size, 'p.result' + payload, paths)
+
+    def _iter_batches(self, columns, where, params, batch_size, payload='p.item, p.result', payload_params=()):
+        # 按 id 翻页，每批只读一次索引范围，不随偏移量变慢
+        where = f'{where} AND id > ?' if where else ' WHERE id > ?'
+        db = self._reader()
+        last_id = 0
+        while True:
+            rows = db.execute(
+                f'SELECT r.*, {payload} FROM ('
+                f' SELECT {columns} FROM results{where}'
+                f' ORDER BY id LIMIT ?) AS r'
+                f' JOIN result_payloads AS p USING (job_id, row_index) ORDER BY r.id',
+                list(payload_params) + params + [last_id, batch_size]
+            ).fetchall()
+            if not rows:
+                return
+            yield rows
+            last_id = rows[-1]["id"]
+
+    def apply_reevaluation(self, updates, ids, words_digest, thresholds_digest):
+        """
+        updates 为 [(id, job_id, row_index, 结果, risk_level, 重点关注, handling_suggestion)]，只含结果有变化的行；
+        ids 为本批检查过的全部行，一并记录当前摘要
+        """
+        with self._lock:
+            with self._db:
+                self._db.executemany(
+                    'UPDATE results SET risk_level = ?, concern = ?, handling_suggestion = ? WHERE id = ?',
+                    [(risk, 1 if concern else 0, handling, row_id) for row_id, _, _, _, risk, concern, handling in updates]
+                )
+                self._db.executemany(
+                    'UPDATE result_payloads SET result = ? WHERE job_id = ? AND row_index = ?',
+                    [(json.dumps(result, ensure_ascii=False), job_id, index)
+                     for _, job_id, index, result, _, _, _ in updates]
+                )
+                self._db.executemany(
+                    'UPDATE results SET words_digest = ?, thresholds_digest = ? WHERE id = ?',
+                    [(words_digest, thresholds_digest, row_id) for row_id in ids]
+                )
+
+    def optimize(self):
+        # 让 SQLite 按需更新统计信息，帮助查询选择合适的索引
+        try:
+            with self._lock:
+                self._db.execute('PRAGMA optimize')
+        except sqlite3.Error as e:
+            logger.warning(f"结果库 PRAGMA optimize 失败: {str(e)}")
+
+    @staticmethod
+    def _where(filters):
+        clauses, params = [], []
+        for name in ('risk_level', 'category', 'job_id'):
+            value = filters.get(name)
+            if value:
+                clauses.append(f'{name} = ?')
+                params.append(value)
+        handling = filters.get('handling_suggestion')
+        if handling:
+            clauses.append('handling_suggestion = ?')
+            params.append(HANDLING_ALIASES.get(handling, handling))
+        for name, column in (('concern', 'concern'), ('has_error', 'has_error')):
+            value = filters.get(name)
+            if value is not None:
+                clauses.append(f'{column} = ?')
+                params.append(1 if value else 0)
+        for name, clause in (('min_score', 'score >= ?'), ('max_score', 'score <= ?'),
+                             ('since', 'created_at >= ?'), ('until', 'created_at < ?')):
+            value = filters.get(name)
+            if value is not None:
+                clauses.append(clause)
+                params.append(value)
+        return (' WHERE ' + ' AND '.join(clauses)) if clauses else '', params
+
+    def query(self, filters, page=1, page_size=50, order='created_at_desc'):
+        if order not in ORDERINGS:
+            raise QueryError(f"不支持的排序方式: {order}")
+        page = max(1, page)
+        page_size = min(max(1, page_size), RESULT_PAGE_MAX)
+        where, params = self._where(filters)
+        db = self._reader()
+        total = db.execute(f'SELECT COUNT(*) FROM results{where}', params).fetchone()[0]
+        rows = db.execute(
+            f'SELECT r.*, p.item, p.result FROM ('
+            f' SELECT * FROM results{where} ORDER BY {ORDERINGS[order]} LIMIT ? OFFSET ?) AS r'
+            f' JOIN result_payloads AS p USING (job_id, row_index)'
+            f' ORDER BY {ORDERINGS[order]}',
+            params + [page_size, (page - 1) * page_size]
+        ).fetchall()
+        return {
+            "total": total,
+            "page": page,
+            "page_size": page_size,
+            "items": [self._decode(row) for row in rows],
+        }
+
+    def get(self, result_id):
+        row = self._reader().execute(
+            'SELECT r.*, p.item, p.result FROM results AS r'
+            ' JOIN result_payloads AS p USING (job_id, row_index) WHERE r.id = ?',
+            (result_id,)
+        ).fetchone()
+        return None if row is None else self._decode(row)
+
+    def aggregate(self, filters, group_by):
+        column = GROUP_COLUMNS.get(group_by)
+        if column is None:
+            raise QueryError(f"不支持的分组字段: {group_by}")
+        where, params = self._where(filters)
+        rows = self._reader().execute(
+            f'SELECT {column} AS value, COUNT(*) AS count, AVG(score) AS avg_score'
+            f' FROM results{where} GROUP BY {column} ORDER BY count DESC',
+            params
+        ).fetchall()
+        return [
+            {
+                "value": bool(row["value"]) if column in ('concern', 'has_error') else row["value"],
+                "count": row["count"],
+                "avg_score": None if row["avg_score"] is None else round(row["avg_score"], 2),
+            }
+            for row in rows
+        ]
+
+    @staticmethod
+    def _decode(row):
+        return {
+            "id": row["id"],
+            "job_id": row["job_id"],
+            "index": row["row_index"],
+            "created_at": row["created_at"],
+            "score": row["score"],
+            "confidence": row["confidence"],
+            "risk_level": row["risk_level"],
+            "重点关注": bool(row["concern"]),
+            "handling_suggestion": row["handling_suggestion"],
+            "category": row["category"],
+            "item": json.loads(row["item"]),
+            "result": json.loads(row["result"]),
+        }
+
+    def stats(self):
+        db = self._reader()
+        count, first, last = db.execute('SELECT COUNT(*), MIN(created_at), MAX(created_at) FROM results').fetchone()
+        return {
+            "rows": count,
+            "first_created_at": first,
+            "last_created_at": last,
+            "path": self.path,
+        }
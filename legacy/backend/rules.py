@@ -0,0 +1,91 @@
+"""
+可计算评分维度的规则引擎
+
+办理时长 的得分完全由 诉求类别（咨询 / 非咨询）和办理天数决定，无需调用模型。
+compute_rule_scores 对整批数据一次性向量化计算；无法解析类别或天数的行返回 None，
+由模型按原有评分标准评分。
+办理时长 只接受非负数字加可选单位（天 / 日 / 工作日 / 小时，无单位按日计，小时折算为日），
+负数、其他单位或夹杂其他文字的写法均视为无法解析。
+"""
+import numpy as np
+import pandas as pd
+
+# 修改规则表时需同步更新版本号，使旧的缓存结果失效
+RULES_VERSION = "3"
+
+# 由规则引擎计算的维度
+RULE_DIMENSIONS = ('办理时长',)
+
+CATEGORY_FIELDS = ('诉求类别', '类别')
+DURATION_FIELD = '办理时长'
+DURATION_PATTERN = r'^\s*(?P<amount>\d+(?:\.\d+)?)\s*(?P<unit>小时|个?工作日|天|日)?\s*$'
+
+
+def _first_present(item, fields):
+    for field in fields:
+        value = item.get(field)
+        if value not in (None, ''):
+            return value
+    return None
+
+
+def duration_scores(is_consult, days):
+    """
+    按办理时长规则计算得分，参数为等长数组，days 中的 NaN 表示无法计算：
+    - 咨询类：1日 10分、2日 9分；3-4日 7分、5日 6分；超5日每超1天在6分基础上扣2分
+    - 非咨询类：1-2日 10分、3日 9分、4日 8分；5-6日 7分、7-9日 6分；10-15日 5分；超15日每超1天在5分基础上扣2分
+    """
+    is_consult = np.asarray(is_consult, dtype=bool)
+    days = np.asarray(days, dtype=float)
+    # 当日办结按 1 日计，不足 1 日的部分按 1 日计
+    days = np.maximum(np.ceil(days), 1)
+
+    consult = np.select(
+        [days <= 1, days <= 2, days <= 4, days <= 5],
+        [10, 9, 7, 6],
+        default=6 - 2 * (days - 5),
+    )
+    other = np.select(
+        [days <= 2, days <= 3, days <= 4, days <= 6, days <= 9, days <= 15],
+        [10, 9, 8, 7, 6, 5],
+        default=5 - 2 * (days - 15),
+    )
+    scores = np.where(is_consult, consult, other)
+    return np.clip(scores, 0, 10)
+
+
+def compute_rule_scores(items):
+    """返回与 items 等长的列表，每项为 {维度: {"得分", "评价"}}，无法计算时为 None"""
+    if not items:
+        return []
+    rows = [item if isinstance(item, dict) else {} for item in items]
+    frame = pd.DataFrame({
+        'category': [_first_present(item, CATEGORY_FIELDS) for item in rows],
+        'duration': [item.get(DURATION_FIELD) for item in rows],
+    })
+    category = frame['category'].astype('string')
+    parsed = frame['duration'].astype('string').str.extract(DURATION_PATTERN)
+    amount = pd.to_numeric(parsed['amount'], errors='coerce').astype(float)
+    hours = (parsed['unit'] == '小时').fillna(False).to_numpy(dtype=bool)
+    days = amount.where(~hours, amount / 24)
+    computable = category.notna().to_numpy() & days.notna().to_numpy()
+    # “非咨询类”同样含有“咨询”二字，需排除
+    is_consult = (
+        category.str.contains('咨询', regex=False) & ~category.str.contains('非咨询', regex=False)
+    ).fillna(False).to_numpy(dtype=bool)
+    scores = duration_scores(is_consult, days.fillna(1).to_numpy())
+
+    results = []
+    for ok, consult, value, in_hours, score in zip(computable, is_consult, amount.to_numpy(), hours, scores):
+        if not ok:
+            results.append(None)
+            continue
+        kind = '咨询' if consult else '非咨询'
+        duration = f"{value:g} 小时" if in_hours else f"{value:g} 日"
+        results.append({
+            '办理时长': {
+                '得分': int(score),
+                '评价': f"{kind}类诉求办理 {duration}，按办理时长规则计 {int(score)} 分",
+            }
+        })
+    return results
@@ -0,0 +1,154 @@
+"""
+表格文件的流式读写
+
+- 读取：.xlsx 以只读模式逐行迭代（openpyxl read_only），.csv 逐行解析，均不把整个文件载入内存；
+  读取表头时校验必需的列
+- 写出：CSV 逐块生成字节流直接返回；xlsx 以 write_only 模式逐行写入临时文件
+
+每行导出内容为原始列加评分结果列，与前端原来导出的 评分结果.xlsx 一致并补齐全部维度。
+"""
+import io
+import csv
+import json
+import tempfile
+from itertools import islice
+
+from postprocess import SCORED_DIMENSIONS
+
+REQUIRED_COLUMNS = ('群众诉求文本', '诉求类别', '办理时长', '诉求回复内容')
+OPTIONAL_COLUMNS = ('办理人员自评', '与群众沟通情况')
+
+RESULT_COLUMNS = (
+    ('总分', lambda r: r.get('score')),
+    ('置信度', lambda r: r.get('confidence')),
+    ('处置建议', lambda r: r.get('handling_suggestion')),
+    ('风险等级', lambda r: r.get('risk_level')),
+    ('重点关注', lambda r: '是' if r.get('重点关注') else '否'),
+) + tuple(
+    column
+    for dim in SCORED_DIMENSIONS
+    for column in (
+        (f'{dim}_得分', lambda r, dim=dim: _detail(r, dim).get('得分')),
+        (f'{dim}_评价', lambda r, dim=dim: _detail(r, dim).get('评价')),
+    )
+) + (
+    ('错别字', lambda r: '、'.join(
+        item.get('错误写法', '') for item in _detail(r, '错别字').get('错别字列表', []) if isinstance(item, dict)
+    )),
+    ('负面词语', lambda r: '、'.join(_detail(r, '负面词语').get('词语列表', []))),
+    ('建议', lambda r: r.get('suggestions')),
+    ('AI研判理由', lambda r: r.get('reasoning')),
+    ('错误', lambda r: r.get('error')),
+)
+
+SUPPORTED_FORMATS = ('xlsx', 'csv')
+
+
+class ColumnError(ValueError):
+    pass
+
+
+def _detail(result, name):
+    value = (result.get('evaluation_details') or {}).get(name)
+    return value if isinstance(value, dict) else {}
+
+
+def file_format(filename):
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    if extension not in SUPPORTED_FORMATS:
+        raise ColumnError(f"不支持的文件类型: {filename}，请上传 .xlsx 或 .csv 文件")
+    return extension
+
+
+def check_header(header):
+    header = [str(name).strip() if name is not None else '' for name in header]
+    missing = [name for name in REQUIRED_COLUMNS if name not in header]
+    if missing:
+        raise ColumnError(f"缺少必需的列: {', '.join(missing)}")
+    return header
+
+
+class TableReader:
+    """逐行读取上传的表格。构造时读取并校验表头，迭代产出 {列名: 值}，跳过空行"""
+
+    def __init__(self, stream, filename):
+        self.format = file_format(filename)
+        if self.format == 'xlsx':
+            from openpyxl import load_workbook
+            try:
+                self._workbook = load_workbook(stream, read_only=True, data_only=True)
+            except Exception as e:
+                raise ColumnError(f"无法读取 xlsx 文件: {str(e)}")
+            self._rows = self._workbook.worksheets[0].iter_rows(values_only=True)
+        else:
+            self._workbook = None
+            self._rows = csv.reader(io.TextIOWrapper(stream, encoding='utf-8-sig', newline=''))
+        try:
+            self.header = check_header(next(self._rows))
+        except StopIteration:
+            raise ColumnError("文件为空")
+
+    def __iter__(self):
+        header = self.header
+        for values in self._rows:
+            row = {
+                name: value for name, value in zip(header, values)
+                if name and value is not None and value != ''
+            }
+            if row:
+                yield row
+
+    def close(self):
+        if self._workbook is not None:
+            self._workbook.close()
+
+
+def iter_chunks(rows, size):
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def export_header(input_columns):
+    return list(input_columns) + [name for name, _ in RESULT_COLUMNS]
+
+
+def export_row(input_columns, item, result):
+    result = result if isinstance(result, dict) else {}
+    return [item.get(name) for name in input_columns] + [getter(result) for _, getter in RESULT_COLUMNS]
+
+
+def _cell(value):
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    return value
+
+
+def iter_csv(header, rows, batch_rows=200):
+    """逐块产出 CSV 字节（带 BOM，Excel 可直接打开中文）"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    yield '\ufeff'.encode('utf-8') + buffer.getvalue().encode('utf-8')
+    for chunk in iter_chunks(rows, batch_rows):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows([[_cell(value) for value in row] for row in chunk])
+        yield buffer.getvalue().encode('utf-8')
+
+
+def write_xlsx(header, rows, sheet_title='评分结果'):
+    """以 write_only 模式逐行写入临时文件，返回已定位到开头的文件对象"""
+    from openpyxl import Workbook
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(sheet_title)
+    sheet.append(header)
+    for row in rows:
+        sheet.append([_cell(value) for value in row])
+    output = tempfile.TemporaryFile(suffix='.xlsx')
+    workbook.save(output)
+    output.seek(0)
+    return output
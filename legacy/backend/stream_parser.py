@@ -0,0 +1,121 @@
+"""
+模型流式输出的增量 JSON 解析
+
+逐段读入模型输出，跟踪字符串、转义和括号层级：
+- 顶层对象（或合并评分的数组）闭合后立即停止读取，不再等待多余的输出
+- 输出明显不是 JSON（开头长时间没有出现括号、结构外出现非法字符、括号不匹配）时立即中止，
+  让重试尽早开始
+同一扫描器也用于从完整文本中提取 JSON，取代原来按首尾括号截取的做法。
+"""
+import os
+
+from resilience import MalformedOutputError
+
+# 允许出现在 JSON 之前的前缀长度（如 ```json 或一句说明）
+STREAM_MAX_PREFIX_CHARS = int(os.getenv('STREAM_MAX_PREFIX_CHARS', '200'))
+
+_OPENERS = {'{': '}', '[': ']'}
+# 字符串外允许出现的字符：空白、结构符号以及数字、true/false/null 的组成字符
+_BARE_CHARS = frozenset(' \t\r\n,:' + '0123456789+-.eE' + 'truefalsn')
+
+
+class JsonObjectScanner:
+    def __init__(self, openers='{[', max_prefix=STREAM_MAX_PREFIX_CHARS):
+        self.openers = openers
+        self.max_prefix = max_prefix
+        self._parts = []
+        self._stack = []
+        self._in_string = False
+        self._escape = False
+        self._prefix = 0
+        self._started = False
+        self.done = False
+
+    def feed(self, chunk):
+        """读入一段输出，顶层结构闭合时返回 True，明显格式错误时抛出 MalformedOutputError"""
+        if self.done:
+            return True
+        start = 0
+        if not self._started:
+            positions = [p for p in (chunk.find(c) for c in self.openers) if p >= 0]
+            if not positions:
+                self._prefix += len(chunk)
+                if self._prefix > self.max_prefix:
+                    raise MalformedOutputError(f"模型输出前 {self._prefix} 个字符中没有 JSON")
+                return False
+            start = min(positions)
+            self._prefix += start
+            if self._prefix > self.max_prefix:
+                raise MalformedOutputError(f"模型输出前 {self._prefix} 个字符中没有 JSON")
+            self._started = True
+
+        stack = self._stack
+        for i in range(start, len(chunk)):
+            char = chunk[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == '\\':
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in _OPENERS:
+                stack.append(_OPENERS[char])
+            elif char in '}]':
+                if not stack or stack.pop() != char:
+                    raise MalformedOutputError(f"模型输出的括号不匹配: {char}")
+                if not stack:
+                    self._parts.append(chunk[start:i + 1])
+                    self.done = True
+                    return True
+            elif char not in _BARE_CHARS:
+                raise MalformedOutputError(f"模型输出在 JSON 结构外出现非法字符: {char!r}")
+        self._parts.append(chunk[start:])
+        return False
+
+    def text(self):
+        return ''.join(self._parts)
+
+
+def read_json_stream(chunks, openers='{['):
+    """
+    从流式输出中读取第一个完整的 JSON 对象或数组文本，读到后关闭流。
+    流在结构闭合前结束时抛出 MalformedOutputError。
+    """
+    scanner = JsonObjectScanner(openers)
+    try:
+        for chunk in chunks:
+            if chunk and scanner.feed(chunk):
+                return scanner.text()
+    finally:
+        close = getattr(chunks, 'close', None)
+        if close is not None:
+            close()
+    raise MalformedOutputError("模型输出不完整，JSON 未闭合")
+
+
+async def aread_json_stream(chunks, openers='{['):
+    """read_json_stream 的异步版本，chunks 为异步迭代器"""
+    scanner = JsonObjectScanner(openers)
+    try:
+        async for chunk in chunks:
+            if chunk and scanner.feed(chunk):
+                return scanner.text()
+    finally:
+        close = getattr(chunks, 'aclose', None)
+        if close is not None:
+            await close()
+    raise MalformedOutputError("模型输出不完整，JSON 未闭合")
+
+
+def extract_json(text, openers='{['):
+    """从完整文本中提取第一个完整的 JSON 对象或数组文本，无法提取时返回 None"""
+    scanner = JsonObjectScanner(openers, max_prefix=len(text))
+    try:
+        if scanner.feed(text):
+            return scanner.text()
+    except MalformedOutputError:
+        pass
+    return None
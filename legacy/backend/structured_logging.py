@@ -0,0 +1,168 @@
+"""
+日志配置（后台线程写出、可输出 JSON、逐条明细按比例采样）
+
+- 请求线程只把日志记录放入队列，格式化和写出由后台的 QueueListener 线程完成；
+  队列满时丢弃 WARNING 以下的记录并计入 log_records_dropped_total，WARNING 及以上的记录等待入队，不会丢失
+- LOG_FORMAT=json 时每条日志输出一行 JSON，extra 中的字段原样作为 JSON 字段输出
+- 逐条评分的明细日志（原始评分详情、提示词 token 估算等）记到 detail_logger()，
+  按 LOG_DETAIL_SAMPLE_RATE 采样；参数用 lazy() / lazy_json() 包装，级别未开启或未被采样时不做序列化
+- 分值修正和兜底结果以 WARNING 记录，不受采样影响
+
+LOG_PRESET 提供两组默认值，LOG_LEVEL / LOG_FORMAT / LOG_DETAIL_SAMPLE_RATE 可单独覆盖：
+- development（默认）：DEBUG 级别、文本格式、明细全部输出
+- production：INFO 级别、JSON 格式、不输出明细，评分热路径上不产生日志开销
+"""
+import os
+import sys
+import copy
+import json
+import queue
+import atexit
+import random
+import logging
+import threading
+from logging.handlers import QueueHandler, QueueListener
+
+from metrics import LOG_RECORDS_DROPPED
+
+PRESETS = {
+    'development': {'level': 'DEBUG', 'format': 'text', 'detail_sample_rate': 1.0},
+    'production': {'level': 'INFO', 'format': 'json', 'detail_sample_rate': 0.0},
+}
+
+LOG_PRESET = os.getenv('LOG_PRESET', 'development')
+_preset = PRESETS.get(LOG_PRESET, PRESETS['development'])
+LOG_LEVEL = os.getenv('LOG_LEVEL')
+LOG_FORMAT = os.getenv('LOG_FORMAT', _preset['format'])
+# 逐条明细日志的采样比例，0 为不输出，1 为全部输出
+LOG_DETAIL_SAMPLE_RATE = float(os.getenv('LOG_DETAIL_SAMPLE_RATE', str(_preset['detail_sample_rate'])))
+# 等待后台线程写出的日志记录上限
+LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', '10000'))
+
+TEXT_FORMAT = '%(asctime)s %(levelname)s %(name)s: %(message)s'
+
+# LogRecord 自带的属性，其余属性视为通过 extra 传入的结构化字段
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'taskName'}
+
+
+class lazy:
+    """日志参数的延迟求值：记录通过级别和采样检查后才调用 fn"""
+
+    __slots__ = ('fn', 'args', 'kwargs')
+
+    def __init__(self, fn, *args, **kwargs):
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+
+    def __str__(self):
+        return str(self.fn(*self.args, **self.kwargs))
+
+
+def lazy_json(value):
+    return lazy(json.dumps, value, ensure_ascii=False, default=str)
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        if record.stack_info:
+            entry["stack"] = record.stack_info
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """按比例保留记录，用于逐条明细日志"""
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        return self.rate >= 1 or random.random() < self.rate
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    def prepare(self, record):
+        # 在调用线程合并消息参数（参数可能在之后被修改），JSON 序列化和写出留给后台线程
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            if record.levelno < logging.WARNING:
+                LOG_RECORDS_DROPPED.inc(level=record.levelname)
+                return
+            self.queue.put(record)
+
+
+_sampling = SamplingFilter(LOG_DETAIL_SAMPLE_RATE)
+
+
+def detail_logger(name):
+    """模块的逐条明细日志记录器（明细日志一律用 DEBUG 级别），按 LOG_DETAIL_SAMPLE_RATE 采样"""
+    logger = logging.getLogger(f'{name}.detail')
+    if _sampling not in logger.filters:
+        logger.addFilter(_sampling)
+    if LOG_DETAIL_SAMPLE_RATE <= 0:
+        # 不采样时关闭整个记录器，isEnabledFor 直接返回 False，不创建记录
+        logger.setLevel(logging.CRITICAL + 1)
+    return logger
+
+
+_listener = None
+_lock = threading.Lock()
+
+
+def configure_logging(level=None, stream=None):
+    """
+    替换根记录器的处理器为后台队列，重复调用不生效。
+    level 为调用方的默认级别，设置了 LOG_LEVEL 时以 LOG_LEVEL 为准，两者都没有时使用预设的级别。
+    """
+    global _listener
+    with _lock:
+        if _listener is not None:
+            return
+        level = LOG_LEVEL or level or _preset['level']
+        handler = logging.StreamHandler(stream or sys.stderr)
+        handler.setFormatter(JsonFormatter() if LOG_FORMAT == 'json' else logging.Formatter(TEXT_FORMAT))
+
+        root = logging.getLogger()
+        for existing in list(root.handlers):
+            root.removeHandler(existing)
+        root.addHandler(NonBlockingQueueHandler(queue.Queue(LOG_QUEUE_SIZE)))
+        root.setLevel(level)
+
+        _listener = QueueListener(root.handlers[0].queue, handler, respect_handler_level=True)
+        _listener.start()
+        # 进程退出前写出队列中剩余的记录
+        atexit.register(stop_logging)
+
+
+def stop_logging():
+    global _listener
+    with _lock:
+        if _listener is None:
+            return
+        _listener.stop()
+        _listener = None
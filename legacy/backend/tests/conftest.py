@@ -0,0 +1,20 @@
+"""
+后端测试的公共配置
+
+    cd legacy/backend && python -m pytest tests
+
+测试使用进程内模拟模型，不访问网络；结果库、结果缓存、评分日志默认关闭，需要时由各测试在临时目录中创建。
+"""
+import os
+import sys
+
+# 各模块在导入时读取环境变量，必须在导入被测模块之前设置
+os.environ.setdefault('SCORING_BACKEND', 'fake')
+os.environ.setdefault('RESULT_STORE_ENABLED', '0')
+os.environ.setdefault('RESULT_CACHE_ENABLED', '0')
+os.environ.setdefault('JOURNAL_ENABLED', '0')
+os.environ.setdefault('DEDUP_HISTORY_ENABLED', '0')
+os.environ.setdefault('UPSTREAM_RPS', '0')
+os.environ.setdefault('LOG_PRESET', 'production')
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
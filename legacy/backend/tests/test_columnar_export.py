@@ -0,0 +1,85 @@
+import io
+
+import pytest
+
+pa = pytest.importorskip('pyarrow')
+import pyarrow.feather as feather  # noqa: E402
+import pyarrow.parquet as pq  # noqa: E402
+
+from columnar_export import iter_export, write_export, store_records, rollup, read_table  # noqa: E402
+from result_store import ResultStore, result_row  # noqa: E402
+
+
+def make_result(i, error=False):
+    if error:
+        return {"error": "API调用失败: x", "score": 0, "evaluation_details": {}}
+    return {
+        "score": 60 + i % 30,
+        "confidence": 0.9,
+        "risk_level": ("High", "Low", "None")[i % 3],
+        "handling_suggestion": "自动采信 (Auto-Pass)",
+        "重点关注": i % 3 == 0,
+        "evaluation_details": {
+            "答非所问": {"得分": 20}, "回复逻辑性": {"得分": 20}, "问题解决情况": {"得分": 8},
+            "办理时长": {"得分": 10}, "回复态度": {"得分": 2 + i % 10},
+            "错别字": {"存在": i % 4 == 0, "错别字列表": [{"错误写法": "在见"}] if i % 4 == 0 else []},
+            "负面词语": {"存在": i % 5 == 0, "词语列表": ["不归我们管"] if i % 5 == 0 else []},
+        },
+    }
+
+
+def records(count=65):
+    # 类别和部门在后面的批次中不断出现新值，检验跨行组的字典编码
+    for i in range(count):
+        item = {"诉求类别": f"类别{i % 7}", "诉求回复内容": "您好"}
+        if i % 5:
+            item["承办单位"] = f"单位{i % 11}"
+        yield f"job{i % 3}", i, 1.7e9 + i, item, make_result(i, error=(i == 7))
+
+
+def read(data, output_format):
+    buffer = io.BytesIO(data)
+    return feather.read_table(buffer) if output_format == 'arrow' else pq.read_table(buffer)
+
+
+@pytest.mark.parametrize('output_format', ['parquet', 'arrow'])
+def test_multi_row_group_export_round_trips(output_format):
+    data = b''.join(iter_export(records(), output_format, row_group_rows=5))
+    table = read(data, output_format)
+    assert table.num_rows == 65
+    expected = list(records())
+    assert table.column('department').to_pylist() == [item.get("承办单位") for _, _, _, item, _ in expected]
+    assert table.column('category').to_pylist() == [item["诉求类别"] for _, _, _, item, _ in expected]
+    assert table.column('risk_level').to_pylist()[:3] == ['High', 'Low', 'None']
+    assert table.column('has_error').to_pylist().count(True) == 1
+    assert table.column('负面词语列表').to_pylist()[0] == ['不归我们管']
+    if output_format == 'parquet':
+        assert pq.ParquetFile(io.BytesIO(data)).metadata.num_row_groups == 13
+
+
+@pytest.mark.parametrize('suffix', ['parquet', 'arrow'])
+def test_export_from_store(tmp_path, suffix):
+    store = ResultStore(str(tmp_path / 'results.sqlite3'))
+    store.insert_many([result_row(job_id, index, item, result, created_at)
+                       for job_id, index, created_at, item, result in records()])
+    path = str(tmp_path / f'out.{suffix}')
+    assert write_export(path, store_records(store, {'job_id': 'job1'}), suffix, row_group_rows=4) == 22
+    table = read_table(path)
+    assert set(table.column('job_id').to_pylist()) == {'job1'}
+    assert table.column('department').to_pylist()[:2] == ['单位1', '单位4']
+
+
+def test_rollup_excludes_errors_from_averages():
+    table = pa.concat_tables([read(b''.join(iter_export(records(), 'arrow', row_group_rows=5)), 'arrow')])
+    groups = {entry['category']: entry for entry in rollup(table, ['category'])}
+    assert sum(entry['count'] for entry in groups.values()) == 65
+    # 第 7 行评分失败，属于 类别0
+    assert groups['类别0']['errors'] == 1
+    scores = [60 + i % 30 for i in range(65) if i % 7 == 0 and i != 7]
+    assert groups['类别0']['avg_score'] == round(sum(scores) / len(scores), 2)
+    assert sum(groups['类别0']['risk_levels'].values()) == len(scores)
+
+
+def test_rollup_rejects_unknown_keys():
+    with pytest.raises(ValueError):
+        rollup(read(b''.join(iter_export(records(5), 'parquet')), 'parquet'), ['foo'])
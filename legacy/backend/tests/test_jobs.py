@@ -0,0 +1,92 @@
+import json
+import threading
+
+from jobs import JobManager, STATUS_COMPLETED
+from journal import JobJournal, input_hash, read_entries
+
+
+def scored(item):
+    return {"score": item["n"], "evaluation_details": {}}
+
+
+class CountingScorer:
+    def __init__(self, fail=()):
+        self.calls = []
+        self.fail = set(fail)
+        self._lock = threading.Lock()
+
+    def __call__(self, item):
+        with self._lock:
+            self.calls.append(item["n"])
+        if item["n"] in self.fail:
+            return {"error": "API调用失败: ServiceUnavailable", "score": 0}
+        return scored(item)
+
+
+def on_error(item, error):
+    return {"error": str(error), "score": 0}
+
+
+def items(count):
+    return [{"n": i, "诉求回复内容": f"回复{i}"} for i in range(count)]
+
+
+def run_recovered(journal, scorer):
+    manager = JobManager(scorer, on_error, runners=1, journal=journal)
+    jobs = manager.recover()
+    for job in jobs:
+        assert job.done.wait(10)
+    return jobs
+
+
+def test_resume_after_partial_journal(tmp_path):
+    journal = JobJournal(str(tmp_path))
+    data = items(10)
+    writer = journal.create('job1', data, None, {}, 1.0)
+    for index in (0, 2, 5):
+        writer.append(index, input_hash(data[index]), scored(data[index]))
+    writer.close()
+    # 崩溃时写了一半的最后一行
+    with open(journal.path('job1', 'jsonl'), 'a', encoding='utf-8') as f:
+        f.write(json.dumps({"i": 6, "h": input_hash(data[6]), "r": scored(data[6])})[:20])
+
+    scorer = CountingScorer()
+    [job] = run_recovered(journal, scorer)
+    assert job.status == STATUS_COMPLETED
+    assert job.resumed == 3
+    assert sorted(scorer.calls) == [1, 3, 4, 6, 7, 8, 9]
+    assert [result["score"] for result in job.results] == list(range(10))
+    # 结束后压缩日志并写入状态标记，不再被恢复
+    assert len(read_entries(journal.path('job1', 'jsonl'))) == 10
+    assert journal.unfinished() == []
+
+
+def test_fallback_results_are_rescored_on_resume(tmp_path):
+    journal = JobJournal(str(tmp_path))
+    data = items(4)
+    writer = journal.create('job2', data, None, {}, 1.0)
+    # 旧版本写入的兜底结果
+    writer.append(0, input_hash(data[0]), {"error": "上游服务熔断", "score": 0})
+    writer.append(1, input_hash(data[1]), scored(data[1]))
+    writer.close()
+
+    scorer = CountingScorer(fail={3})
+    [job] = run_recovered(journal, scorer)
+    assert sorted(scorer.calls) == [0, 2, 3]
+    assert job.results[0] == scored(data[0])
+    assert job.failed == 1
+    # 本次的兜底结果同样不记入日志
+    entries = read_entries(journal.path('job2', 'jsonl'))
+    assert input_hash(data[3]) not in entries
+    assert len(entries) == 3
+
+
+def test_locked_journal_is_skipped(tmp_path):
+    journal = JobJournal(str(tmp_path))
+    writer = journal.create('job3', items(2), None, {}, 1.0)
+    try:
+        scorer = CountingScorer()
+        assert run_recovered(journal, scorer) == []
+        assert scorer.calls == []
+    finally:
+        writer.close()
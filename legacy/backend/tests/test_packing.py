@@ -0,0 +1,41 @@
+import json
+from types import SimpleNamespace
+
+import app
+from config_store import NegativeWordsSnapshot
+
+SNAPSHOT = NegativeWordsSnapshot(1, {"负面词语": ["不归我们管"], "分类": {}})
+
+
+def element(index, **overrides):
+    details = {
+        dim: {"得分": score, "评价": "好"}
+        for dim, score in (("答非所问", 20), ("回复逻辑性", 20), ("问题解决情况", 25), ("办理时长", 10), ("回复态度", 12))
+    }
+    details["错别字"] = {"存在": False, "错别字列表": []}
+    result = {"ticket_index": index, "evaluation_details": details, "confidence": 0.9,
+              "suggestions": "", "reasoning": "理由"}
+    result.update(overrides)
+    return result
+
+
+def test_malformed_element_only_rescores_that_ticket(monkeypatch):
+    bad = element(1)
+    del bad["evaluation_details"]["答非所问"]
+    content = json.dumps([element(0), bad, element(2, confidence="高")], ensure_ascii=False)
+    calls = []
+    monkeypatch.setattr(app, 'request_model', lambda *args, **kwargs: SimpleNamespace(
+        status_code=200, content=content, code=200, usage={}))
+
+    def single(data, *args):
+        calls.append(data["诉求回复内容"])
+        return {"score": -1}
+
+    monkeypatch.setattr(app, 'call_model', single)
+    pack = [(index, {"诉求回复内容": f"回复{index}"}, {}, []) for index in range(3)]
+    results = dict(app.score_pack(pack, SNAPSHOT))
+
+    assert calls == ["回复1", "回复2"]
+    assert results[0]["reasoning"] == "理由" and results[0]["score"] > 0
+    assert results[0]["evaluation_details"]["负面词语"]["存在"] is False
+    assert results[1] == results[2] == {"score": -1}
@@ -0,0 +1,13 @@
+from prompt_builder import render_system_prompt
+
+
+def test_typo_instructions_follow_check_typos():
+    with_typos, _ = render_system_prompt(True)
+    assert "还要检查是否存在错别字" in with_typos
+    assert '"错别字列表"' in with_typos
+
+    without_typos, _ = render_system_prompt(False)
+    assert "错别字已由系统检测" in without_typos
+    assert "检查是否存在错别字" not in without_typos
+    assert "检查文本中是否包含错别字" not in without_typos
+    assert '"错别字列表"' not in without_typos
@@ -0,0 +1,26 @@
+from app import call_model, refresh_negative_words, result_cache_key
+from config_store import NegativeWordsSnapshot
+
+ITEM = {"诉求内容": "路灯坏了", "诉求回复内容": "这事不归我们管，已转交", "办理时长": 1}
+
+
+def test_cache_key_does_not_depend_on_word_list():
+    assert result_cache_key(dict(ITEM)) == result_cache_key(dict(ITEM))
+    assert result_cache_key(dict(ITEM)) != result_cache_key(dict(ITEM), cascade=True)
+
+
+def test_cached_result_is_rescanned_with_current_words_and_categories():
+    before = NegativeWordsSnapshot(1, {"负面词语": ["不是我们"], "分类": {}})
+    after = NegativeWordsSnapshot(2, {"负面词语": ["不归我们管"], "分类": {"推诿": ["不归我们管"]}})
+    result = call_model(dict(ITEM), before)
+    assert result['重点关注'] is False
+
+    refreshed = refresh_negative_words(result, ITEM, after)
+    words = refreshed['evaluation_details']['负面词语']
+    assert words['词语列表'] == ['不归我们管']
+    assert words['匹配详情'][0]['分类'] == ['推诿']
+    assert refreshed['重点关注'] is True
+    assert refreshed['handling_suggestion'].startswith('强制复核')
+
+    renamed = NegativeWordsSnapshot(3, {"负面词语": ["不归我们管"], "分类": {"推卸": ["不归我们管"]}})
+    assert refresh_negative_words(refreshed, ITEM, renamed)['evaluation_details']['负面词语']['匹配详情'][0]['分类'] == ['推卸']
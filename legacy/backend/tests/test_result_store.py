@@ -0,0 +1,47 @@
+from config_store import NegativeWordsSnapshot
+from postprocess import DEFAULT_THRESHOLDS
+from reevaluate import reevaluate
+from result_store import ResultStore
+
+
+def scored():
+    return {
+        "score": 90, "confidence": 0.9, "risk_level": "None", "重点关注": False,
+        "handling_suggestion": "自动采信 (Auto-Pass)",
+        "evaluation_details": {
+            "答非所问": {"得分": 20}, "回复逻辑性": {"得分": 20}, "问题解决情况": {"得分": 28},
+            "办理时长": {"得分": 10}, "回复态度": {"得分": 10},
+            "错别字": {"存在": False, "错别字列表": []},
+            "负面词语": {"存在": False, "词语列表": []},
+        },
+    }
+
+
+def test_scored_rows_are_stamped_and_skipped_by_first_reevaluation(tmp_path):
+    snapshot = NegativeWordsSnapshot(1, {"负面词语": ["不归我们管"], "分类": {}})
+    store = ResultStore(str(tmp_path / 'results.sqlite3'))
+    writer = store.writer('job1', snapshot.digest, DEFAULT_THRESHOLDS.digest)
+    for index in range(3):
+        writer.add(index, {"诉求回复内容": "您好"}, scored())
+    # 来源不明的结果不记摘要
+    writer.add(3, {"诉求回复内容": "不归我们管"}, scored(), stamped=False)
+    writer.close()
+
+    summary = reevaluate(store, snapshot)
+    assert summary["examined"] == 1
+    assert summary["changed"] == 1
+    assert reevaluate(store, snapshot)["examined"] == 0
+
+
+def test_rewriting_a_row_keeps_its_id_and_updates_digests(tmp_path):
+    store = ResultStore(str(tmp_path / 'results.sqlite3'))
+    writer = store.writer('job1', 'old', DEFAULT_THRESHOLDS.digest)
+    writer.add(0, {"诉求回复内容": "您好"}, scored())
+    writer.close()
+    writer = store.writer('job1', 'new', DEFAULT_THRESHOLDS.digest)
+    writer.add(0, {"诉求回复内容": "您好"}, dict(scored(), score=70))
+    writer.close()
+
+    rows = [row for batch in store.iter_stale({}, 'other', DEFAULT_THRESHOLDS.digest) for row in batch]
+    assert [(row["id"], row["words_digest"]) for row in rows] == [(1, 'new')]
+    assert next(store.iter_results({}))[0]["score"] == 70
@@ -0,0 +1,33 @@
+import pytest
+
+from rules import compute_rule_scores
+
+
+def score(duration, category='投诉'):
+    result = compute_rule_scores([{"诉求类别": category, "办理时长": duration}])[0]
+    return None if result is None else result['办理时长']['得分']
+
+
+@pytest.mark.parametrize('duration, expected', [
+    (3, 9), ('3', 9), ('3天', 9), ('3 日', 9), ('3个工作日', 9), ('2.5天', 9),
+    ('2小时', 10), ('30小时', 10), ('50小时', 9), (0, 10), ('20', 0),
+])
+def test_duration_units(duration, expected):
+    assert score(duration) == expected
+
+
+@pytest.mark.parametrize('duration', ['-3', -3, '3周', '约3天', '3天2小时', '', None, True])
+def test_unparseable_durations_fall_back_to_model(duration):
+    assert score(duration) is None
+
+
+def test_consult_rules_and_comment():
+    result = compute_rule_scores([{"类别": "政策咨询", "办理时长": "6小时"}, {"类别": "咨询", "办理时长": "6天"}])
+    assert result[0]['办理时长'] == {"得分": 10, "评价": "咨询类诉求办理 6 小时，按办理时长规则计 10 分"}
+    assert result[1]['办理时长']['得分'] == 4
+
+
+def test_non_consult_category_uses_non_consult_table():
+    result = compute_rule_scores([{"诉求类别": "非咨询类", "办理时长": "7"}])[0]['办理时长']
+    assert result == {"得分": 6, "评价": "非咨询类诉求办理 7 日，按办理时长规则计 6 分"}
+    assert score('7', category='咨询类') == 2
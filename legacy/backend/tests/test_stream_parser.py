@@ -0,0 +1,52 @@
+import json
+
+import pytest
+
+from resilience import MalformedOutputError
+from stream_parser import read_json_stream, extract_json
+
+RESULT = {"score": 80, "evaluation_details": {"回复态度": {"评价": "语气 {平和} \"礼貌\" [无] \\ 结束"}}, "ok": True}
+TEXT = json.dumps(RESULT, ensure_ascii=False)
+
+
+def chunks(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+@pytest.mark.parametrize('size', [1, 2, 3, 7, 64, 4096])
+def test_json_split_across_chunks(size):
+    output = '```json\n' + TEXT + '\n```\n以上为评分结果'
+    assert json.loads(read_json_stream(iter(chunks(output, size)))) == RESULT
+
+
+def test_every_split_point():
+    for cut in range(1, len(TEXT)):
+        assert read_json_stream(iter([TEXT[:cut], TEXT[cut:]])) == TEXT
+
+
+def test_stops_reading_after_top_level_closes():
+    consumed = []
+
+    def stream():
+        for part in ['[{"a": 1}', ', {"b": 2}]', '多余输出']:
+            consumed.append(part)
+            yield part
+
+    assert json.loads(read_json_stream(stream())) == [{"a": 1}, {"b": 2}]
+    assert consumed == ['[{"a": 1}', ', {"b": 2}]']
+
+
+@pytest.mark.parametrize('parts', [
+    ['{"a": [1, 2}'],
+    ['{"a": 1', ' oops}'],
+    ['说明' * 200, '{}'],
+    ['{"a": "未闭合'],
+])
+def test_malformed_output_is_rejected(parts):
+    with pytest.raises(MalformedOutputError):
+        read_json_stream(iter(parts))
+
+
+def test_extract_json_from_text():
+    assert extract_json('评分如下：' + TEXT + ' 完毕', '{') == TEXT
+    assert extract_json('没有 JSON') is None
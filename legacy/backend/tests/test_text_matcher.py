@@ -0,0 +1,54 @@
+import random
+
+import pytest
+
+from config_store import NegativeWordsSnapshot
+from negative_word_scanner import get_scanner
+from text_matcher import MultiPatternMatcher, NAIVE_MAX_PATTERNS
+
+
+def brute_force(patterns, text):
+    return sorted(
+        (start, start + len(pattern), pattern)
+        for pattern in set(p for p in patterns if p)
+        for start in range(len(text) - len(pattern) + 1)
+        if text.startswith(pattern, start)
+    )
+
+
+@pytest.mark.parametrize('naive', [True, False])
+def test_overlapping_and_nested_patterns(naive):
+    patterns = ['he', 'she', 'his', 'hers', 'e', '不归', '不归我们管', '我们']
+    text = 'ushers 这事不归我们管 she his'
+    assert MultiPatternMatcher(patterns, naive=naive).find_all(text) == brute_force(patterns, text)
+
+
+@pytest.mark.parametrize('naive', [True, False])
+def test_matches_brute_force_on_random_inputs(naive):
+    rng = random.Random(7)
+    alphabet = 'ab推诿'
+    for _ in range(300):
+        patterns = [''.join(rng.choice(alphabet) for _ in range(rng.randint(1, 4))) for _ in range(rng.randint(1, 40))]
+        text = ''.join(rng.choice(alphabet + ' ') for _ in range(rng.randint(0, 60)))
+        assert MultiPatternMatcher(patterns, naive=naive).find_all(text) == brute_force(patterns, text)
+
+
+def test_strategy_follows_pattern_count():
+    words = [f'词{i}' for i in range(NAIVE_MAX_PATTERNS + 1)]
+    assert MultiPatternMatcher(words[:NAIVE_MAX_PATTERNS]).naive
+    assert not MultiPatternMatcher(words).naive
+    assert MultiPatternMatcher([]).find_all('任意文本') == []
+
+
+def test_scanner_reports_categories_and_positions():
+    snapshot = NegativeWordsSnapshot(1, {"负面词语": ["不归我们管", "不清楚"], "分类": {"推诿": ["不归我们管"]}})
+    result = get_scanner(snapshot).scan('不清楚，这事不归我们管')
+    assert result["词语列表"] == ["不清楚", "不归我们管"]
+    assert result["匹配详情"][1] == {"词语": "不归我们管", "分类": ["推诿"], "位置": [6, 11]}
+
+
+def test_scanners_are_cached_by_content_not_version():
+    first = NegativeWordsSnapshot(1, {"负面词语": ["甲"], "分类": {}})
+    second = NegativeWordsSnapshot(1, {"负面词语": ["乙"], "分类": {}})
+    assert get_scanner(first).scan('乙')["存在"] is False
+    assert get_scanner(second).scan('乙')["存在"] is True
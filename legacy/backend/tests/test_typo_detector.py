@@ -0,0 +1,34 @@
+import pytest
+
+from typo_detector import TypoDetector, get_typo_detector
+
+
+@pytest.mark.parametrize('text', [
+    '我们在见面会上答复',
+    '化学反应问题已处理',
+    '药物不良反应的问题已转交卫健部门',
+    '整改正在见效',
+    '请按排序提交材料',
+    '工作人员在见到您后进行了解释',
+    '网格员在见到现场情况后',
+    '在见诉求人时说明了情况',
+    '在次基础上进一步整改',
+])
+def test_words_overlapping_exceptions_are_not_typos(text):
+    assert get_typo_detector().detect(text) == []
+
+
+@pytest.mark.parametrize('text, wrong', [
+    ('感谢您的来电，在见！', '在见！'),
+    ('祝您生活愉快，在见。', '在见。'),
+    ('您反应的问题已转交相关部门', '反应的问题'),
+    ('关于您反应问题的答复', '反应问题'),
+    ('我们将按排人员上门', '按排'),
+])
+def test_confusion_pairs_are_detected(text, wrong):
+    assert wrong in [typo["错误写法"] for typo in get_typo_detector().detect(text)]
+
+
+def test_exception_must_overlap_the_match():
+    detector = TypoDetector({"混淆词对": [{"错误写法": "在见", "正确写法": "再见"}], "例外": ["见面"]})
+    assert detector.detect('明天见面，在见') == [{"错误写法": "在见", "正确写法": "再见"}]
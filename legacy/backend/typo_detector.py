@@ -0,0 +1,80 @@
+"""
+错别字本地检测
+
+根据混淆词典（config/typo_pairs.json）中的 错误写法 构建多模式匹配自动机，
+在回复内容中一次扫描找出错别字；与 例外 中的写法有重叠的命中会被忽略
+（例如 例外 中的 化学反应 使“化学反应问题”中的 反应问题 不算错别字）。
+输出格式与模型返回的 错别字列表 一致：[{"错误写法": ..., "正确写法": ...}]。
+"""
+import os
+import json
+import hashlib
+import logging
+import threading
+
+from text_matcher import MultiPatternMatcher
+
+logger = logging.getLogger(__name__)
+
+TYPO_PAIRS_PATH = os.getenv(
+    'TYPO_PAIRS_PATH',
+    os.path.join(os.path.dirname(__file__), 'config', 'typo_pairs.json')
+)
+
+
+class TypoDetector:
+    def __init__(self, config):
+        self.corrections = {}
+        for pair in config.get("混淆词对", []):
+            wrong, right = pair.get("错误写法"), pair.get("正确写法")
+            if wrong and right and wrong != right:
+                self.corrections[wrong] = right
+        self.exceptions = tuple(w for w in config.get("例外", []) if w)
+        self.matcher = MultiPatternMatcher(list(self.corrections) + list(self.exceptions))
+        canonical = json.dumps([self.corrections, self.exceptions], ensure_ascii=False, sort_keys=True)
+        self.digest = hashlib.sha256(canonical.encode('utf-8')).hexdigest()[:12]
+
+    def detect(self, text):
+        matches = self.matcher.find_all(text)
+        allowed = [(start, end) for start, end, word in matches if word in self.exceptions]
+        typos = {}
+        for start, end, word in matches:
+            right = self.corrections.get(word)
+            if right is None:
+                continue
+            # 命中的字与例外写法共用，说明这些字属于另一个词
+            if any(start < b and a < end for a, b in allowed):
+                continue
+            typos.setdefault(word, right)
+        return [{"错误写法": wrong, "正确写法": right} for wrong, right in typos.items()]
+
+
+_lock = threading.Lock()
+_detector = None
+_stamp = None
+
+
+def get_typo_detector(path=TYPO_PAIRS_PATH):
+    # 词典文件变化时重新构建，加载失败时沿用上一次的词典
+    global _detector, _stamp
+    try:
+        stat = os.stat(path)
+        stamp = (stat.st_mtime_ns, stat.st_size)
+    except OSError:
+        stamp = None
+    if _detector is not None and stamp == _stamp:
+        return _detector
+    with _lock:
+        if _detector is not None and stamp == _stamp:
+            return _detector
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                config = json.load(f)
+            _detector = TypoDetector(config)
+            logger.info(f"错别字词典已加载，共 {len(_detector.corrections)} 组")
+        except Exception as e:
+            logger.error(f"错别字词典加载失败: {str(e)}")
+            if _detector is None:
+                _detector = TypoDetector({})
+        _stamp = stamp
+        return _detector
@@ -0,0 +1,58 @@
+"""
+评分结果的本地检查与校验（不依赖服务配置，导入时没有副作用）
+
+- local_checks：调用模型前计算规则分并检测错别字
+- validate_result：模型返回后以规则分覆盖可计算维度、本地扫描负面词语、合并错别字并做后处理
+同步、异步、合并评分、近似重复推导和评分链路基准（benchmarks/pipeline.py）共用。
+"""
+import logging
+
+from negative_word_scanner import get_scanner
+from postprocess import postprocess_results
+from rules import compute_rule_scores
+from structured_logging import detail_logger, lazy_json
+from typo_detector import get_typo_detector
+
+logger = logging.getLogger(__name__)
+detail = detail_logger(__name__)
+
+
+def local_checks(data, rule_scores=None):
+    # 单条调用时规则分逐条计算，批量调用时由 batch_scorer 整批预先计算
+    if rule_scores is None:
+        rule_scores = compute_rule_scores([data])[0] or {}
+    local_typos = get_typo_detector().detect(str(data.get('诉求回复内容') or ''))
+    return rule_scores, local_typos
+
+
+def validate_result(json_result, data, negative_words, rule_scores, local_typos, trace=None):
+    # 验证并修正分值
+    details = json_result.setdefault('evaluation_details', {})
+    detail.debug("原始评分详情: %s", lazy_json(details))
+
+    # 可计算维度以规则引擎结果为准，之后与其他维度一起校验并汇总总分
+    for dimension, rule_result in rule_scores.items():
+        details[dimension] = dict(rule_result)
+
+    # 负面词语以本地扫描结果为准
+    reply = str(data.get('诉求回复内容') or '')
+    details['负面词语'] = get_scanner(negative_words).scan(reply)
+
+    # 合并本地检出的错别字与模型检出的错别字
+    if local_typos:
+        typos = details.get('错别字') or {}
+        known = {item.get('错误写法') for item in local_typos}
+        merged = local_typos + [
+            item for item in typos.get('错别字列表', [])
+            if isinstance(item, dict) and item.get('错误写法') not in known
+        ]
+        details['错别字'] = {"存在": True, "错别字列表": merged}
+
+    # 分值校验、总分、重点关注和处置建议由批量后处理统一计算
+    postprocess_results([json_result], corrections=trace.corrections if trace is not None else None)
+    detail.debug(
+        "评分结果: 总分 %s，重点关注 %s，处置建议 %s",
+        json_result['score'], json_result['重点关注'], json_result['handling_suggestion'],
+    )
+
+    return json_result